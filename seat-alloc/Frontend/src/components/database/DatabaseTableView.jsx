@@ -1,6 +1,6 @@
 // src/components/database/DatabaseTableView.jsx
 
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import {
   Search,
   Trash2,
@@ -31,6 +31,8 @@ const DatabaseTableView = ({ onToast }) => {
   const [searchQuery, setSearchQuery] = useState('');
   const [page, setPage] = useState(1);
   const [pagination, setPagination] = useState({ page: 1, pages: 1, total: 0, per_page: 50 });
+  // page number -> keyset cursor that fetches it (filled in as pages are visited)
+  const cursorsRef = useRef({});
   const [selectedRows, setSelectedRows] = useState([]);
   const [editingRow, setEditingRow] = useState(null);
   const [editValues, setEditValues] = useState({});
@@ -57,6 +59,7 @@ const DatabaseTableView = ({ onToast }) => {
   const loadTableData = useCallback(async () => {
     const result = await fetchTableData(selectedTable, {
       page,
+      after: cursorsRef.current[page],
       perPage: 50,
       search: searchQuery,
       sortBy: 'id',
@@ -66,6 +69,9 @@ const DatabaseTableView = ({ onToast }) => {
     setTableData(result.data);
     setColumns(result.columns);
     setPagination(result.pagination);
+    if (result.pagination?.next_cursor) {
+      cursorsRef.current[page + 1] = result.pagination.next_cursor;
+    }
   }, [fetchTableData, selectedTable, page, searchQuery]);
 
   useEffect(() => {
@@ -171,7 +177,7 @@ const DatabaseTableView = ({ onToast }) => {
           {Object.entries(overview.tables).map(([table, count]) => (
             <button
               key={table}
-              onClick={() => { setSelectedTable(table); setPage(1); setSearchQuery(''); }}
+              onClick={() => { cursorsRef.current = {}; setSelectedTable(table); setPage(1); setSearchQuery(''); }}
               className={`p-4 rounded-xl text-left transition-all border-2 ${
                 selectedTable === table
                   ? 'border-orange-500 bg-orange-50 dark:bg-orange-900/20 shadow-lg shadow-orange-500/10'
@@ -202,7 +208,7 @@ const DatabaseTableView = ({ onToast }) => {
               type="text"
               placeholder="Search records..."
               value={searchQuery}
-              onChange={(e) => { setSearchQuery(e.target.value); setPage(1); }}
+              onChange={(e) => { cursorsRef.current = {}; setSearchQuery(e.target.value); setPage(1); }}
               className="w-full pl-10 pr-4 py-2 border border-gray-300 dark:border-gray-600 rounded-lg bg-white dark:bg-gray-900 text-gray-900 dark:text-white focus:ring-2 focus:ring-orange-500 outline-none text-sm"
             />
           </div>
@@ -52,7 +52,7 @@ export const useDatabaseApi = () => {
   }, [getHeaders]);
 
   const fetchTableData = useCallback(async (tableName, options = {}) => {
-    const { page = 1, perPage = 50, search = '', sortBy = 'id', sortOrder = 'DESC' } = options;
+    const { page = 1, perPage = 50, search = '', sortBy = 'id', sortOrder = 'DESC', after } = options;
     setLoading(true);
     setError(null);
 
@@ -64,6 +64,7 @@ export const useDatabaseApi = () => {
         sort_by: sortBy,
         sort_order: sortOrder
       });
+      if (after) params.set('after', after);  // keyset cursor from the previous page
 
       const res = await fetch(`/api/database/table/${tableName}?${params}`, {
         headers: getHeaders()
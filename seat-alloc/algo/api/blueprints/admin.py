@@ -1,9 +1,19 @@
 # Administrative and authentication endpoints.
 # Handles user login/signup and provides utilities for bulk database table operations.
 from flask import Blueprint, jsonify, request, send_file, current_app
+from algo.config.settings import Config
 from algo.database.db import get_db_connection
+from algo.database.writer import run_write
 from algo.services.auth_service import token_required, login as auth_login, signup as auth_signup, google_auth_handler, get_user_by_token, get_user_by_id, update_user_profile, VALID_ROLES, role_required
+import base64
+import json
+import logging
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
 
 # Helper for optional rate limiting
 def get_limiter():
@@ -183,11 +193,175 @@ TABLE_CONFIG = {
     }
 }
 
+
+# Filtered row counts for the table browser: (db, table, where, params) -> (expires_at, total).
+# Reused for Config.ADMIN_COUNT_CACHE_TTL seconds, so page turns do not re-count;
+# admin writes below clear it, other writers make it lag by at most the TTL.
+_COUNT_CACHE = OrderedDict()
+_COUNT_CACHE_MAX = 256
+_COUNT_CACHE_LOCK = threading.Lock()
+
+# (db, table) -> name of its FTS5 search index, or None if it cannot be built.
+# The lock is held across the one-time build, so each index is built once.
+_FTS_INDEXES = {}
+_FTS_INDEXES_LOCK = threading.Lock()
+
+# Shortest search served by the trigram index (shorter terms fall back to LIKE)
+FTS_MIN_SEARCH = 3
+
+
+def _cached_count(cur, table_name, where_stmt, params):
+    """(total, cached) for SELECT COUNT(*) over table_name + where_stmt."""
+    key = (str(Config.DB_PATH), table_name, where_stmt, tuple(params))
+    now = time.monotonic()
+    with _COUNT_CACHE_LOCK:
+        hit = _COUNT_CACHE.get(key)
+        if hit is not None and hit[0] > now:
+            _COUNT_CACHE.move_to_end(key)
+            return hit[1], True
+
+    cur.execute(f"SELECT COUNT(*) FROM {table_name}{where_stmt}", params)
+    total = cur.fetchone()[0]
+    with _COUNT_CACHE_LOCK:
+        _COUNT_CACHE[key] = (now + Config.ADMIN_COUNT_CACHE_TTL, total)
+        _COUNT_CACHE.move_to_end(key)
+        while len(_COUNT_CACHE) > _COUNT_CACHE_MAX:
+            _COUNT_CACHE.popitem(last=False)
+    return total, False
+
+
+def _invalidate_counts():
+    with _COUNT_CACHE_LOCK:
+        _COUNT_CACHE.clear()
+
+
+def _encode_cursor(sort_value, key_value):
+    """Opaque keyset cursor: the (sort column, primary key) of the last row served."""
+    raw = json.dumps([sort_value, key_value], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(token):
+    value = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    if not isinstance(value, list) or len(value) != 2:
+        raise ValueError("malformed cursor")
+    return value
+
+
+def _seek_clause(sort_by, key_col, sort_order, cursor):
+    """
+    WHERE clause for the rows after cursor in ORDER BY sort_by, key_col (both
+    sort_order). NULL sort values come first ascending and last descending.
+    """
+    sort_value, key_value = cursor
+    op = '<' if sort_order == 'DESC' else '>'
+    if sort_by == key_col:
+        return f"{key_col} {op} ?", [key_value]
+    if sort_value is None:
+        clause = f"({sort_by} IS NULL AND {key_col} {op} ?)"
+        if sort_order == 'ASC':
+            clause = f"({clause} OR {sort_by} IS NOT NULL)"
+        return clause, [key_value]
+    clause = f"{sort_by} {op} ? OR ({sort_by} = ? AND {key_col} {op} ?)"
+    if sort_order == 'DESC':
+        clause += f" OR {sort_by} IS NULL"
+    return f"({clause})", [sort_value, sort_value, key_value]
+
+
+def _build_search_index(conn, table_name, key_col, columns):
+    """Write job: external-content trigram FTS5 index over columns, kept in sync by triggers."""
+    fts = f"{table_name}_fts"
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+    cols = ", ".join(columns)
+    new_vals = ", ".join(f"new.{c}" for c in columns)
+    old_vals = ", ".join(f"old.{c}" for c in columns)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table_name}', content_rowid='{key_col}', tokenize='trigram'
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.{key_col}, {new_vals});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.{key_col}, {old_vals});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table_name} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.{key_col}, {old_vals});
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.{key_col}, {new_vals});
+        END
+    """)
+    if not exists:
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def _search_index(table_name, key_col, columns):
+    """Name of table_name's FTS5 search index (built on first use), or None to search with LIKE."""
+    if not Config.ADMIN_FTS_SEARCH or not columns or not key_col:
+        return None
+    key = (str(Config.DB_PATH), table_name)
+    with _FTS_INDEXES_LOCK:
+        if key not in _FTS_INDEXES:
+            try:
+                run_write(_build_search_index, table_name, key_col, tuple(columns))
+                _FTS_INDEXES[key] = f"{table_name}_fts"
+                logger.info(f"🔎 Built FTS5 search index for {table_name} ({', '.join(columns)})")
+            except sqlite3.Error as e:
+                # e.g. SQLite built without FTS5 / trigram tokenizer
+                logger.warning(f"FTS5 search unavailable for {table_name}: {e}")
+                _FTS_INDEXES[key] = None
+        return _FTS_INDEXES[key]
+
+def _update_record_job(conn, table_name, pk_col, update_data, record_id):
+    """Write job: update the editable fields of one admin-browser record."""
+    set_clause = ", ".join([f"{k} = ?" for k in update_data])
+    conn.execute(f"UPDATE {table_name} SET {set_clause} WHERE {pk_col} = ?", list(update_data.values()) + [record_id])
+
+
+def _delete_records_job(conn, table_name, pk_col, ids):
+    """Write job: delete admin-browser records by primary key; returns the number deleted."""
+    placeholders = ','.join(['?'] * len(ids))
+    return conn.execute(f"DELETE FROM {table_name} WHERE {pk_col} IN ({placeholders})", list(ids)).rowcount
+
+
+def _reset_user_data_job(conn, user_id):
+    """Write job: delete everything a user owns (sessions and their data, feedback)."""
+    # Order matters for FK
+    tables = ['allocations', 'students', 'uploads', 'allocation_sessions', 'allocation_history', 'feedback']
+    
+    for t in tables:
+        # User isolation deletion
+        if t == 'allocation_sessions':
+            conn.execute(f"DELETE FROM {t} WHERE user_id = ?", (user_id,))
+        elif t == 'uploads':
+            conn.execute(f"DELETE FROM {t} WHERE session_id IN (SELECT session_id FROM allocation_sessions WHERE user_id = ?)", (user_id,))
+        elif t == 'students':
+            conn.execute(f"DELETE FROM {t} WHERE upload_id IN (SELECT u.id FROM uploads u JOIN allocation_sessions s ON u.session_id = s.session_id WHERE s.user_id = ?)", (user_id,))
+        elif t == 'allocations':
+            conn.execute(f"DELETE FROM {t} WHERE session_id IN (SELECT session_id FROM allocation_sessions WHERE user_id = ?)", (user_id,))
+        elif t == 'allocation_history':
+            conn.execute(f"DELETE FROM {t} WHERE session_id IN (SELECT session_id FROM allocation_sessions WHERE user_id = ?)", (user_id,))
+        elif t == 'feedback':
+            conn.execute(f"DELETE FROM {t} WHERE user_id = ?", (user_id,))
+
 # --- ADMIN / SYSTEM ROUTES ---
 
 @admin_bp.route('/database/table/<table_name>', methods=['GET'])
 @token_required
 def get_table_data(table_name):
+    """
+    One page of a table for the admin browser.
+
+    With ?after=<cursor> (pagination.next_cursor of the previous page) the page
+    is fetched by keyset seek on (sort column, primary key), so deep pages cost
+    the same as the first; ?page=N without a cursor still uses OFFSET. Totals
+    per filter are cached briefly (pagination.total_cached).
+    """
     if table_name not in ALLOWED_TABLES:
         return jsonify({"success": False, "error": "Table not allowed"}), 403
     try:
@@ -196,6 +370,11 @@ def get_table_data(table_name):
         search = request.args.get('search', '').strip()
         sort_by = request.args.get('sort_by', 'id').strip()
         sort_order = 'DESC' if request.args.get('sort_order', 'DESC').upper() == 'DESC' else 'ASC'
+        after = request.args.get('after', '').strip()
+        try:
+            cursor = _decode_cursor(after) if after else None
+        except (ValueError, TypeError):
+            return jsonify({"success": False, "error": "Invalid cursor"}), 400
         
         conn = get_db_connection()
         conn.row_factory = sqlite3.Row
@@ -209,6 +388,10 @@ def get_table_data(table_name):
         # Validate sort_by
         if sort_by not in col_names:
             sort_by = col_names[0] if col_names else 'id'
+        
+        # Keyset pagination needs a single INTEGER PRIMARY KEY (the rowid) as tie-breaker
+        pk_cols = [c for c in columns if c['primary_key']]
+        key_col = pk_cols[0]['name'] if len(pk_cols) == 1 and pk_cols[0]['type'].upper() == 'INTEGER' else None
             
         # Build query with Data Isolation
         user_id = request.user_id
@@ -239,27 +422,42 @@ def get_table_data(table_name):
         # classrooms is global
 
         if search and searchable:
-            search_conditions = [f"{c} LIKE ?" for c in searchable if c in col_names]
-            if search_conditions:
+            search_cols = [c for c in searchable if c in col_names]
+            fts = _search_index(table_name, key_col, search_cols) if len(search) >= FTS_MIN_SEARCH else None
+            if fts:
+                # Trigram phrase match == case-insensitive substring match, like the LIKE below
+                where_clauses.append(f"{key_col} IN (SELECT rowid FROM {fts} WHERE {fts} MATCH ?)")
+                params.append('"' + search.replace('"', '""') + '"')
+            elif search_cols:
+                search_conditions = [f"{c} LIKE ?" for c in search_cols]
                 where_clauses.append(f"({' OR '.join(search_conditions)})")
                 params.extend([f"%{search}%" for _ in search_conditions])
 
         where_stmt = f" WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
-        base_query = f"SELECT * FROM {table_name}{where_stmt}"
-        count_query = f"SELECT COUNT(*) FROM {table_name}{where_stmt}"
-        
-        # Get total
-        cur.execute(count_query, params)
-        total = cur.fetchone()[0]
         
-        # Get data
-        base_query += f" ORDER BY {sort_by} {sort_order} LIMIT ? OFFSET ?"
-        params.extend([per_page, (page - 1) * per_page])
+        # Get total (cached per filter)
+        total, total_cached = _cached_count(cur, table_name, where_stmt, params)
         
-        cur.execute(base_query, params)
+        # Get data: seek past the cursor, or fall back to OFFSET for ?page=N
+        order_stmt = f" ORDER BY {sort_by} {sort_order}"
+        if key_col and key_col != sort_by:
+            order_stmt += f", {key_col} {sort_order}"
+        if cursor is not None and key_col:
+            seek, seek_params = _seek_clause(sort_by, key_col, sort_order, cursor)
+            seek_stmt = f"{where_stmt} AND {seek}" if where_stmt else f" WHERE {seek}"
+            cur.execute(f"SELECT * FROM {table_name}{seek_stmt}{order_stmt} LIMIT ?",
+                        params + seek_params + [per_page + 1])
+        else:
+            cur.execute(f"SELECT * FROM {table_name}{where_stmt}{order_stmt} LIMIT ? OFFSET ?",
+                        params + [per_page + 1, (page - 1) * per_page])
         data = [dict(r) for r in cur.fetchall()]
         conn.close()
         
+        has_more = len(data) > per_page
+        data = data[:per_page]
+        next_cursor = (_encode_cursor(data[-1][sort_by], data[-1][key_col])
+                       if has_more and key_col else None)
+        
         return jsonify({
             "success": True, 
             "columns": columns, 
@@ -268,7 +466,10 @@ def get_table_data(table_name):
                 "page": page, 
                 "per_page": per_page, 
                 "total": total, 
-                "pages": (total + per_page - 1) // per_page if per_page > 0 else 1
+                "total_cached": total_cached,
+                "pages": (total + per_page - 1) // per_page if per_page > 0 else 1,
+                "has_more": has_more,
+                "next_cursor": next_cursor
             }
         })
     except Exception as e:
@@ -315,7 +516,10 @@ def modify_record(table_name, record_id):
             if not cur.fetchone():
                 conn.close()
                 return jsonify({"success": False, "error": "Access denied or record not found"}), 403
+        conn.close()
 
+        # Use session_id for allocation_sessions table
+        pk_col = 'session_id' if table_name == 'allocation_sessions' else 'id'
         if request.method == 'PUT':
             data = request.get_json()
             editable = TABLE_CONFIG.get(table_name, {}).get('editable', [])
@@ -324,21 +528,13 @@ def modify_record(table_name, record_id):
             if not update_data:
                 return jsonify({"success": False, "error": "No editable fields"}), 400
             
-            set_clause = ", ".join([f"{k} = ?" for k in update_data])
-            # Use session_id for allocation_sessions table
-            pk_col = 'session_id' if table_name == 'allocation_sessions' else 'id'
-            cur.execute(f"UPDATE {table_name} SET {set_clause} WHERE {pk_col} = ?", list(update_data.values()) + [record_id])
-            
-            conn.commit()
-            conn.close()
+            run_write(_update_record_job, table_name, pk_col, update_data, record_id)
+            _invalidate_counts()
             return jsonify({"success": True, "message": "Updated"})
             
         elif request.method == 'DELETE':
-            pk_col = 'session_id' if table_name == 'allocation_sessions' else 'id'
-            cur.execute(f"DELETE FROM {table_name} WHERE {pk_col} = ?", (record_id,))
-            
-            conn.commit()
-            conn.close()
+            run_write(_delete_records_job, table_name, pk_col, [record_id])
+            _invalidate_counts()
             return jsonify({"success": True, "message": "Deleted"})
             
     except Exception as e:
@@ -379,21 +575,22 @@ def bulk_delete(table_name):
              ownership_query = f"SELECT id FROM {table_name} WHERE id IN ({placeholders})"
              ownership_params = ids
 
+        deleted = 0
         if ownership_query:
             cur.execute(ownership_query, ownership_params)
             valid_ids = [row[0] for row in cur.fetchall()]
+            conn.close()
             if not valid_ids:
-                conn.close()
                 return jsonify({"success": False, "error": "Access denied or records not found"}), 403
             
             # Delete only valid IDs
-            placeholders = ','.join(['?'] * len(valid_ids))
             pk_col = 'session_id' if table_name == 'allocation_sessions' else 'id'
-            cur.execute(f"DELETE FROM {table_name} WHERE {pk_col} IN ({placeholders})", valid_ids)
+            deleted = run_write(_delete_records_job, table_name, pk_col, valid_ids)
+        else:
+            conn.close()
         
-        conn.commit()
-        conn.close()
-        return jsonify({"success": True, "message": f"Deleted {cur.rowcount} records"})
+        _invalidate_counts()
+        return jsonify({"success": True, "message": f"Deleted {deleted} records"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -464,29 +661,8 @@ def export_table(table_name):
 @token_required
 def reset_data():
     try:
-        user_id = request.user_id
-        conn = get_db_connection()
-        cur = conn.cursor()
-        # Order matters for FK
-        tables = ['allocations', 'students', 'uploads', 'allocation_sessions', 'allocation_history', 'feedback']
-        
-        for t in tables:
-            # User isolation deletion
-            if t == 'allocation_sessions':
-                cur.execute(f"DELETE FROM {t} WHERE user_id = ?", (user_id,))
-            elif t == 'uploads':
-                cur.execute(f"DELETE FROM {t} WHERE session_id IN (SELECT session_id FROM allocation_sessions WHERE user_id = ?)", (user_id,))
-            elif t == 'students':
-                cur.execute(f"DELETE FROM {t} WHERE upload_id IN (SELECT u.id FROM uploads u JOIN allocation_sessions s ON u.session_id = s.session_id WHERE s.user_id = ?)", (user_id,))
-            elif t == 'allocations':
-                cur.execute(f"DELETE FROM {t} WHERE session_id IN (SELECT session_id FROM allocation_sessions WHERE user_id = ?)", (user_id,))
-            elif t == 'allocation_history':
-                cur.execute(f"DELETE FROM {t} WHERE session_id IN (SELECT session_id FROM allocation_sessions WHERE user_id = ?)", (user_id,))
-            elif t == 'feedback':
-                cur.execute(f"DELETE FROM {t} WHERE user_id = ?", (user_id,))
-            
-        conn.commit()
-        conn.close()
+        run_write(_reset_user_data_job, request.user_id)
+        _invalidate_counts()
         return jsonify({"status": "success", "message": "User data cleared"})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -1,11 +1,14 @@
 # Seating allocation endpoints.
 # Orchestrates the generation of seating plans and manages the session-specific manual caching.
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from algo.core.cache.cache_manager import CacheManager
 from algo.core.algorithm.seating import SeatingAlgorithm
 from algo.utils.helpers import parse_str_dict, parse_int_dict
 from algo.database.db import get_db_connection
+from algo.database.writer import run_write
 from algo.services.auth_service import token_required
+from algo.config.settings import Config
+import math
 import uuid
 import sqlite3
 
@@ -17,10 +20,10 @@ CACHE_MGR = CacheManager()
 # ============================================================================
 # HELPER: Get pending students for a session (delegates to query layer)
 # ============================================================================
-def get_pending_students(session_id):
-    """Get students not yet allocated in this session"""
+def get_pending_students(session_id, batch_names=None):
+    """Get students not yet allocated in this session (optionally only these batches)"""
     from algo.database.queries.student_queries import StudentQueries
-    return StudentQueries.get_pending_students(session_id)
+    return StudentQueries.get_pending_students(session_id, batch_names)
 
 
 def _get_verified_session(session_id, user_id, conn=None, fields='plan_id, user_id, status'):
@@ -56,6 +59,84 @@ def _get_verified_session(session_id, user_id, conn=None, fields='plan_id, user_
     
     return session, None
 
+
+# ============================================================================
+# WRITE JOBS (run through the single-writer queue, see database/writer.py)
+# ============================================================================
+def _claim_session_job(conn, session_id, user_id):
+    """Write job: take ownership of a session nobody owns yet."""
+    conn.execute("UPDATE allocation_sessions SET user_id = ? WHERE session_id = ? AND user_id IS NULL",
+                 (user_id, session_id))
+
+
+def _reset_allocation_job(conn, session_id):
+    """Write job: drop a session's allocations and its undo/redo journal."""
+    # allocated_count drops to 0 via the allocations delete trigger
+    conn.execute("DELETE FROM allocations WHERE session_id = ?", (session_id,))
+    # The undo/redo journal refers to the deleted rows
+    conn.execute("DELETE FROM allocation_history WHERE session_id = ?", (session_id,))
+
+
+def _add_external_student_job(conn, session_id, plan_id, room_no, seat_position, seat_row, seat_col,
+                              roll_number, student_name, batch_label, batch_color, paper_set):
+    """Write job: record an external student; returns its id, or None if the seat already has one."""
+    taken = conn.execute("""
+        SELECT id FROM external_students
+        WHERE session_id = ? AND room_no = ? AND seat_position = ?
+    """, (session_id, room_no, seat_position)).fetchone()
+    if taken:
+        return None
+    return conn.execute("""
+        INSERT INTO external_students
+        (session_id, plan_id, room_no, seat_position, seat_row, seat_col,
+         roll_number, student_name, batch_label, batch_color, paper_set)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (session_id, plan_id, room_no, seat_position, seat_row, seat_col,
+          roll_number, student_name, batch_label, batch_color, paper_set)).lastrowid
+
+
+def _remove_external_student_job(conn, session_id, room_no, seat_position):
+    """Write job: delete the external student at a seat."""
+    conn.execute("""
+        DELETE FROM external_students
+        WHERE session_id = ? AND room_no = ? AND seat_position = ?
+    """, (session_id, room_no, seat_position))
+
+
+def _repair_allocations_job(conn, session_id, changes, unplaced):
+    """
+    Write job: move relocated students to their new seats and drop the
+    allocations of students left without one. Returns the rolls that went
+    back to pending.
+    """
+    for change in changes:
+        if change['action'] == 'moved':
+            conn.execute("""
+                UPDATE allocations SET seat_position = ?, paper_set = ?
+                WHERE session_id = ? AND enrollment = ?
+            """, (f"{change['row'] + 1}-{change['col'] + 1}", change['paper_set'],
+                  session_id, change['roll_number']))
+    # Students left without a seat go back to the pending pool
+    returned_to_pending = []
+    for roll in unplaced:
+        cur = conn.execute("DELETE FROM allocations WHERE session_id = ? AND enrollment = ?", (session_id, roll))
+        if cur.rowcount:
+            returned_to_pending.append(roll)
+    return returned_to_pending
+
+def _parse_time_budget(data):
+    """
+    optimize_time_budget from a request body, capped at Config.OPTIMIZE_MAX_TIME_BUDGET.
+    Returns (seconds, error_response) — NaN, negative or non-numeric values are a 400.
+    """
+    try:
+        budget = float(data.get("optimize_time_budget", 0.5))
+    except (TypeError, ValueError):
+        budget = math.nan
+    if math.isnan(budget) or budget < 0:
+        return None, (jsonify({"error": "optimize_time_budget must be a number of seconds >= 0"}), 400)
+    return min(budget, Config.OPTIMIZE_MAX_TIME_BUDGET), None
+
 # ============================================================================
 # POST /api/generate-seating - SESSION-BASED SEATING GENERATION
 # ============================================================================
@@ -65,6 +146,8 @@ def generate_seating():
     """Generate seating - FILTER by selected batches only (LEGACY COMPATIBLE)"""
     try:
         data = request.get_json(force=True)
+        time_budget, err = _parse_time_budget(data)
+        if err: return err
         
         plan_id = data.get("plan_id")
         session_id = data.get("session_id")
@@ -99,10 +182,7 @@ def generate_seating():
                     from datetime import datetime, timedelta
                     created_time = datetime.fromisoformat(created[0])
                     if datetime.now() - created_time < timedelta(hours=1):
-                        cur.execute("""
-                            UPDATE allocation_sessions SET user_id = ? WHERE session_id = ?
-                        """, (request.user_id, session_id))
-                        conn.commit()
+                        run_write(_claim_session_job, session_id, request.user_id)
             elif owner_id != request.user_id:
                 conn.close()
                 return jsonify({"error": "Unauthorized session"}), 403
@@ -128,29 +208,23 @@ def generate_seating():
         if use_db and session_id:
             print(f"🔍 Selected batches: {selected_batch_names}")
             
-            # Get ONLY pending students
-            pending_students = get_pending_students(session_id)
-            
-            if not pending_students:
-                return jsonify({
-                    "error": "No pending students available",
-                    "message": "All students have been allocated.",
-                    "pending_count": 0
-                }), 400
-            
-            # CRITICAL FIX: Filter by selected batch names ONLY
-            filtered_students = [
-                s for s in pending_students 
-                if s.get('batch_name') in selected_batch_names
-            ]
+            # Get ONLY pending students of the selected batches (filtered in SQL)
+            filtered_students = get_pending_students(session_id, selected_batch_names)
             
             if not filtered_students:
+                from algo.database.queries.student_queries import StudentQueries
+                if StudentQueries.count_pending_students(session_id) == 0:
+                    return jsonify({
+                        "error": "No pending students available",
+                        "message": "All students have been allocated.",
+                        "pending_count": 0
+                    }), 400
                 return jsonify({
                     "error": "No pending students in selected batches",
                     "pending_count": 0
                 }), 400
             
-            print(f"📋 Filtered: {len(filtered_students)} / {len(pending_students)} pending")
+            print(f"📋 Pending in selected batches: {len(filtered_students)}")
             
             # Group by batch name
             batch_groups = {}
@@ -235,7 +309,8 @@ def generate_seating():
             'cols': int(data.get("cols", 6)),
             'block_width': int(data.get("block_width", 2)),
             'block_structure': data.get("block_structure"),  # Variable block widths
-            'broken_seats': broken_seats
+            'broken_seats': broken_seats,
+            'allow_adjacent_same_batch': bool(data.get("allow_adjacent_same_batch", False))
         }
 
         # [STEP 0] Resolve session plan_id ONCE (fixes double-lookup)
@@ -277,19 +352,24 @@ def generate_seating():
             batch_colors=colors,
             serial_mode=data.get("serial_mode", "per_batch"),
             serial_width=int(data.get("serial_width", 0)),
-            allow_adjacent_same_batch=bool(data.get("allow_adjacent_same_batch", False))
+            allow_adjacent_same_batch=bool(data.get("allow_adjacent_same_batch", False)),
+            optimize=bool(data.get("optimize", False)),
+            optimize_time_budget=time_budget,
+            seed=int(data["seed"]) if data.get("seed") is not None else None
         )
 
-        # Generate seating
+        # Generate seating (rows are rendered once: cached here, then streamed back)
         algo.generate_seating()
-        web = algo.to_web_format()
+        seating = list(algo.iter_web_rows())
+        web = {"seating": seating}
 
         # Add metadata
-        web.setdefault("metadata", {})
-        web["plan_id"] = plan_id
-        web["session_id"] = session_id
-        web["pending_count"] = total_pending
-        web["selected_batches"] = selected_batch_names
+        extra = {
+            "plan_id": plan_id,
+            "session_id": session_id,
+            "pending_count": total_pending,
+            "selected_batches": selected_batch_names,
+        }
         
         # Validate
         ok, errors = algo.validate_constraints()
@@ -299,7 +379,7 @@ def generate_seating():
             errors = algo.init_errors + errors
             ok = False # Critical initialization errors should invalidate the plan
             
-        web["validation"] = {"is_valid": ok, "errors": errors}
+        extra["validation"] = {"is_valid": ok, "errors": errors}
         
         # Cache result
         room_name = data.get('room_no') or data.get('room_name') or "N/A"
@@ -321,7 +401,7 @@ def generate_seating():
         
         print(f"✅ Seating generated for: {selected_batch_names}")
         
-        return jsonify(web)
+        return Response(stream_with_context(algo.iter_web_json(extra, seating)), mimetype='application/json')
         
     except Exception as e:
         import traceback
@@ -337,6 +417,8 @@ def manual_generate_seating():
     """Generate seating without DB (Manual Mode)"""
     try:
         data = request.get_json(force=True)
+        time_budget, err = _parse_time_budget(data)
+        if err: return err
         num_batches = int(data.get("num_batches", 3))
         
         # Parse batch student counts
@@ -414,25 +496,26 @@ def manual_generate_seating():
             batch_colors=parse_str_dict(data.get("batch_colors")),
             serial_mode=data.get("serial_mode", "per_batch"),
             serial_width=int(data.get("serial_width", 0)),
-            allow_adjacent_same_batch=bool(data.get("allow_adjacent_same_batch", False))
+            allow_adjacent_same_batch=bool(data.get("allow_adjacent_same_batch", False)),
+            optimize=bool(data.get("optimize", False)),
+            optimize_time_budget=time_budget,
+            seed=int(data["seed"]) if data.get("seed") is not None else None
         )
         
         algo.generate_seating()
-        web = algo.to_web_format()
-        
-        web.setdefault("metadata", {})
+        seating = list(algo.iter_web_rows())
         
         ok, errors = algo.validate_constraints()
-        web["validation"] = {"is_valid": ok, "errors": errors}
+        extra = {"validation": {"is_valid": ok, "errors": errors}}
         
         # Save to manual cache
         MANUAL_CACHE_FILE = "manual_seating_current"
         cm = CacheManager() 
-        cm.save_or_update(MANUAL_CACHE_FILE, data, web)
+        cm.save_or_update(MANUAL_CACHE_FILE, data, {"seating": seating})
         
         print(f"✅ Manual seating generated - Batches: {num_batches}")
         
-        return jsonify(web)
+        return Response(stream_with_context(algo.iter_web_json(extra, seating)), mimetype='application/json')
         
     except Exception as e:
         import traceback
@@ -477,21 +560,11 @@ def reset_allocation():
         return jsonify({"status": "error", "message": "Session ID required"}), 400
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
         # Verify ownership
-        session, err = _get_verified_session(session_id, request.user_id, conn, fields='user_id')
+        session, err = _get_verified_session(session_id, request.user_id, fields='user_id')
         if err: return err
 
-        cur.execute("DELETE FROM allocations WHERE session_id = ?", (session_id,))
-        cur.execute("""
-            UPDATE allocation_sessions 
-            SET allocated_count = 0 
-            WHERE session_id = ? AND user_id = ?
-        """, (session_id, request.user_id))
-        conn.commit()
-        conn.close()
+        run_write(_reset_allocation_job, session_id)
         return jsonify({"status": "success", "message": "Allocations reset"}), 200
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -534,12 +607,8 @@ def add_external_student(session_id, room_no):
                 "message": "Missing required fields: seat_position, seat_row, seat_col, roll_number, batch_label"
             }), 400
         
-        conn = get_db_connection()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        
         # 1. Verify session exists and user owns it
-        session, err = _get_verified_session(session_id, request.user_id, conn, fields='plan_id, user_id, status')
+        session, err = _get_verified_session(session_id, request.user_id, fields='plan_id, user_id, status')
         if err: return err
         
         plan_id, status = session['plan_id'], session['status']
@@ -548,11 +617,9 @@ def add_external_student(session_id, room_no):
         cached_data = CACHE_MGR.load_snapshot(plan_id)
         
         if not cached_data or 'rooms' not in cached_data:
-            conn.close()
             return jsonify({"status": "error", "message": "No cached seating plan found"}), 404
         
         if room_no not in cached_data['rooms']:
-            conn.close()
             return jsonify({"status": "error", "message": f"Room '{room_no}' not found in plan"}), 404
         
         room_data = cached_data['rooms'][room_no]
@@ -563,17 +630,14 @@ def add_external_student(session_id, room_no):
         cols = len(seating_matrix[0]) if rows > 0 else 0
         
         if seat_row < 0 or seat_row >= rows or seat_col < 0 or seat_col >= cols:
-            conn.close()
             return jsonify({"status": "error", "message": "Invalid seat coordinates"}), 400
         
         current_seat = seating_matrix[seat_row][seat_col]
         
         if current_seat.get('is_broken'):
-            conn.close()
             return jsonify({"status": "error", "message": "Cannot assign to a broken seat"}), 400
         
         if not current_seat.get('is_unallocated') and current_seat.get('roll_number'):
-            conn.close()
             return jsonify({
                 "status": "error", 
                 "message": f"Seat already allocated to {current_seat.get('roll_number')}"
@@ -583,29 +647,14 @@ def add_external_student(session_id, room_no):
         if not paper_set:
             paper_set = _calculate_paper_set_for_seat(seating_matrix, seat_row, seat_col)
         
-        # 4. Check for duplicate external student in same session/room/position
-        cur.execute("""
-            SELECT id FROM external_students 
-            WHERE session_id = ? AND room_no = ? AND seat_position = ?
-        """, (session_id, room_no, seat_position))
-        
-        if cur.fetchone():
-            conn.close()
+        # 4-5. Insert into external_students unless the seat already has one
+        #      (checked inside the write job so two requests cannot both take it)
+        external_id = run_write(_add_external_student_job, session_id, plan_id, room_no, seat_position,
+                                seat_row, seat_col, roll_number, student_name, batch_label, batch_color,
+                                paper_set)
+        if external_id is None:
             return jsonify({"status": "error", "message": "Seat already has an external student"}), 400
         
-        # 5. Insert into external_students table
-        cur.execute("""
-            INSERT INTO external_students 
-            (session_id, plan_id, room_no, seat_position, seat_row, seat_col, 
-             roll_number, student_name, batch_label, batch_color, paper_set)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (session_id, plan_id, room_no, seat_position, seat_row, seat_col,
-              roll_number, student_name, batch_label, batch_color, paper_set))
-        
-        external_id = cur.lastrowid
-        conn.commit()
-        conn.close()
-        
         # 6. Update cache with new student
         new_seat_data = {
             "position": seat_position,
@@ -673,15 +722,10 @@ def remove_external_student(session_id, room_no):
             return jsonify({"status": "error", "message": "External student not found at this seat"}), 404
         
         seat_row, seat_col = ext_row['seat_row'], ext_row['seat_col']
+        conn.close()
         
         # Delete from database
-        cur.execute("""
-            DELETE FROM external_students 
-            WHERE session_id = ? AND room_no = ? AND seat_position = ?
-        """, (session_id, room_no, seat_position))
-        
-        conn.commit()
-        conn.close()
+        run_write(_remove_external_student_job, session_id, room_no, seat_position)
         
         # Restore seat to unallocated state in cache
         empty_seat_data = {
@@ -712,6 +756,66 @@ def remove_external_student(session_id, room_no):
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@allocation_bp.route('/sessions/<int:session_id>/rooms/<room_no>/repair-seats', methods=['POST'])
+@token_required
+def repair_room_seats(session_id, room_no):
+    """
+    Apply newly broken / freed seats to an existing room plan.
+    Only students on newly broken seats are relocated; every other seat
+    (and therefore every other student's PDF row) stays untouched. Students
+    the room has no seat left for lose their allocation and return to pending.
+    """
+    try:
+        data = request.get_json(force=True)
+        broken = [(int(s[0]), int(s[1])) for s in data.get('broken_seats', []) if len(s) == 2]
+        freed = [(int(s[0]), int(s[1])) for s in data.get('freed_seats', []) if len(s) == 2]
+
+        if not broken and not freed:
+            return jsonify({"status": "error", "message": "broken_seats or freed_seats required"}), 400
+
+        session, err = _get_verified_session(session_id, request.user_id, fields='plan_id, user_id')
+        if err: return err
+
+        plan_id = session['plan_id']
+        cached_data = CACHE_MGR.load_snapshot(plan_id)
+        if not cached_data or room_no not in cached_data.get('rooms', {}):
+            return jsonify({"status": "error", "message": f"Room '{room_no}' not found in plan"}), 404
+
+        room_data = cached_data['rooms'][room_no]
+        # Snapshots from the cache are shared; edit a private copy of the matrix
+        seating_matrix = [[dict(seat) if seat else seat for seat in row] for row in room_data.get('raw_matrix', [])]
+        inputs = dict(room_data.get('inputs') or {})
+        rows = len(seating_matrix)
+        cols = len(seating_matrix[0]) if rows > 0 else 0
+
+        algo = SeatingAlgorithm(
+            rows=rows,
+            cols=cols,
+            num_batches=1,
+            block_width=int(inputs.get('block_width') or 2),
+            block_structure=inputs.get('block_structure'),
+            allow_adjacent_same_batch=bool(inputs.get('allow_adjacent_same_batch', False))
+        )
+        algo.load_web_plan(seating_matrix)
+        report = algo.repair_seating(broken_seats=broken, freed_seats=freed)
+
+        # Keep untouched seat dicts as they are; only rewrite the changed cells
+        for change in report['changes']:
+            r, c = change['row'], change['col']
+            seating_matrix[r][c] = algo.web_seat(r, c)
+        returned_to_pending = run_write(_repair_allocations_job, session_id, report['changes'], report['unplaced'])
+
+        inputs['broken_seats'] = sorted(algo.broken_seats)
+        CACHE_MGR.save_or_update(plan_id, inputs, {"seating": seating_matrix}, room_no)
+
+        return jsonify({"status": "success", **report, "returned_to_pending": returned_to_pending}), 200
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @allocation_bp.route('/sessions/<int:session_id>/external-students', methods=['GET'])
 @token_required
 def get_external_students(session_id):
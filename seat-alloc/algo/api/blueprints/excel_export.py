@@ -6,6 +6,8 @@
 # No metadata section — only inputs-derived data is used.
 
 import logging
+import threading
+from collections import OrderedDict
 from io import BytesIO
 from datetime import datetime
 
@@ -15,13 +17,18 @@ from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 
 from algo.services.auth_service import token_required
-from algo.core.cache.cache_manager import CacheManager
+from algo.core.cache.cache_manager import CacheManager, snapshot_etag
 
 excel_export_bp = Blueprint('excel_export', __name__, url_prefix='/api')
 logger = logging.getLogger(__name__)
 
 _cache_mgr = CacheManager()
 
+# Workbook bytes per plan version (snapshot_etag), so repeat exports skip openpyxl
+WORKBOOK_CACHE_SIZE = 16
+_workbook_cache = OrderedDict()
+_workbook_lock = threading.Lock()
+
 # ─────────────────────────────  style helpers  ────────────────────────────────
 
 def _fill(hex_colour: str) -> PatternFill:
@@ -409,6 +416,27 @@ def _verify_plan_ownership(plan_id: str, user_id: int) -> bool:
         return True
 
 
+def _cached_workbook(snapshot: dict, plan_id: str) -> BytesIO:
+    """build_excel_workbook(), memoised on the snapshot's version stamp."""
+    etag = snapshot_etag(snapshot)
+    if etag is None:
+        return build_excel_workbook(snapshot, plan_id)
+
+    with _workbook_lock:
+        data = _workbook_cache.get(etag)
+        if data is not None:
+            _workbook_cache.move_to_end(etag)
+            return BytesIO(data)
+
+    excel_buf = build_excel_workbook(snapshot, plan_id)
+    with _workbook_lock:
+        _workbook_cache[etag] = excel_buf.getvalue()
+        while len(_workbook_cache) > WORKBOOK_CACHE_SIZE:
+            _workbook_cache.popitem(last=False)
+    excel_buf.seek(0)
+    return excel_buf
+
+
 @excel_export_bp.route('/export-excel/<plan_id>', methods=['GET'])
 @token_required
 def export_excel(plan_id: str):
@@ -422,6 +450,11 @@ def export_excel(plan_id: str):
         if not _verify_plan_ownership(plan_id, request.user_id):
             return jsonify({'error': 'Access denied — you do not own this plan'}), 403
 
+        # Unchanged plan version: the client's copy is still current
+        etag = _cache_mgr.get_plan_etag(plan_id)
+        if etag and etag in request.if_none_match:
+            return '', 304
+
         snapshot = _cache_mgr.load_snapshot(plan_id)
         if not snapshot:
             return jsonify({
@@ -429,7 +462,7 @@ def export_excel(plan_id: str):
                 'hint':  'Re-generate the seating plan to refresh the cache.',
             }), 404
 
-        excel_buf = build_excel_workbook(snapshot, plan_id)
+        excel_buf = _cached_workbook(snapshot, plan_id)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename  = f'seating_{plan_id}_{timestamp}.xlsx'
 
@@ -440,6 +473,7 @@ def export_excel(plan_id: str):
             as_attachment=True,
             download_name=filename,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            etag=snapshot_etag(snapshot) or False,
         )
 
     except Exception as exc:
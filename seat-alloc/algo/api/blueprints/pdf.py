@@ -5,7 +5,7 @@ import logging
 from datetime import datetime
 from flask import Blueprint, request, jsonify, send_file
 from algo.services.auth_service import token_required
-from algo.core.cache.cache_manager import CacheManager
+from algo.core.cache.cache_manager import CacheManager, snapshot_etag
 
 pdf_bp = Blueprint('pdf', __name__, url_prefix='/api')
 logger = logging.getLogger(__name__)
@@ -62,43 +62,35 @@ def _verify_plan_ownership(plan_id: str, user_id: int) -> bool:
 # ============================================================================
 # HELPER: Get seating from cache
 # ============================================================================
+def _seating_payload(room_view):
+    """Seating payload for the single room of a CacheManager.room_view()."""
+    room_no, room_data = next(iter(room_view['rooms'].items()))
+    etag = snapshot_etag(room_view)
+    return {
+        'seating': room_data.get('raw_matrix', room_data.get('seating', [])),
+        'metadata': room_data.get('inputs', {}),
+        'batches': room_data.get('batches', {}),
+        'version_key': f"{etag}:{room_no}" if etag else None
+    }
+
+
 def get_seating_from_cache(plan_id, room_no=None):
-    """Retrieve seating data from cache"""
+    """Retrieve seating data from cache (reads only the requested room)"""
     try:
-        snapshot = CACHE_MGR.load_snapshot(plan_id)
-        if not snapshot:
-            return None
-        
-        rooms = snapshot.get('rooms', {})
-        
+        room_view = CACHE_MGR.load_room(plan_id, room_no)
+        if room_view:
+            return _seating_payload(room_view)
         if room_no:
-            # Specific room requested
-            room_data = rooms.get(room_no)
-            if room_data:
-                return {
-                    'seating': room_data.get('raw_matrix', room_data.get('seating', [])),
-                    'metadata': room_data.get('inputs', {}),
-                    'batches': room_data.get('batches', {})
-                }
             return None
-        else:
-            # Return first room if no specific room requested
-            if rooms:
-                first_room = list(rooms.keys())[0]
-                room_data = rooms[first_room]
-                return {
-                    'seating': room_data.get('raw_matrix', room_data.get('seating', [])),
-                    'metadata': room_data.get('inputs', {}),
-                    'batches': room_data.get('batches', {})
-                }
-            
-            # Fallback: maybe it's a direct structure
-            if snapshot.get('seating') or snapshot.get('raw_matrix'):
-                return {
-                    'seating': snapshot.get('raw_matrix', snapshot.get('seating', [])),
-                    'metadata': snapshot.get('metadata', snapshot.get('inputs', {})),
-                    'batches': snapshot.get('batches', {})
-                }
+
+        # Fallback: maybe it's a direct structure
+        snapshot = CACHE_MGR.load_snapshot(plan_id)
+        if snapshot and (snapshot.get('seating') or snapshot.get('raw_matrix')):
+            return {
+                'seating': snapshot.get('raw_matrix', snapshot.get('seating', [])),
+                'metadata': snapshot.get('metadata', snapshot.get('inputs', {})),
+                'batches': snapshot.get('batches', {})
+            }
         
         return None
     except Exception as e:
@@ -348,7 +340,8 @@ def generate_pdf():
             pdf_buffer = generate_seating_pdf_to_buffer(
                 data=seating_payload,
                 user_id=user_id,
-                template_name=template_name
+                template_name=template_name,
+                version_key=seating_payload.get('version_key')
             )
         except Exception as pdf_err:
             logger.error(f"❌ PDF generation failed: {str(pdf_err)}")
@@ -396,12 +389,18 @@ def get_plan_batches(plan_id):
             # For now, if not in cache, return error or empty
             return jsonify({"error": "Plan not found in cache"}), 404
             
-        return jsonify({
+        response = jsonify({
             "plan_id": plan_id,
             "rooms": all_rooms,
             "metadata": cache_data.get('metadata', {}),
             "inputs": cache_data.get('inputs', {})
         })
+        # Conditional GET: clients re-polling an unchanged plan get a 304
+        etag = snapshot_etag(cache_data)
+        if etag:
+            response.set_etag(etag)
+            response = response.make_conditional(request)
+        return response
         
     except Exception as e:
         logger.error(f"Error fetching plan batches: {e}")
@@ -451,10 +450,13 @@ def generate_pdf_batch():
         zip_buffer = _io.BytesIO()
 
         with zipfile.ZipFile(zip_buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
-            for room_name in room_names:
-                # Use hybrid mechanism for each room in batch
-                room_request = {**data, 'room_name': room_name}
-                room_payload, room_source = get_seating_data_hybrid(room_request)
+            # All cached rooms come from one snapshot load; hybrid lookup only for misses
+            for room_name, room_view in CACHE_MGR.iter_rooms(plan_id, room_names):
+                if room_view:
+                    room_payload, room_source = _seating_payload(room_view), "cache"
+                else:
+                    room_request = {**data, 'room_name': room_name}
+                    room_payload, room_source = get_seating_data_hybrid(room_request)
 
                 if not room_payload:
                     errors.append(f"Room '{room_name}' could not be retrieved")
@@ -466,7 +468,8 @@ def generate_pdf_batch():
                     pdf_buf = generate_seating_pdf_to_buffer(
                         data=room_payload,
                         user_id=str(data.get('user_id', request.user_id)),
-                        template_name=data.get('template_name', 'default')
+                        template_name=data.get('template_name', 'default'),
+                        version_key=room_payload.get('version_key')
                     )
                     safe_name = room_name.replace(' ', '_').replace('/', '-')
                     zf.writestr(f"seating_plan_{safe_name}.pdf", pdf_buf.read())
@@ -563,11 +566,14 @@ def generate_pdf_hierarchy():
         root = f"Plan_{plan_id}"
 
         with zipfile.ZipFile(zip_buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
-            for room_name in room_names:
+            for room_name, room_view in CACHE_MGR.iter_rooms(plan_id, room_names):
                 safe_room = room_name.replace(' ', '_').replace('/', '-')
                 room_dir = f"{root}/Rooms/{safe_room}"
 
-                room_payload, _ = get_seating_data_hybrid({**data, 'room_name': room_name})
+                if room_view:
+                    room_payload = _seating_payload(room_view)
+                else:
+                    room_payload, _ = get_seating_data_hybrid({**data, 'room_name': room_name})
                 if not room_payload:
                     errors.append(f"Room '{room_name}': data not found")
                     continue
@@ -577,7 +583,8 @@ def generate_pdf_hierarchy():
                     pdf_buf = generate_seating_pdf_to_buffer(
                         data=room_payload,
                         user_id=str(request.user_id),
-                        template_name=data.get('template_name', 'default')
+                        template_name=data.get('template_name', 'default'),
+                        version_key=room_payload.get('version_key')
                     )
                     zf.writestr(f"{room_dir}/Plan_PDF/Seating_Plan.pdf", pdf_buf.read())
                 except Exception as e:
@@ -18,7 +18,8 @@ Target schema (exam-seat-locator format):
         "date":           str,       ← user-supplied  e.g. "02-07-2026"
         "time_slot":      str,       ← user-supplied  e.g. "09:00-12:00"
         "active_rooms":   [str, ...],
-        "status":         str
+        "status":         str,
+        "etag":           str | null  ← plan version stamp (changes on every cache write)
     },
     "inputs": {
         "room_configs": {
@@ -42,13 +43,16 @@ Target schema (exam-seat-locator format):
 }
 """
 
+import hashlib
 import json
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
 from flask import Blueprint, request, jsonify
 from algo.services.auth_service import token_required
-from algo.core.cache.cache_manager import CacheManager
+from algo.core.cache.cache_manager import CacheManager, snapshot_etag
 from algo.services.cloud_sync_service import CloudSyncService
 
 logger = logging.getLogger(__name__)
@@ -57,6 +61,12 @@ publish_plan_bp = Blueprint("publish_plan", __name__, url_prefix="/api/plans")
 
 _CACHE_MGR = CacheManager()
 
+# (etag, date, time_slot) -> (transformed payload, sha256): re-publishing an
+# unchanged plan skips the transform and the payload hash
+_TRANSFORM_CACHE_SIZE = 16
+_transform_cache = OrderedDict()
+_transform_lock = threading.Lock()
+
 # Fields to keep per student (everything else is dropped)
 _STUDENT_KEEP_FIELDS = {
     "position",
@@ -113,6 +123,7 @@ def _transform(plan: dict, date: str, time_slot: str) -> dict:
         "time_slot":      time_slot,
         "active_rooms":   active_rooms,
         "status":         raw_meta.get("status", "FINALIZED"),
+        "etag":           snapshot_etag(plan),
     }
 
     # ── inputs (only room_configs) ────────────────────────────────────────────
@@ -146,6 +157,35 @@ def _transform(plan: dict, date: str, time_slot: str) -> dict:
     }
 
 
+def _payload_sha256(transformed: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(transformed, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def _transform_cached(plan: dict, date: str, time_slot: str):
+    """_transform() plus payload sha256, memoised on the plan's version stamp."""
+    etag = snapshot_etag(plan)
+    if etag is None:
+        transformed = _transform(plan, date, time_slot)
+        return transformed, _payload_sha256(transformed)
+
+    key = (etag, date, time_slot)
+    with _transform_lock:
+        hit = _transform_cache.get(key)
+        if hit is not None:
+            _transform_cache.move_to_end(key)
+            return hit
+
+    transformed = _transform(plan, date, time_slot)
+    result = (transformed, _payload_sha256(transformed))
+    with _transform_lock:
+        _transform_cache[key] = result
+        while len(_transform_cache) > _TRANSFORM_CACHE_SIZE:
+            _transform_cache.popitem(last=False)
+    return result
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Route
 # ─────────────────────────────────────────────────────────────────────────────
@@ -177,7 +217,7 @@ def publish_plan(plan_id: str):
 
     # ── transform in-memory ───────────────────────────────────────────────────
     try:
-        transformed = _transform(plan, date, time_slot)
+        transformed, payload_sha256 = _transform_cached(plan, date, time_slot)
     except Exception as exc:
         logger.error(f"Transform failed for {plan_id}: {exc}", exc_info=True)
         return jsonify({"success": False, "error": f"Transform error: {exc}"}), 500
@@ -188,6 +228,7 @@ def publish_plan(plan_id: str):
         transformed_payload=transformed,
         date=date,
         time_slot=time_slot,
+        payload_sha256=payload_sha256,
     )
 
     if not sync_result.get("success", False):
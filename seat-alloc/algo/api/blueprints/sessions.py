@@ -15,6 +15,7 @@ from algo.services.auth_service import token_required
 from algo.services import SessionService, AllocationService
 from algo.core.cache.cache_manager import CacheManager
 from algo.database.queries.allocation_queries import AllocationQueries
+from algo.database.writer import run_write
 
 CACHE_MGR = CacheManager()
 
@@ -112,21 +113,14 @@ def createSession(user_id=None, plan_id=None, upload_ids=None):
         # Create session via query layer (single source of truth for INSERT)
         session_id = SessionQueries.create_session(plan_id, user_id)
         
-        # Link uploads and count students
+        # Link uploads (total_students follows via trigger)
         db = get_db()
-        total_students = 0
-        if upload_ids:
-            for upload_id in upload_ids:
-                db.execute("UPDATE uploads SET session_id = ? WHERE id = ?", (session_id, upload_id))
-            
-            placeholders = ','.join('?' * len(upload_ids))
-            cursor = db.execute(f"SELECT COUNT(*) FROM students WHERE upload_id IN ({placeholders})", upload_ids)
-            total_students = cursor.fetchone()[0] or 0
-            
-            SessionQueries.update_session_stats(session_id, total_students, 0)
-        
+        for upload_id in upload_ids:
+            db.execute("UPDATE uploads SET session_id = ? WHERE id = ?", (session_id, upload_id))
         db.commit()
         
+        total_students, _ = SessionQueries.get_session_counters(session_id)
+        
         print(f"✅ createSession: Created session {session_id} with {total_students} students")
         
         return {
@@ -412,7 +406,7 @@ def refresh_session_totals(session_id):
     if not _verify_session_owner(session_id, user_id):
         return jsonify({"success": False, "error": "Access denied - you do not own this session"}), 403
     
-    result = SessionService.update_stats(session_id)
+    result = SessionService.update_stats(session_id, rebuild=True)
     status = 200 if result['success'] else 500
     return jsonify(result), status
 
@@ -492,6 +486,16 @@ def heartbeat(session_id):
 # ============================================================================
 # ROUTE: POST /api/sessions/<id>/finalize
 # ============================================================================
+def _finalize_session_job(conn, session_id):
+    """Write job: mark an active session completed; returns False if it no longer was active."""
+    cur = conn.execute("""
+        UPDATE allocation_sessions
+        SET status = 'completed', last_activity = ?
+        WHERE session_id = ? AND status = 'active'
+    """, (datetime.now().isoformat(), session_id))
+    return cur.rowcount > 0
+
+
 @session_bp.route('/<int:session_id>/finalize', methods=['POST'])
 @token_required
 def finalize_session(session_id):
@@ -529,16 +533,11 @@ def finalize_session(session_id):
         """, (session_id,))
         
         allocated_rooms = [row['name'] for row in cur.fetchall()]
+        conn.close()
         
         # Update status
-        cur.execute("""
-            UPDATE allocation_sessions
-            SET status = 'completed', last_activity = ?
-            WHERE session_id = ?
-        """, (datetime.now().isoformat(), session_id))
-        
-        conn.commit()
-        conn.close()
+        if not run_write(_finalize_session_job, session_id):
+            return jsonify({"success": False, "error": "Session is no longer active"}), 400
         
         # ✅ FIX: Finalize rooms in Cache (Prune experimental rooms and mark as FINALIZED)
         plan_id = session['plan_id']
@@ -634,6 +633,32 @@ def undo_last_action(session_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+# ============================================================================
+# ROUTE: POST /api/sessions/<id>/redo
+# ============================================================================
+@session_bp.route('/<int:session_id>/redo', methods=['POST'])
+@token_required
+def redo_last_action(session_id):
+    """Redo the last undone room allocation (uses AllocationService)"""
+    try:
+        user_id = _get_user_id()
+        if not _verify_session_owner(session_id, user_id):
+            return jsonify({"success": False, "error": "Access denied - you do not own this session"}), 403
+        
+        result = AllocationService.redo_allocation(session_id)
+        
+        if result.get('success'):
+            print(f"↪️ Redid allocation: {result.get('message')}")
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 # ============================================================================
 # ROUTE: GET /api/sessions/list (get all sessions)
 # ============================================================================
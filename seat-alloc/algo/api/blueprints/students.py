@@ -1,6 +1,8 @@
 # api/blueprints/students.py - FIXED VERSION
 from flask import Blueprint, request, jsonify
 from algo.services.auth_service import token_required
+from algo.database.queries.student_queries import StudentQueries
+from algo.database.writer import run_write
 import logging
 import os
 import json
@@ -144,84 +146,54 @@ def commit_upload():
         filename = parse_data.get('source_filename', 'uploaded_file')
         students_raw = parse_data['data'].get(batch_name, [])
         
-        conn = _get_conn()
-        cur = conn.cursor()
-        
-        try:
+        def _commit_job(conn):
             # 1. Create upload record
-            cur.execute("""
+            cur = conn.execute("""
                 INSERT INTO uploads (session_id, batch_id, batch_name, semester, original_filename, file_size, batch_color)
                 VALUES (?, ?, ?, ?, ?, 0, ?)
             """, (session_id, batch_id, batch_name, semester_name, filename, batch_color))
-            
             upload_id = cur.lastrowid
             
-            # 2. Bulk insert students
-            inserted = 0
-            for s in students_raw:
-                enrollment = s.get('enrollmentNo') or s.get('enrollment')
-                if not enrollment:
-                    continue
-                    
-                try:
-                    cur.execute("""
-                        INSERT INTO students (upload_id, batch_id, batch_name, enrollment, name, batch_color, department)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        upload_id,
-                        batch_id,
-                        batch_name,
-                        str(enrollment).strip(),
-                        s.get('name', ''),
-                        batch_color,
-                        s.get('department', '')
-                    ))
-                    inserted += 1
-                except Exception as insert_err:
-                    logger.warning(f"Skip duplicate: {enrollment}")
+            # 2. Bulk insert students (same transaction as the upload row)
+            rows = (
+                (upload_id, batch_id, batch_name, str(enrollment).strip(),
+                 s.get('name', ''), batch_color, s.get('department', ''))
+                for s in students_raw
+                if (enrollment := s.get('enrollmentNo') or s.get('enrollment'))
+            )
+            inserted, duplicates = StudentQueries.bulk_insert_students(rows, conn=conn)
             
-            # ✅ CRITICAL FIX: Update session total_students if linked to session
+            # Session total_students is bumped per row by the students insert trigger
             if session_id:
-                cur.execute("""
-                    SELECT COUNT(*) FROM students s
-                    JOIN uploads u ON s.upload_id = u.id
-                    WHERE u.session_id = ?
-                """, (session_id,))
-                new_total = cur.fetchone()[0] or 0
-                
-                cur.execute("""
-                    UPDATE allocation_sessions
-                    SET total_students = ?, last_activity = CURRENT_TIMESTAMP
+                conn.execute("""
+                    UPDATE allocation_sessions SET last_activity = CURRENT_TIMESTAMP
                     WHERE session_id = ?
-                """, (new_total, session_id))
-                
-                logger.info(f"📊 Updated session {session_id} total to {new_total}")
-            
-            conn.commit()
-            
-            # Cleanup temp file
-            try:
-                os.remove(temp_file)
-            except:
-                pass
-            
-            logger.info(f"✅ Committed {inserted} students from batch {batch_name}")
-            
-            return jsonify({
-                "success": True,
-                "upload_id": upload_id,
-                "batch_id": batch_id,
-                "batch_name": batch_name,
-                "batch_color": batch_color,
-                "inserted": inserted,
-                "session_id": session_id
-            }), 200
-            
-        except Exception as db_err:
-            conn.rollback()
-            raise db_err
-        finally:
-            conn.close()
+                """, (session_id,))
+            return upload_id, inserted, duplicates
+        
+        # One job on the single-writer queue: committed together, or not at all
+        upload_id, inserted, duplicates = run_write(_commit_job)
+        if duplicates:
+            logger.warning(f"Skipped {duplicates} duplicate enrollment(s) in batch {batch_name}")
+        
+        # Cleanup temp file
+        try:
+            os.remove(temp_file)
+        except:
+            pass
+        
+        logger.info(f"✅ Committed {inserted} students from batch {batch_name}")
+        
+        return jsonify({
+            "success": True,
+            "upload_id": upload_id,
+            "batch_id": batch_id,
+            "batch_name": batch_name,
+            "batch_color": batch_color,
+            "inserted": inserted,
+            "duplicates": duplicates,
+            "session_id": session_id
+        }), 200
         
     except Exception as e:
         logger.error(f"Commit error: {e}")
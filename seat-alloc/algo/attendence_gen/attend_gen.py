@@ -244,11 +244,10 @@ def process_and_generate_from_cache(plan_id, frontend_metadata=None):
     CLEANED: Uses the structured 'batches' directly from CacheManager.
     No more regex parsing or manual batching loops here.
     """
-    file_path = os.path.join(CACHE_DIR, f"{plan_id}.json")
-    if not os.path.exists(file_path): return None
-
-    with open(file_path, 'r') as f:
-        json_data = json.load(f)
+    # Plans may be stored sharded (manifest + per-room files); let CacheManager assemble them
+    from algo.core.cache.cache_manager import CacheManager
+    json_data = CacheManager().load_snapshot(plan_id, silent=True)
+    if json_data is None: return None
 
     # 1. Directly access pre-structured batches
     batches = json_data.get('batches', {})
@@ -19,11 +19,31 @@ class Config:
     # Database
     DB_NAME = "demo.db"
     DB_PATH = BASE_DIR / DB_NAME
+    # Idle SQLite connections kept per database file by algo.database.pool
+    DB_POOL_MAX_IDLE = int(os.getenv('DB_POOL_MAX_IDLE', '8'))
+    # Route upload/allocation writes through the single-writer queue (algo.database.writer)
+    DB_WRITE_QUEUE = os.getenv('DB_WRITE_QUEUE', 'true').strip().lower() in ('1', 'true', 'yes')
+    # Most queued write jobs folded into one group commit
+    DB_WRITE_BATCH_MAX = int(os.getenv('DB_WRITE_BATCH_MAX', '64'))
+    
+    # Seconds the admin table browser reuses a filtered row count
+    ADMIN_COUNT_CACHE_TTL = float(os.getenv('ADMIN_COUNT_CACHE_TTL', '30'))
+    # Trigram FTS5 index for admin table search (built on first search, kept by triggers)
+    ADMIN_FTS_SEARCH = os.getenv('ADMIN_FTS_SEARCH', 'false').strip().lower() in ('1', 'true', 'yes')
+    
+    # Seconds token_required may reuse a decoded JWT / a user's live role
+    AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', '30'))
+    
+    # Upper bound (seconds) on a request's optimize_time_budget for the seating optimizer
+    OPTIMIZE_MAX_TIME_BUDGET = float(os.getenv('OPTIMIZE_MAX_TIME_BUDGET', '5'))
     
     # File Uploads
     FEEDBACK_FOLDER = BASE_DIR / "feedback_files"
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
     
+    # Plan snapshot cache (algo/cache): compression of room shards, "none" | "gzip" | "zstd"
+    CACHE_COMPRESSION = os.getenv('CACHE_COMPRESSION', 'none').strip().lower()
+    
     # Logging
     LOG_FILE = BASE_DIR / "app.log"
     LOG_LEVEL = "INFO"
@@ -0,0 +1,279 @@
+# Constraint-optimising post-pass for the seating algorithm.
+# Runs a bounded simulated-annealing search over seat swaps and paper-set flips,
+# scoring every candidate move incrementally (only the touched seats and their
+# neighbours are re-evaluated), so each move costs O(1) instead of a full
+# validate_constraints() pass over the grid.
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Neighbour relation kinds
+NEIGHBOUR_BLOCK = 0   # horizontal, same block (batch isolation applies)
+NEIGHBOUR_ACROSS = 1  # horizontal, across an aisle/block boundary
+NEIGHBOUR_VERTICAL = 2
+
+PAPER_A = 0
+PAPER_B = 1
+
+
+class SeatSwapOptimizer:
+    """
+    Minimises same-batch adjacency and same-paper-set clashes on a seating grid.
+
+    Cost model (all weights are per offending neighbour pair):
+      - same batch label side-by-side inside a block  -> adjacency_weight
+        (skipped when allow_adjacent_same_batch is set)
+      - same batch label, same paper set, physically adjacent
+        (horizontal or vertical)                       -> paper_set_weight
+      - student that could not be given a seat        -> unseated_weight
+
+    Moves:
+      - swap the occupants of two seats (student<->student or student<->empty)
+      - flip the paper set of one occupied seat
+
+    Each move touches at most two seats with at most four neighbours each, so
+    the delta is computed in constant time.
+    """
+
+    def __init__(
+        self,
+        rows: int,
+        cols: int,
+        col_to_block: Dict[int, int],
+        broken_seats,
+        allow_adjacent_same_batch: bool = False,
+        adjacency_weight: int = 10,
+        paper_set_weight: int = 10,
+        unseated_weight: int = 100,
+        rng: Optional[random.Random] = None,
+    ):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.allow_adjacent_same_batch = allow_adjacent_same_batch
+        self.adjacency_weight = adjacency_weight
+        self.paper_set_weight = paper_set_weight
+        self.unseated_weight = unseated_weight
+        self.rng = rng or random.Random()
+
+        self.broken = [False] * self.size
+        for r, c in broken_seats:
+            if 0 <= r < rows and 0 <= c < cols:
+                self.broken[r * cols + c] = True
+
+        # Precompute neighbour lists: idx -> [(neighbour_idx, kind), ...]
+        self.neighbours: List[List[Tuple[int, int]]] = [[] for _ in range(self.size)]
+        for r in range(rows):
+            for c in range(cols):
+                i = r * cols + c
+                if c > 0:
+                    kind = NEIGHBOUR_BLOCK if col_to_block.get(c - 1, 0) == col_to_block.get(c, 0) else NEIGHBOUR_ACROSS
+                    self.neighbours[i].append((i - 1, kind))
+                if c < cols - 1:
+                    kind = NEIGHBOUR_BLOCK if col_to_block.get(c + 1, 0) == col_to_block.get(c, 0) else NEIGHBOUR_ACROSS
+                    self.neighbours[i].append((i + 1, kind))
+                if r > 0:
+                    self.neighbours[i].append((i - cols, NEIGHBOUR_VERTICAL))
+                if r < rows - 1:
+                    self.neighbours[i].append((i + cols, NEIGHBOUR_VERTICAL))
+
+        # Grid state (flat): occupant payloads, label ids and paper sets
+        self.occupant: List[Optional[dict]] = [None] * self.size
+        self.label: List[int] = [-1] * self.size   # -1 = empty / broken
+        self.paper: List[int] = [PAPER_A] * self.size
+        self.unseated: List[Tuple[int, dict]] = []
+
+    # ------------------ state loading ------------------ #
+
+    def place(self, row: int, col: int, label_id: int, paper: int, payload: dict):
+        i = row * self.cols + col
+        self.occupant[i] = payload
+        self.label[i] = label_id
+        self.paper[i] = paper
+
+    # ------------------ incremental scoring ------------------ #
+
+    def _pair_cost(self, i: int, j: int, kind: int) -> int:
+        li = self.label[i]
+        if li < 0 or li != self.label[j]:
+            return 0
+        cost = 0
+        if kind == NEIGHBOUR_BLOCK and not self.allow_adjacent_same_batch:
+            cost += self.adjacency_weight
+        if self.paper[i] == self.paper[j]:
+            cost += self.paper_set_weight
+        return cost
+
+    def _local_cost(self, i: int) -> int:
+        if self.label[i] < 0:
+            return 0
+        return sum(self._pair_cost(i, j, kind) for j, kind in self.neighbours[i])
+
+    def _pair_kind(self, i: int, j: int) -> Optional[int]:
+        for n, kind in self.neighbours[i]:
+            if n == j:
+                return kind
+        return None
+
+    def _swap_region_cost(self, i: int, j: int) -> int:
+        cost = self._local_cost(i) + self._local_cost(j)
+        kind = self._pair_kind(i, j)
+        if kind is not None:
+            # The i-j pair was counted from both sides
+            cost -= self._pair_cost(i, j, kind)
+        return cost
+
+    def total_cost(self) -> int:
+        pairs = 0
+        for i in range(self.size):
+            for j, kind in self.neighbours[i]:
+                if j > i:
+                    pairs += self._pair_cost(i, j, kind)
+        return pairs + self.unseated_weight * len(self.unseated)
+
+    def _swap(self, i: int, j: int):
+        self.occupant[i], self.occupant[j] = self.occupant[j], self.occupant[i]
+        self.label[i], self.label[j] = self.label[j], self.label[i]
+        self.paper[i], self.paper[j] = self.paper[j], self.paper[i]
+
+    # ------------------ greedy start ------------------ #
+
+    def seat_overflow(self, pending: List[Tuple[int, dict]]):
+        """Greedily seat students that the column fill could not place.
+
+        Each student goes to the free seat where it adds the least cost, trying
+        both paper sets. Students left over once the room is full stay unseated.
+        """
+        free = [i for i in range(self.size) if not self.broken[i] and self.occupant[i] is None]
+        for label_id, payload in pending:
+            if not free:
+                self.unseated.append((label_id, payload))
+                continue
+            best = None
+            for pos, i in enumerate(free):
+                self.label[i] = label_id
+                for paper in (PAPER_A, PAPER_B):
+                    self.paper[i] = paper
+                    cost = self._local_cost(i)
+                    if best is None or cost < best[0]:
+                        best = (cost, pos, paper)
+                self.label[i] = -1
+                if best[0] == 0:
+                    break
+            _, pos, paper = best
+            i = free.pop(pos)
+            self.place(i // self.cols, i % self.cols, label_id, paper, payload)
+
+    # ------------------ local search ------------------ #
+
+    def optimize(
+        self,
+        time_budget: Optional[float] = 0.5,
+        max_iterations: Optional[int] = None,
+        start_temperature: float = 10.0,
+        end_temperature: float = 0.05,
+    ) -> Dict:
+        """Simulated annealing over swaps/flips until cost hits 0 or the budget runs out.
+
+        With time_budget=None the search never looks at the clock: temperature
+        follows the iteration count and it stops after max_iterations, so the
+        same RNG seed always gives the same result. Otherwise it cools on
+        wall-clock time and stops at the deadline (or max_iterations if sooner).
+        """
+        if time_budget is None and max_iterations is None:
+            raise ValueError("a clock-free search needs max_iterations")
+        started = time.perf_counter()
+        deadline = None if time_budget is None else started + max(0.0, time_budget)
+        cost = self.total_cost()
+        initial_cost = cost
+        best_cost = cost
+        best_state = self._snapshot()
+
+        seats = [i for i in range(self.size) if not self.broken[i]]
+        occupied = [i for i in seats if self.occupant[i] is not None]
+        occupied_slot = {idx: k for k, idx in enumerate(occupied)}
+        iterations = accepted = 0
+        temperature = start_temperature
+        cooling = math.log(end_temperature / start_temperature)
+
+        if len(seats) >= 2 and occupied:
+            rng = self.rng
+            while cost > 0:
+                if max_iterations is not None and iterations >= max_iterations:
+                    break
+                if iterations & 255 == 0:
+                    if deadline is None:
+                        progress = iterations / max(max_iterations, 1)
+                    else:
+                        now = time.perf_counter()
+                        if now >= deadline:
+                            break
+                        progress = (now - started) / max(time_budget, 1e-9)
+                    temperature = start_temperature * math.exp(cooling * min(progress, 1.0))
+                iterations += 1
+
+                i = rng.choice(occupied)
+                if rng.random() < 0.3:
+                    # Paper set flip
+                    before = self._local_cost(i)
+                    self.paper[i] ^= 1
+                    delta = self._local_cost(i) - before
+                    if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                        cost += delta
+                        accepted += 1
+                    else:
+                        self.paper[i] ^= 1
+                        continue
+                else:
+                    j = rng.choice(seats)
+                    if i == j or self.label[i] == self.label[j]:
+                        continue
+                    before = self._swap_region_cost(i, j)
+                    self._swap(i, j)
+                    delta = self._swap_region_cost(i, j) - before
+                    if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                        cost += delta
+                        accepted += 1
+                        if self.occupant[i] is None:
+                            # Student moved i -> j; keep the occupied index list in sync
+                            k = occupied_slot.pop(i)
+                            occupied[k] = j
+                            occupied_slot[j] = k
+                    else:
+                        self._swap(i, j)
+                        continue
+
+                if cost < best_cost:
+                    best_cost = cost
+                    best_state = self._snapshot()
+
+        self._restore(best_state)
+        stats = {
+            "initial_cost": initial_cost,
+            "final_cost": best_cost,
+            "iterations": iterations,
+            "accepted_moves": accepted,
+            "unseated": len(self.unseated),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        logger.debug(f"Seat optimizer: {stats}")
+        return stats
+
+    def _snapshot(self):
+        return (list(self.occupant), list(self.label), list(self.paper))
+
+    def _restore(self, state):
+        self.occupant, self.label, self.paper = (list(s) for s in state)
+
+    # ------------------ result ------------------ #
+
+    def cells(self):
+        """Yield (row, col, label_id, paper, payload) for every non-broken seat."""
+        for i in range(self.size):
+            if self.broken[i]:
+                continue
+            yield i // self.cols, i % self.cols, self.label[i], self.paper[i], self.occupant[i]
@@ -1,16 +1,68 @@
 # Core seating allocation algorithm.
 # Implements the logic for placing students in rows/columns with batch constraints and paper set alternation.
+import copy
+import hashlib
+import json
 import math
+import random
 import re
-from typing import List, Dict, Tuple, Optional
-from collections import deque
+import threading
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
+from collections import deque, OrderedDict
 import logging
 
 from algo.core.models.allocation import Seat, PaperSet
+from algo.core.algorithm.optimizer import SeatSwapOptimizer, PAPER_A, PAPER_B
 
 logger = logging.getLogger(__name__)
 
+_TRAILING_DIGITS = re.compile(r"(\d+)$")
+_HAS_UPPERCASE = re.compile(r"[A-Z]")
+# Placeholder substituted for {serial} while compiling a template
+_SERIAL_SLOT = "\x00"
+DEFAULT_ROLL_TEMPLATE = "{prefix}{year}O{serial}"
+
+
+class CompiledRollTemplate:
+    """
+    A roll-number template resolved once into static parts around the serial slot.
+
+    '{prefix}{year}O{serial}' with prefix='BTCS', year=24 compiles to
+    parts=['BTCS24O', ''], so rendering a serial is a single str.join instead of
+    a str.format call per student.
+    """
+
+    __slots__ = ("template", "parts", "serial_width", "error")
+
+    def __init__(self, template: str, prefix: str = "", year=None, serial_width: int = 0):
+        self.template = template
+        self.serial_width = serial_width
+        self.error: Optional[str] = None
+        try:
+            resolved = template.format(prefix=prefix, year=year or "", serial=_SERIAL_SLOT)
+            self.parts = resolved.split(_SERIAL_SLOT)
+        except (KeyError, IndexError, ValueError) as e:
+            # Same fallback as before: treat the template literally around '{serial}'
+            self.error = f"Invalid roll template '{template}': {e!r}; using literal '{{serial}}' substitution"
+            self.parts = template.split("{serial}")
+
+    def render(self, serial: int) -> str:
+        serial_str = str(serial).zfill(self.serial_width) if self.serial_width else str(serial)
+        return serial_str.join(self.parts)
+
+    def render_range(self, start: int, count: int) -> List[str]:
+        """Generate `count` consecutive rolls starting at serial `start`."""
+        return [self.render(serial) for serial in range(start, start + count)]
+
+
 class SeatingAlgorithm:
+    # Memoised plans keyed by input fingerprint (only for reproducible inputs)
+    PLAN_CACHE_SIZE = 64
+    _plan_cache: "OrderedDict[str, Dict]" = OrderedDict()
+    _plan_cache_lock = threading.Lock()
+    # Seeded optimize runs are bounded by iterations, not time (about 0.4 s on a 20x20 room)
+    SEEDED_OPTIMIZE_ITERATIONS = 100_000
+
     # Default batch colors (can be customized)
     DEFAULT_BATCH_COLORS = {
         1: "#BFDBFE",  # Blue (Tailwind 200)
@@ -52,6 +104,12 @@ class SeatingAlgorithm:
         batch_roll_numbers: Optional[Dict[int, List[str]]] = None,
         # NEW: Allow adjacent seating for same batch (useful for single-batch scenarios)
         allow_adjacent_same_batch: bool = False,
+        # NEW: Constraint-optimising mode (greedy fill + bounded local search)
+        optimize: bool = False,
+        optimize_time_budget: float = 0.5,
+        optimize_max_iterations: Optional[int] = None,
+        # NEW: Seed for randomize_column / optimize; same inputs + seed -> same plan
+        seed: Optional[int] = None,
     ):
         """
         rows, cols, num_batches: as before
@@ -70,6 +128,15 @@ class SeatingAlgorithm:
                      e.g. {1: "CSE", 2: "ECE"}
         batch_roll_numbers: OPTIONAL: if provided, these are the actual roll/enrollment numbers
                             used instead of auto-generated serials.
+        optimize: if True, after the column fill seat any overflow students in free seats and
+                  run a simulated-annealing search over seat swaps / paper-set flips that
+                  minimises same-batch adjacency and paper-set clashes.
+        optimize_time_budget: wall-clock budget (seconds) for an unseeded optimisation search.
+        optimize_max_iterations: optional hard cap on search iterations. With a seed the
+                                 search is driven by iterations alone (default
+                                 SEEDED_OPTIMIZE_ITERATIONS) and the time budget is ignored.
+        seed: seed for the algorithm's private RNG. With a seed (or with no randomised
+              step enabled) the plan is reproducible and memoised by input_fingerprint().
         """
         self.rows = rows
         self.cols = cols
@@ -120,6 +187,15 @@ class SeatingAlgorithm:
         self.batch_roll_numbers = batch_roll_numbers or {}
         # NEW: Allow adjacent seating for same batch
         self.allow_adjacent_same_batch = allow_adjacent_same_batch
+        # Optimisation mode
+        self.optimize = optimize
+        self.optimize_time_budget = max(0.0, float(optimize_time_budget))
+        self.optimize_max_iterations = optimize_max_iterations
+        self.optimization_stats: Optional[Dict] = None
+        # Private RNG so plans never depend on (or disturb) the global random state
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self._fingerprint: Optional[str] = None
         # zero-pad width for serial portion
         self.serial_width = max(0, serial_width)
         # serial_mode: 'per_batch' or 'global'
@@ -136,7 +212,7 @@ class SeatingAlgorithm:
                 continue
             s = s.strip()
             # find trailing digits (serial)
-            m = re.search(r"(\d+)$", s)
+            m = _TRAILING_DIGITS.search(s)
             if m:
                 serial_digits = m.group(1)
                 prefix_part = s[: -len(serial_digits)]
@@ -154,6 +230,49 @@ class SeatingAlgorithm:
                 if (serial_width is None) or (serial_width == 0):
                     self.serial_width = max(self.serial_width, len(serial_digits))
 
+        # Compile roll templates once per batch; invalid templates are reported here
+        # rather than failing (and falling back) once per generated seat.
+        self.roll_formatters: Dict[int, Optional[CompiledRollTemplate]] = {}
+        self.global_roll_formatters: Dict[int, CompiledRollTemplate] = {}
+        self._compile_roll_templates()
+
+    def _compile_roll_templates(self):
+        """Resolve and compile the roll template each batch will use.
+
+        roll_formatters[b] is the per-batch pre-generation template (None means plain
+        numeric rolls); global_roll_formatters[b] is used by serial_mode='global'.
+        """
+        # If no explicit template was provided but we have prefixes/year,
+        # build a sensible default template e.g. 'BTCS24O{serial}'
+        effective_template = self.roll_template
+        if not effective_template and self.batch_prefixes and self.year is not None:
+            effective_template = DEFAULT_ROLL_TEMPLATE
+
+        compiled: Dict[Tuple[str, str], CompiledRollTemplate] = {}
+
+        def compile_for(b: int, template: str) -> CompiledRollTemplate:
+            prefix = self.batch_prefixes.get(b, "")
+            key = (template, prefix)
+            if key not in compiled:
+                fmt = CompiledRollTemplate(template, prefix, self.year, self.serial_width)
+                if fmt.error:
+                    logger.warning(fmt.error)
+                    self.init_errors.append(f"Batch {b}: {fmt.error}")
+                compiled[key] = fmt
+            return compiled[key]
+
+        for b in range(1, self.num_batches + 1):
+            if self.batch_roll_numbers and b in self.batch_roll_numbers:
+                continue
+            # Per-batch template preference: if user supplied a start-roll string for this batch,
+            # it overrides the generic effective_template.
+            batch_template = self.batch_templates.get(b, effective_template)
+            self.roll_formatters[b] = compile_for(b, batch_template) if batch_template else None
+            if self.serial_mode == "global":
+                self.global_roll_formatters[b] = compile_for(
+                    b, self.batch_templates.get(b, self.roll_template or DEFAULT_ROLL_TEMPLATE)
+                )
+
     def _build_block_map(self):
         """
         Build column-to-block mapping for variable block structure.
@@ -210,8 +329,102 @@ class SeatingAlgorithm:
             return col - block_start
         return col % self.block_width  # Fallback
 
+    # ------------------ reproducibility ------------------ #
+
+    @property
+    def is_reproducible(self) -> bool:
+        """True when the same inputs always yield the same plan.
+
+        An unseeded optimize run is time-bounded and therefore never reproducible;
+        a seeded one is iteration-bounded and is.
+        """
+        randomised = self.randomize_column or self.optimize
+        return not randomised or self.seed is not None
+
+    def input_fingerprint(self) -> str:
+        """Canonical SHA-256 of every input that influences the generated plan."""
+        if self._fingerprint is None:
+            canonical = {
+                "rows": self.rows,
+                "cols": self.cols,
+                "num_batches": self.num_batches,
+                "block_width": self.block_width,
+                "block_structure": self.block_structure,
+                "batch_by_column": self.batch_by_column,
+                "randomize_column": self.randomize_column,
+                "roll_template": self.roll_template,
+                "batch_prefixes": self.batch_prefixes,
+                "year": self.year,
+                "start_serial": self.start_serial,
+                "start_serials": self.start_serials,
+                "serial_width": self.serial_width,
+                "serial_mode": self.serial_mode,
+                "batch_templates": self.batch_templates,
+                "broken_seats": sorted(self.broken_seats),
+                "batch_student_counts": self.batch_student_counts,
+                "batch_colors": self.batch_colors,
+                "batch_labels": self.batch_labels,
+                "batch_roll_numbers": self.batch_roll_numbers,
+                "allow_adjacent_same_batch": self.allow_adjacent_same_batch,
+                "optimize": self.optimize,
+                "optimize_time_budget": self.optimize_time_budget if self.optimize and self.seed is None else None,
+                "optimize_max_iterations": self._optimize_iterations() if self.optimize else None,
+                "seed": self.seed,
+            }
+            normalized = json.dumps(
+                canonical, sort_keys=True, separators=(',', ':'),
+                default=lambda o: sorted(o) if isinstance(o, set) else str(o),
+            )
+            self._fingerprint = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return self._fingerprint
+
+    def _optimize_iterations(self) -> Optional[int]:
+        """Iteration cap for the search; seeded runs always get one so they never read the clock."""
+        if self.seed is not None and self.optimize_max_iterations is None:
+            return self.SEEDED_OPTIMIZE_ITERATIONS
+        return self.optimize_max_iterations
+
+    @classmethod
+    def clear_plan_cache(cls):
+        with cls._plan_cache_lock:
+            cls._plan_cache.clear()
+
     def generate_seating(self) -> List[List[Seat]]:
-        """Generate seating arrangement with all constraints"""
+        """Generate seating arrangement with all constraints.
+
+        Reproducible inputs are memoised: a repeat request with the same
+        fingerprint returns a copy of the stored plan without re-running.
+        """
+        if not self.is_reproducible:
+            return self._generate_seating()
+
+        key = self.input_fingerprint()
+        with self._plan_cache_lock:
+            cached = self._plan_cache.get(key)
+            if cached is not None:
+                self._plan_cache.move_to_end(key)
+        if cached is not None:
+            logger.debug(f"Plan cache hit: {key[:12]}")
+            self.seating_plan = [[copy.copy(seat) for seat in row] for row in cached["seating_plan"]]
+            self.init_errors = list(cached["init_errors"])
+            self.optimization_stats = copy.deepcopy(cached["optimization_stats"])
+            return self.seating_plan
+
+        self._generate_seating()
+        entry = {
+            "seating_plan": [[copy.copy(seat) for seat in row] for row in self.seating_plan],
+            "init_errors": list(self.init_errors),
+            "optimization_stats": copy.deepcopy(self.optimization_stats),
+        }
+        with self._plan_cache_lock:
+            self._plan_cache[key] = entry
+            self._plan_cache.move_to_end(key)
+            while len(self._plan_cache) > self.PLAN_CACHE_SIZE:
+                self._plan_cache.popitem(last=False)
+        return self.seating_plan
+
+    def _generate_seating(self) -> List[List[Seat]]:
+        """Run the allocation (uncached)."""
         self.seating_plan = []
 
         # If using batch-by-column placement, construct roll pools per batch
@@ -259,18 +472,10 @@ class SeatingAlgorithm:
                     batch_queues[b] = deque(rolls)
                     continue
 
-                # If no explicit template was provided but we have prefixes/year,
-                # build a sensible default template e.g. 'BTCS24O{serial}'
-                effective_template = self.roll_template
-                if not effective_template and self.batch_prefixes and self.year is not None:
-                    effective_template = "{prefix}{year}O{serial}"
-
-                # Per-batch template preference: if user supplied a start-roll string for this batch,
-                # it overrides the generic effective_template.
-                batch_template = self.batch_templates.get(b, effective_template)
+                formatter = self.roll_formatters.get(b)
 
                 # If roll_template/effective_template is not provided, keep numeric global numbering
-                if not batch_template:
+                if formatter is None:
                     rolls = [str(next_roll + j) for j in range(size)]
                     batch_queues[b] = deque(rolls)
                     next_roll += size
@@ -279,26 +484,7 @@ class SeatingAlgorithm:
                 # If serial_mode is 'per_batch', pre-generate per-batch formatted rolls
                 if self.serial_mode == "per_batch":
                     s = self.start_serials.get(b, self.start_serial)
-                    rolls = []
-                    for j in range(size):
-                        serial_val = s + j
-                        prefix = self.batch_prefixes.get(b, "")
-                        serial_str = (
-                            str(serial_val).zfill(self.serial_width)
-                            if self.serial_width
-                            else str(serial_val)
-                        )
-                        # Try formatting with named fields; fall back to simple replacement if needed
-                        try:
-                            rolls.append(
-                                batch_template.format(
-                                    prefix=prefix, year=self.year or "", serial=serial_str
-                                )
-                            )
-                        except Exception:
-                            # If batch_template only contains '{serial}', do a replacement
-                            rolls.append(batch_template.replace("{serial}", serial_str))
-                    batch_queues[b] = deque(rolls)
+                    batch_queues[b] = deque(formatter.render_range(s, size))
                     next_roll += size
                     continue
 
@@ -311,8 +497,6 @@ class SeatingAlgorithm:
                 self.seating_plan.append([None] * self.cols)
 
             # Fill seating column by column; each column assigned to a batch (col % num_batches)+1
-            import random
-            
             # Column-major assignment (Batch by Column)
             for col in range(self.cols):
                 # BLOCK-AWARE GAP: If only one batch is assigned, skip odd columns WITHIN each block
@@ -342,25 +526,23 @@ class SeatingAlgorithm:
                 # Fetch students for these seats
                 needed_count = min(len(available_seats_in_col), batch_limits[b] - batch_allocated[b])
                 column_students = []
-                
+
+                # Global serial mode: the whole column's rolls are one contiguous serial range
+                global_formatter = self.global_roll_formatters.get(b)
+                if global_formatter is not None:
+                    for rn in global_formatter.render_range(next_roll, needed_count):
+                        column_students.append({'roll': rn, 'name': "", 'semester': "I"})
+                    next_roll += needed_count
+                    batch_allocated[b] += needed_count
+                    needed_count = 0
+
                 for _ in range(needed_count):
                     # Fetch student data (real enrollment or generated)
                     rn = None
                     st_name = ""
-                    
-                    template_for_this_batch = self.batch_templates.get(b, self.roll_template or "{prefix}{year}O{serial}")
-                    
-                    if (template_for_this_batch and self.serial_mode == "global" and 
-                        not (self.batch_roll_numbers and b in self.batch_roll_numbers)):
-                        serial_val = next_roll
-                        next_roll += 1
-                        prefix = self.batch_prefixes.get(b, "")
-                        serial_str = str(serial_val).zfill(self.serial_width) if self.serial_width else str(serial_val)
-                        try:
-                            rn = template_for_this_batch.format(prefix=prefix, year=self.year or "", serial=serial_str)
-                        except:
-                            rn = template_for_this_batch.replace("{serial}", serial_str)
-                    elif batch_queues[b]:
+                    semester = "I"
+
+                    if batch_queues[b]:
                         data_item = batch_queues[b].popleft()
                         if isinstance(data_item, dict):
                             rn = data_item.get('roll', '')
@@ -374,7 +556,7 @@ class SeatingAlgorithm:
                             st_name = ""
                             semester = "I"
                             # Check if it looks like a real enrollment (not just a single digit)
-                            if self.batch_roll_numbers and not re.search(r'[A-Z]', rn):
+                            if self.batch_roll_numbers and not _HAS_UPPERCASE.search(rn):
                                 self.init_errors.append(f"Batch {b} using numeric fallback instead of enrollment string: {rn}")
                     
                     if rn:
@@ -383,7 +565,7 @@ class SeatingAlgorithm:
 
                 # Randomize within the column if feature is active
                 if self.randomize_column:
-                    random.shuffle(column_students)
+                    self.rng.shuffle(column_students)
 
                 # Assign students to rows in this column
                 student_idx = 0
@@ -419,6 +601,23 @@ class SeatingAlgorithm:
                             roll_number=None,
                             color="#F3F4F6",
                         )
+
+            if self.optimize:
+                # Students the column fill could not seat (batch larger than its columns)
+                overflow: List[Tuple[int, Dict]] = []
+                for b in range(1, self.num_batches + 1):
+                    remaining = batch_limits[b] - batch_allocated[b]
+                    while remaining > 0 and batch_queues.get(b):
+                        item = batch_queues[b].popleft()
+                        if isinstance(item, dict):
+                            student = {'roll': item.get('roll', ''), 'name': item.get('name', ''),
+                                       'semester': item.get('semester', 'I')}
+                        else:
+                            student = {'roll': str(item), 'name': '', 'semester': 'I'}
+                        if student['roll']:
+                            overflow.append((b, student))
+                            remaining -= 1
+                self._optimize_plan(overflow)
         else:
             # Alternative mode: simple row-wise assignment with sequential numbers
             roll = 1
@@ -458,6 +657,230 @@ class SeatingAlgorithm:
 
         return self.seating_plan
 
+    def _optimize_plan(self, overflow: List[Tuple[int, Dict]]):
+        """Seat overflow students and improve the column-major plan by local search.
+
+        The optimizer works on batch *labels* (same as validate_constraints), so two
+        batch numbers sharing a branch label are treated as the same group.
+        """
+        label_ids: Dict[str, int] = {}
+
+        def label_id(b: int) -> int:
+            return label_ids.setdefault(self.batch_labels.get(b, str(b)), len(label_ids))
+
+        opt = SeatSwapOptimizer(
+            rows=self.rows,
+            cols=self.cols,
+            col_to_block=self.col_to_block,
+            broken_seats=self.broken_seats,
+            allow_adjacent_same_batch=self.allow_adjacent_same_batch,
+            rng=self.rng,
+        )
+        for row in self.seating_plan:
+            for seat in row:
+                if seat.is_broken or not seat.roll_number:
+                    continue
+                opt.place(
+                    seat.row, seat.col, label_id(seat.batch),
+                    PAPER_B if seat.paper_set == PaperSet.B else PAPER_A,
+                    {'batch': seat.batch, 'roll': seat.roll_number,
+                     'name': seat.student_name, 'semester': seat.semester},
+                )
+
+        opt.seat_overflow([(label_id(b), {**student, 'batch': b}) for b, student in overflow])
+        stats = opt.optimize(
+            time_budget=self.optimize_time_budget if self.seed is None else None,
+            max_iterations=self._optimize_iterations(),
+        )
+
+        for row, col, _, paper, payload in opt.cells():
+            if payload is None:
+                self.seating_plan[row][col] = Seat(
+                    row=row, col=col, block=self._get_block_index(col), color="#F3F4F6",
+                )
+                continue
+            b = payload['batch']
+            self.seating_plan[row][col] = Seat(
+                row=row,
+                col=col,
+                batch=b,
+                paper_set=PaperSet.B if paper == PAPER_B else PaperSet.A,
+                block=self._get_block_index(col),
+                roll_number=payload['roll'],
+                student_name=payload['name'],
+                semester=payload['semester'],
+                color=self.batch_colors.get(b, "#E5E7EB"),
+            )
+
+        # Students still unseated (room full) stay pending for the next room
+        stats["overflow_seated"] = len(overflow) - len(opt.unseated)
+        self.optimization_stats = stats
+
+    # ------------------ incremental repair ------------------ #
+
+    @staticmethod
+    def _position(row: int, col: int) -> str:
+        return f"{chr(65 + col)}{row + 1}"
+
+    def load_web_plan(self, seating_matrix: List[List[Dict]]) -> List[List[Seat]]:
+        """Rebuild seating_plan from a web-format matrix (e.g. a cached raw_matrix).
+
+        Lets an existing plan be repaired without re-running generate_seating().
+        """
+        self.seating_plan = []
+        self.broken_seats = set()
+        self._fingerprint = None
+        for r in range(self.rows):
+            row_seats: List[Seat] = []
+            for c in range(self.cols):
+                data = seating_matrix[r][c] if r < len(seating_matrix) and c < len(seating_matrix[r]) else None
+                data = data or {}
+                if data.get('is_broken'):
+                    self.broken_seats.add((r, c))
+                    row_seats.append(Seat(row=r, col=c, is_broken=True, color="#FF0000"))
+                    continue
+                roll = None if data.get('is_unallocated') else data.get('roll_number')
+                batch = data.get('batch')
+                if roll and batch is not None and data.get('batch_label'):
+                    self.batch_labels.setdefault(batch, data['batch_label'])
+                paper = data.get('paper_set')
+                row_seats.append(Seat(
+                    row=r,
+                    col=c,
+                    batch=batch,
+                    paper_set=PaperSet(paper) if paper in ("A", "B") else None,
+                    block=self._get_block_index(c),
+                    roll_number=roll,
+                    student_name=data.get('student_name'),
+                    semester=data.get('semester'),
+                    color=data.get('color') or ("#F3F4F6" if not roll else self.batch_colors.get(batch, "#E5E7EB")),
+                ))
+            self.seating_plan.append(row_seats)
+        return self.seating_plan
+
+    def repair_seating(
+        self,
+        broken_seats: Optional[List[Tuple[int, int]]] = None,
+        freed_seats: Optional[List[Tuple[int, int]]] = None,
+    ) -> Dict:
+        """
+        Apply a broken/freed seat delta to the current plan without regenerating it.
+
+        Only students sitting on newly broken seats move. Each goes to the nearest
+        (Manhattan distance) empty seat where a paper set can be chosen with no
+        same-batch adjacency or paper-set clash; if none exists, the nearest
+        least-violating seat is used and the violation count is reported.
+
+        Returns:
+            dict with 'changes' (one entry per touched seat: action broken/freed/moved),
+            'moved' count and 'unplaced' roll numbers (room had no free seat).
+        """
+        changes: List[Dict] = []
+        displaced: List[Seat] = []
+        # The plan no longer corresponds to the original inputs
+        self._fingerprint = None
+
+        for r, c in freed_seats or []:
+            if not (0 <= r < self.rows and 0 <= c < self.cols):
+                continue
+            if not self.seating_plan[r][c].is_broken:
+                continue
+            self.broken_seats.discard((r, c))
+            self.seating_plan[r][c] = Seat(row=r, col=c, block=self._get_block_index(c), color="#F3F4F6")
+            changes.append({"action": "freed", "row": r, "col": c, "position": self._position(r, c)})
+
+        for r, c in broken_seats or []:
+            if not (0 <= r < self.rows and 0 <= c < self.cols):
+                continue
+            seat = self.seating_plan[r][c]
+            if seat.is_broken:
+                continue
+            if seat.roll_number:
+                displaced.append(seat)
+            self.broken_seats.add((r, c))
+            self.seating_plan[r][c] = Seat(row=r, col=c, is_broken=True, color="#FF0000")
+            changes.append({
+                "action": "broken", "row": r, "col": c, "position": self._position(r, c),
+                "roll_number": seat.roll_number,
+            })
+
+        unplaced = []
+        for seat in displaced:
+            target = self._find_repair_seat(seat)
+            if target is None:
+                unplaced.append(seat.roll_number)
+                continue
+            r, c, paper_set, violations = target
+            self.seating_plan[r][c] = Seat(
+                row=r,
+                col=c,
+                batch=seat.batch,
+                paper_set=paper_set,
+                block=self._get_block_index(c),
+                roll_number=seat.roll_number,
+                student_name=seat.student_name,
+                semester=seat.semester,
+                color=seat.color,
+            )
+            changes.append({
+                "action": "moved",
+                "roll_number": seat.roll_number,
+                "from": self._position(seat.row, seat.col),
+                "to": self._position(r, c),
+                "row": r,
+                "col": c,
+                "paper_set": paper_set.value,
+                "violations": violations,
+            })
+
+        return {
+            "changes": changes,
+            "moved": sum(1 for ch in changes if ch["action"] == "moved"),
+            "unplaced": unplaced,
+        }
+
+    def _seat_violations(self, row: int, col: int, label: str, paper_set: PaperSet) -> int:
+        """Count constraint violations a student of `label` with `paper_set` would cause at (row, col)."""
+        violations = 0
+        for dr, dc in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+            r, c = row + dr, col + dc
+            if not (0 <= r < self.rows and 0 <= c < self.cols):
+                continue
+            other = self.seating_plan[r][c]
+            if other.is_broken or not other.roll_number:
+                continue
+            if self.batch_labels.get(other.batch, str(other.batch)) != label:
+                continue
+            if other.paper_set == paper_set:
+                violations += 1
+            if dr == 0 and not self.allow_adjacent_same_batch and self._is_same_block(col, c):
+                violations += 1
+        return violations
+
+    def _find_repair_seat(self, seat: Seat) -> Optional[Tuple[int, int, PaperSet, int]]:
+        """Nearest empty seat for a displaced student, preferring zero violations."""
+        label = self.batch_labels.get(seat.batch, str(seat.batch))
+        preferred = seat.paper_set or PaperSet.A
+        sets = (preferred, PaperSet.B if preferred == PaperSet.A else PaperSet.A)
+
+        candidates = [
+            (abs(r - seat.row) + abs(c - seat.col), r, c)
+            for r in range(self.rows)
+            for c in range(self.cols)
+            if not self.seating_plan[r][c].is_broken and not self.seating_plan[r][c].roll_number
+        ]
+        candidates.sort()
+
+        best = None
+        for _, r, c in candidates:
+            for paper_set in sets:
+                violations = self._seat_violations(r, c, label, paper_set)
+                if violations == 0:
+                    return r, c, paper_set, 0
+                if best is None or violations < best[3]:
+                    best = (r, c, paper_set, violations)
+        return best
+
     def _calculate_batch(self, row: int, col: int) -> int:
         """Calculate batch using both row and column so adjacent seats get different batches.
 
@@ -660,9 +1083,9 @@ class SeatingAlgorithm:
             {
                 "name": "Batch-by-Column Assignment",
                 "description": "Each column assigned to single batch, filled top-to-bottom",
-                "applied": self.batch_by_column,
+                "applied": self.batch_by_column and not self.optimize,
                 "satisfied": self._verify_column_batch_assignment()
-                if self.batch_by_column
+                if self.batch_by_column and not self.optimize
                 else True,
             }
         )
@@ -807,7 +1230,13 @@ class SeatingAlgorithm:
 
     def to_web_format(self) -> Dict:
         """Convert seating plan to web-friendly JSON format"""
-        web_data = {
+        web_data = self._web_header()
+        web_data["seating"] = list(self.iter_web_rows())
+        return web_data
+
+    def _web_header(self) -> Dict:
+        """Everything in the web payload except the (large) seating matrix."""
+        header = {
             "metadata": {
                 "rows": self.rows,
                 "cols": self.cols,
@@ -815,67 +1244,116 @@ class SeatingAlgorithm:
                 "blocks": self.blocks,
                 "block_width": self.block_width,
                 "block_structure": self.block_structure,  # Variable block widths
+                "input_fingerprint": self.input_fingerprint(),
+                "reproducible": self.is_reproducible,
             },
             "seating": [],
             "summary": self._generate_summary(),
             "init_errors": self.init_errors,
             "constraints_status": self.get_constraints_status(),
         }
+        if self.optimization_stats is not None:
+            header["optimization"] = self.optimization_stats
+        return header
 
+    def iter_web_rows(self) -> Iterator[List[Dict]]:
+        """Yield the web representation of the seating matrix one row at a time.
+
+        Only a single row of seat dicts is alive per step, so callers that
+        stream (see iter_web_json) never hold a second full copy of the grid.
+        """
+        col_letters = [chr(65 + c) for c in range(self.cols)]
         for row_idx, row in enumerate(self.seating_plan):
-            row_data = []
-            for col_idx, seat in enumerate(row):
-                # Human friendly batch label (branch name etc.)
-                batch_label = self.batch_labels.get(seat.batch) if seat.batch else None
-
-                # Handle broken seats
-                if seat.is_broken:
-                    seat_data = {
-                        "position": f"{chr(65 + col_idx)}{row_idx + 1}",
-                        "batch": None,
-                        "batch_label": None,
-                        "paper_set": None,
-                        "block": None,
-                        "roll_number": None,
-                        "is_broken": True,
-                        "display": "BROKEN",
-                        "css_class": "seat-broken",
-                        "color": "#FF0000",  # Red for broken
-                    }
-                else:
-                    # Check if unallocated (no roll number assigned)
-                    is_unallocated = seat.roll_number is None
-                    set_val = seat.paper_set.value if seat.paper_set else ""
-                    # This display string now effectively shows: enrollment + set
-                    display_value = (
-                        f"{seat.roll_number}{set_val}" if seat.roll_number else "UNALLOCATED"
-                    )
-                    css_class = (
-                        f"batch-{seat.batch} set-{set_val}"
-                        if seat.roll_number
-                        else "seat-unallocated"
-                    )
-                    seat_data = {
-                        "position": f"{chr(65 + col_idx)}{row_idx + 1}",
-                        "batch": seat.batch,
-                        # NEW: human readable branch/batch label
-                        "batch_label": batch_label,
-                        "paper_set": set_val or None,
-                        "block": seat.block,
-                        # This is now your enrollment number when batch_roll_numbers is used
-                        "roll_number": seat.roll_number,
-                        "student_name": seat.student_name,
-                        "semester": seat.semester,
-                        "is_broken": False,
-                        "is_unallocated": is_unallocated,
-                        "display": display_value,
-                        "css_class": css_class,
-                        "color": seat.color,
-                    }
-                row_data.append(seat_data)
-            web_data["seating"].append(row_data)
+            yield [
+                self._seat_to_web(seat, f"{col_letters[col_idx]}{row_idx + 1}")
+                for col_idx, seat in enumerate(row)
+            ]
 
-        return web_data
+    def iter_web_json(self, extra: Optional[Dict] = None,
+                      seating: Optional[Iterable[List[Dict]]] = None) -> Iterator[str]:
+        """Stream the web format as JSON text chunks, row by row.
+
+        Produces the same document as ``json.dumps(to_web_format() | extra)``
+        but without materialising the full seating list or the JSON text.
+        ``seating`` serves rows the caller already rendered (e.g. the ones it
+        just cached) instead of rendering them again. Suitable for a Flask
+        ``Response(stream_with_context(...), mimetype='application/json')``.
+        """
+        encoder = json.JSONEncoder()
+        header = self._web_header()
+        if extra:
+            header.update(extra)
+
+        yield "{"
+        first = True
+        for key, value in header.items():
+            if not first:
+                yield ", "
+            first = False
+            yield encoder.encode(key) + ": "
+            if key != "seating":
+                yield from encoder.iterencode(value)
+                continue
+            yield "["
+            for row_idx, row_data in enumerate(seating if seating is not None else self.iter_web_rows()):
+                if row_idx:
+                    yield ", "
+                yield from encoder.iterencode(row_data)
+            yield "]"
+        yield "}"
+
+    def web_seat(self, row: int, col: int) -> Dict:
+        """Web-format dict for the seat at (row, col) of the current plan."""
+        return self._seat_to_web(self.seating_plan[row][col], self._position(row, col))
+
+    def _seat_to_web(self, seat: Seat, position: str) -> Dict:
+        """Web-format dict for a single seat."""
+        # Handle broken seats
+        if seat.is_broken:
+            return {
+                "position": position,
+                "batch": None,
+                "batch_label": None,
+                "paper_set": None,
+                "block": None,
+                "roll_number": None,
+                "is_broken": True,
+                "display": "BROKEN",
+                "css_class": "seat-broken",
+                "color": "#FF0000",  # Red for broken
+            }
+
+        # Human friendly batch label (branch name etc.)
+        batch_label = self.batch_labels.get(seat.batch) if seat.batch else None
+        # Check if unallocated (no roll number assigned)
+        is_unallocated = seat.roll_number is None
+        set_val = seat.paper_set.value if seat.paper_set else ""
+        # This display string now effectively shows: enrollment + set
+        display_value = (
+            f"{seat.roll_number}{set_val}" if seat.roll_number else "UNALLOCATED"
+        )
+        css_class = (
+            f"batch-{seat.batch} set-{set_val}"
+            if seat.roll_number
+            else "seat-unallocated"
+        )
+        return {
+            "position": position,
+            "batch": seat.batch,
+            # NEW: human readable branch/batch label
+            "batch_label": batch_label,
+            "paper_set": set_val or None,
+            "block": seat.block,
+            # This is now your enrollment number when batch_roll_numbers is used
+            "roll_number": seat.roll_number,
+            "student_name": seat.student_name,
+            "semester": seat.semester,
+            "is_broken": False,
+            "is_unallocated": is_unallocated,
+            "display": display_value,
+            "css_class": css_class,
+            "color": seat.color,
+        }
 
     def _generate_summary(self) -> Dict:
         """Generate summary statistics including unallocated students"""
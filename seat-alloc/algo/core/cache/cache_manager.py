@@ -1,9 +1,19 @@
 # Centralized cache management system.
 # Handles saving, loading, and merging seating data snapshots (JSON) for active and finalized sessions.
 import os
+import functools
+import gzip
 import json
+import hashlib
 import logging
 import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 from enum import Enum
@@ -11,6 +21,20 @@ from dataclasses import asdict, is_dataclass
 from datetime import datetime
 from typing import Optional
 
+from algo.config.settings import Config
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
 # Determine cache directory
 # Assuming this file is in algo/core/cache/
 # and we want cache in algo/cache (to match original structure's relative path intent or explicitly set it)
@@ -33,6 +57,426 @@ class AlgoEncoder(json.JSONEncoder):
         if isinstance(obj, set): return list(obj)
         return super().default(obj)
 
+# Sharded layout: CACHE_DIR/<plan_id>/manifest.json + CACHE_DIR/<plan_id>/rooms/<room>-<token>.json
+# (legacy plans live in a single CACHE_DIR/<plan_id>.json and are migrated on first write).
+# Shards are never overwritten: every write gets a fresh name, the manifest switches to it
+# atomically and shards it no longer references are removed after the manifest commit.
+MANIFEST_FILE = "manifest.json"
+ROOMS_DIR = "rooms"
+LOCKS_DIR = ".locks"
+INDEX_FILE = "index.db"
+
+# Append-only seat patch journal (CACHE_DIR/<plan_id>/journal.jsonl), replayed on load and
+# folded into the room shards on finalize, on the next full write, or once it grows past this size
+JOURNAL_FILE = "journal.jsonl"
+JOURNAL_COMPACT_BYTES = 256 * 1024
+_TEMP_PREFIX = ".tmp-"
+# Readers re-read the manifest this many times if a shard it names was replaced under them
+SHARD_READ_ATTEMPTS = 3
+
+# Compact room encoding: batch student lists are stored as [row, col] references into raw_matrix
+COMPACT_FORMAT = "compact-v1"
+
+# Room shard compression ("none" | "gzip" | "zstd"); reads detect the format from magic bytes
+SNAPSHOT_COMPRESSION = Config.CACHE_COMPRESSION
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Max number of parsed snapshots kept in memory (shared by all CacheManager instances)
+SNAPSHOT_CACHE_SIZE = 32
+
+
+def _clone_json(obj):
+    """Fast deep copy for JSON-shaped data (dicts, lists, scalars)."""
+    if isinstance(obj, dict):
+        return {k: _clone_json(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_clone_json(v) for v in obj]
+    return obj
+
+
+def _safe_name(value):
+    return "".join([c for c in str(value) if c.isalnum() or c in ('-', '_')])
+
+
+def _room_file_name(room_no, token=None):
+    """
+    Filesystem-safe, collision-free shard name for one write of a room
+    ("M 101" -> "M101-1a2b3c4d-<token>.json"); a new token per write.
+    """
+    digest = hashlib.sha1(str(room_no).encode('utf-8')).hexdigest()[:8]
+    return f"{_safe_name(room_no) or 'room'}-{digest}-{token or uuid.uuid4().hex[:12]}.json"
+
+
+def _encode_room(room):
+    """
+    Compact form of a room entry. Each batch's `students` list duplicates seats
+    already present in `raw_matrix`, so identical seats are replaced by [row, col]
+    references; anything else (e.g. external students added by patch_seat) stays inline.
+    """
+    matrix = room.get("raw_matrix") or []
+    index = {}
+    for r, row in enumerate(matrix):
+        for c, seat in enumerate(row):
+            if seat and seat.get("position") is not None:
+                index.setdefault(seat["position"], (r, c))
+
+    batches = {}
+    for label, batch in (room.get("batches") or {}).items():
+        refs = []
+        for student in batch.get("students", []):
+            rc = index.get(student.get("position"))
+            if rc is not None and matrix[rc[0]][rc[1]] == student:
+                refs.append([rc[0], rc[1]])
+            else:
+                refs.append(student)
+        encoded = {k: v for k, v in batch.items() if k != "students"}
+        encoded["refs"] = refs
+        batches[label] = encoded
+    return {**room, "batches": batches, "format": COMPACT_FORMAT}
+
+
+def _decode_room(room):
+    """Inverse of _encode_room; rooms in the old (expanded) format pass through unchanged."""
+    if room.get("format") != COMPACT_FORMAT:
+        return room
+    matrix = room.get("raw_matrix") or []
+    batches = {}
+    for label, batch in room.get("batches", {}).items():
+        decoded = {k: v for k, v in batch.items() if k != "refs"}
+        decoded["students"] = [
+            matrix[ref[0]][ref[1]] if isinstance(ref, list) else ref
+            for ref in batch.get("refs", [])
+        ]
+        batches[label] = decoded
+    room = {k: v for k, v in room.items() if k != "format"}
+    room["batches"] = batches
+    return room
+
+
+def _compress(data, mode):
+    if mode == "zstd":
+        if ZSTD_AVAILABLE:
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        logger.warning("CACHE_COMPRESSION=zstd but 'zstandard' is not installed; using gzip")
+        mode = "gzip"
+    if mode == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return data
+
+
+def _decompress(data):
+    if data[:2] == _GZIP_MAGIC:
+        return gzip.decompress(data)
+    if data[:4] == _ZSTD_MAGIC:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Snapshot is zstd-compressed but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+# Enrollment number formats (see CacheManager._parse_enrollment)
+_NEW_ENROLLMENT_RE = re.compile(r"^\d{4}([A-Z]{2,3})(\d{2})")   # 0901CD231067
+_OLD_ENROLLMENT_RE = re.compile(r"^([A-Z]{2})([A-Z]{2,3})(\d{2})")  # BTCS241001
+_ENROLLMENT_PREFIX_LEN = 9  # longest prefix either pattern can look at
+_DEGREE_MAP = {"BT": "B.Tech", "MT": "M.Tech", "BC": "B.C.A", "MC": "M.C.A"}
+_DEFAULT_ACADEMIC_INFO = ("B.Tech", "N/A", "2024")
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_enrollment_prefix(prefix):
+    """(degree, branch, joining_year) for a roll-number prefix; shared by every roll in a batch."""
+    # Try new format first: 4 digits + 2-3 letters (branch) + 2 digits (year)
+    match = _NEW_ENROLLMENT_RE.match(prefix)
+    if match:
+        branch_code, year_short = match.groups()
+        return ("B.Tech", branch_code, f"20{year_short}")  # Default degree for new format
+
+    # Try old format: 2 letters (degree) + 2-3 letters (branch) + 2 digits (year)
+    match = _OLD_ENROLLMENT_RE.match(prefix)
+    if match:
+        deg_code, branch_code, year_short = match.groups()
+        return (_DEGREE_MAP.get(deg_code, deg_code), branch_code, f"20{year_short}")
+
+    # Fallback if no pattern matches
+    return _DEFAULT_ACADEMIC_INFO
+
+
+def _bump_version(metadata):
+    """
+    Stamp a mutation on plan metadata: version counts writes, generation is
+    minted once per plan so a deleted and recreated plan never reuses a version.
+    """
+    metadata["version"] = int(metadata.get("version", 0)) + 1
+    metadata.setdefault("generation", uuid.uuid4().hex[:12])
+    return metadata["version"]
+
+
+def snapshot_etag(snapshot):
+    """
+    Cheap identity of a plan's content: "<plan_id>.<generation>.<version>".
+    Downstream caches (PDF, Excel, publish) key on this instead of
+    re-serialising and hashing the snapshot. None if the plan is unversioned.
+    """
+    metadata = (snapshot or {}).get("metadata") or {}
+    if "version" not in metadata or not metadata.get("plan_id"):
+        return None
+    return f"{metadata['plan_id']}.{metadata.get('generation', '0')}.{metadata['version']}"
+
+
+def _file_stamp(path):
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def fsync_dir(directory):
+    """Persist a rename in `directory` (no-op where directories cannot be opened, e.g. Windows)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(path, data):
+    """
+    Write bytes to path via temp file + fsync + os.replace, so a crash or a
+    concurrent reader never observes a truncated file.
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=_TEMP_PREFIX)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_dir(directory)
+
+
+class _PlanLock:
+    """
+    Re-entrant per-plan write lock: a threading.RLock serialises threads in this
+    process and an flock on CACHE_DIR/.locks/<plan_id>.lock serialises processes
+    (e.g. multiple gunicorn workers). The file lock is taken by the outermost holder only.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        self._depth += 1
+        if self._depth == 1 and fcntl is not None:
+            try:
+                lock_dir = os.path.join(CACHE_DIR, LOCKS_DIR)
+                os.makedirs(lock_dir, exist_ok=True)
+                self._fd = os.open(os.path.join(lock_dir, f"{self.key}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except OSError as e:
+                logger.warning(f"Could not take file lock for plan {self.key}: {e}")
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if self._depth == 1 and self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+        finally:
+            self._depth -= 1
+            self._rlock.release()
+        return False
+
+
+_PLAN_LOCKS = {}
+_PLAN_LOCKS_GUARD = threading.Lock()
+
+
+def _plan_lock(plan_id):
+    key = _safe_name(plan_id)
+    with _PLAN_LOCKS_GUARD:
+        lock = _PLAN_LOCKS.get(key)
+        if lock is None:
+            lock = _PLAN_LOCKS[key] = _PlanLock(key)
+    return lock
+
+
+def _locked_plan(method):
+    """Run a CacheManager read-modify-write method under the plan's write lock."""
+    @functools.wraps(method)
+    def wrapper(self, plan_id, *args, **kwargs):
+        with _plan_lock(plan_id):
+            return method(self, plan_id, *args, **kwargs)
+    return wrapper
+
+
+class _SnapshotCache:
+    """
+    Process-wide LRU of parsed plan snapshots.
+
+    Entries are validated against the file's (mtime_ns, size) stamp so edits made
+    by another process are picked up. Cached objects are shared between readers
+    and must not be mutated in place; CacheManager writers clone before editing
+    and then swap the new object in (copy-on-write).
+    """
+
+    def __init__(self, max_entries=SNAPSHOT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # plan_id -> (stamp, data)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or stamp is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, stamp, data):
+        if stamp is None:
+            return
+        with self._lock:
+            self._entries[key] = (stamp, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_SNAPSHOT_CACHE = _SnapshotCache()
+
+
+class _SnapshotIndex:
+    """
+    Sidecar metadata index (CACHE_DIR/index.db) with one row per plan, so listing
+    and stats never open plan bodies. Rows are upserted on every snapshot write
+    and removed on delete; CacheManager.list_snapshots reconciles the table with
+    the directory listing to pick up plans added or removed behind its back.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            key            TEXT PRIMARY KEY,   -- filesystem-safe plan id
+            plan_id        TEXT NOT NULL,
+            latest_room    TEXT,
+            last_updated   TEXT,
+            total_students INTEGER DEFAULT 0,
+            rooms          TEXT,               -- JSON list of room names
+            size_bytes     INTEGER DEFAULT 0
+        )
+    """
+
+    def __init__(self):
+        # One connection per process, reopened when CACHE_DIR moves or after a fork;
+        # the lock serialises its use across threads
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_key = None
+
+    def _connection(self):
+        key = (os.getpid(), os.path.join(CACHE_DIR, INDEX_FILE))
+        if self._conn is None or self._conn_key != key:
+            if self._conn is not None and self._conn_key[0] == key[0]:
+                self._conn.close()
+            conn = sqlite3.connect(key[1], timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute(self._SCHEMA)
+            self._conn, self._conn_key = conn, key
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._conn_key[0] == os.getpid():
+                self._conn.close()
+            self._conn = self._conn_key = None
+
+    @contextmanager
+    def _session(self):
+        """The shared connection, held under the lock; dropped on error so the next call reopens it."""
+        with self._lock:
+            try:
+                yield self._connection()
+            except sqlite3.Error:
+                self.close()
+                raise
+
+    def upsert(self, key, metadata, rooms, size_bytes):
+        with self._session() as conn:
+            with conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO snapshots
+                       (key, plan_id, latest_room, last_updated, total_students, rooms, size_bytes)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        key,
+                        str(metadata.get('plan_id', key)),
+                        metadata.get('latest_room', 'N/A'),
+                        metadata.get('last_updated'),
+                        metadata.get('total_students', 0),
+                        json.dumps(list(rooms)),
+                        size_bytes,
+                    ),
+                )
+
+    def patch(self, key, metadata, size_delta):
+        """Record a seat patch: new counters and timestamp, rooms unchanged, size grown by size_delta."""
+        with self._session() as conn:
+            with conn:
+                conn.execute(
+                    """UPDATE snapshots SET last_updated = ?, total_students = ?, size_bytes = size_bytes + ?
+                       WHERE key = ?""",
+                    (metadata.get('last_updated'), metadata.get('total_students', 0), size_delta, key),
+                )
+
+    def remove(self, keys):
+        if not keys:
+            return
+        with self._session() as conn:
+            with conn:
+                conn.executemany("DELETE FROM snapshots WHERE key = ?", [(k,) for k in keys])
+
+    def rows(self):
+        with self._session() as conn:
+            return conn.execute("SELECT * FROM snapshots ORDER BY key").fetchall()
+
+
+_SNAPSHOT_INDEX = _SnapshotIndex()
+
+
 class CacheManager:
     """
     FIXED: Supports multi-room persistence, unique room inputs, 
@@ -40,8 +484,21 @@ class CacheManager:
     """
     
     def get_file_path(self, plan_id):
-        safe_id = "".join([c for c in str(plan_id) if c.isalnum() or c in ('-', '_')])
-        return os.path.join(CACHE_DIR, f"{safe_id}.json")
+        """Legacy single-file snapshot path (read-only compatibility)."""
+        return os.path.join(CACHE_DIR, f"{_safe_name(plan_id)}.json")
+
+    def get_plan_dir(self, plan_id):
+        """Directory holding a sharded plan (manifest + one file per room)."""
+        return os.path.join(CACHE_DIR, _safe_name(plan_id))
+
+    def _manifest_path(self, plan_id):
+        return os.path.join(self.get_plan_dir(plan_id), MANIFEST_FILE)
+
+    def _rooms_dir(self, plan_id):
+        return os.path.join(self.get_plan_dir(plan_id), ROOMS_DIR)
+
+    def _journal_path(self, plan_id):
+        return os.path.join(self.get_plan_dir(plan_id), JOURNAL_FILE)
 
     def _parse_enrollment(self, roll_no):
         """Extract academic info from enrollment number
@@ -49,34 +506,13 @@ class CacheManager:
         Supports two formats:
         - New: 0901CD231067 (institution code + branch + year + roll)
         - Old: BTCS241001 (degree + branch + year + roll)
+
+        Parsing only depends on the leading characters, so results are memoised
+        per prefix (rolls in a batch share it).
         """
         roll_str = str(roll_no).strip()
-        
-        # Try new format first: 0901CD231067
-        # Pattern: 4 digits + 2-3 letters (branch) + 2 digits (year)
-        match = re.match(r"^\d{4}([A-Z]{2,3})(\d{2})", roll_str)
-        if match:
-            branch_code, year_short = match.groups()
-            return {
-                "degree": "B.Tech",  # Default for new format
-                "branch": branch_code,
-                "joining_year": f"20{year_short}"
-            }
-        
-        # Try old format: BTCS241001
-        # Pattern: 2 letters (degree) + 2-3 letters (branch) + 2 digits (year)
-        match = re.match(r"^([A-Z]{2})([A-Z]{2,3})(\d{2})", roll_str)
-        if match:
-            deg_code, branch_code, year_short = match.groups()
-            degree_map = {"BT": "B.Tech", "MT": "M.Tech", "BC": "B.C.A", "MC": "M.C.A"}
-            return {
-                "degree": degree_map.get(deg_code, deg_code),
-                "branch": branch_code,
-                "joining_year": f"20{year_short}"
-            }
-        
-        # Fallback if no pattern matches
-        return {"degree": "B.Tech", "branch": "N/A", "joining_year": "2024"}
+        degree, branch, joining_year = _parse_enrollment_prefix(roll_str[:_ENROLLMENT_PREFIX_LEN])
+        return {"degree": degree, "branch": branch, "joining_year": joining_year}
     
     def _determine_batch_branch(self, students, sample_size=5):
         """
@@ -121,14 +557,29 @@ class CacheManager:
         # Fallback: use first student's info
         return all_info[0] if all_info else {"degree": "B.Tech", "branch": "N/A", "joining_year": "2024"}
 
+    def infer_batch_info(self, batch_students, sample_size=5):
+        """
+        Bulk branch inference for every batch of a room in one pass.
+
+        Args:
+            batch_students: Dict of batch_label -> list of student dicts
+            sample_size: Students sampled per batch for the majority vote
+
+        Returns:
+            dict: batch_label -> academic info (see _determine_batch_branch)
+        """
+        return {
+            label: self._determine_batch_branch(students, sample_size=sample_size)
+            for label, students in batch_students.items()
+        }
+
+    @_locked_plan
     def save_or_update(self, plan_id, input_config, output_data, room_no="N/A"):
         """
         Special Logic: If the seating arrangement (students + positions) matches 
         an existing room exactly, we update the room name (M101 -> M102) 
         instead of creating a duplicate.
         """
-        existing_data = self.load_snapshot(plan_id) or {}
-        
         # 1. Process seating for the incoming room
         seating_matrix = output_data.get('seating', [])
         all_seats = [seat for row in seating_matrix for seat in row 
@@ -137,7 +588,6 @@ class CacheManager:
         # Create the Room-specific batch structure
         # STEP 1: Collect all students per batch first
         batch_students = {}  # Temporary: batch_label -> list of students
-        current_fingerprint = []  # For deduplication check
         
         for student in all_seats:
             label = student.get('batch_label', 'Unknown')
@@ -146,17 +596,13 @@ class CacheManager:
             
             student['room_no'] = room_no
             batch_students[label].append(student)
-            
-            # Create a unique fingerprint of this seat (Pos + Roll)
-            current_fingerprint.append(f"{student.get('position')}:{student.get('roll_number')}")
         
         # STEP 2: Determine branch info using majority voting (3-5 students)
-        room_batches = {}
-        for label, students in batch_students.items():
-            academic_info = self._determine_batch_branch(students, sample_size=5)
-            room_batches[label] = {"info": academic_info, "students": students}
-
-        current_fingerprint.sort()  # Sort to ensure consistent comparison
+        batch_info = self.infer_batch_info(batch_students, sample_size=5)
+        room_batches = {
+            label: {"info": batch_info[label], "students": students}
+            for label, students in batch_students.items()
+        }
 
         # 4. Prepare the entry for this room
         current_room_entry = {
@@ -168,100 +614,526 @@ class CacheManager:
                 "cols": input_config.get('cols'),
                 "block_width": input_config.get('block_width'),
                 "block_structure": input_config.get('block_structure'),  # Variable block widths
-                "broken_seats": input_config.get('broken_seats')
+                "broken_seats": input_config.get('broken_seats'),
+                "allow_adjacent_same_batch": bool(input_config.get('allow_adjacent_same_batch', False))
             }
         }
 
         # 5. Merge Logic (Always keeps multiple rooms, strictly appends or updates if name matches)
-        if existing_data and "rooms" in existing_data:
+        # Only the manifest is read back; other rooms' shards are left untouched.
+        self._compact_journal(plan_id)
+        base_view = self._cached_view(plan_id)
+        manifest = self._load_manifest(plan_id)
+        room_entry, stored_room = self._write_room(plan_id, room_no, current_room_entry)
+
+        if manifest and "rooms" in manifest:
             # Add/Update the specific room entry
-            existing_data["rooms"][room_no] = current_room_entry
-            existing_data["metadata"]["latest_room"] = room_no
-            existing_data["metadata"]["last_updated"] = datetime.now().isoformat()
+            manifest["rooms"][room_no] = room_entry
+            manifest["metadata"]["latest_room"] = room_no
+            manifest["metadata"]["last_updated"] = datetime.now().isoformat()
             
             # Recalculate global totals
-            total = sum(r.get('student_count', 0) for r in existing_data["rooms"].values())
-            existing_data["metadata"]["total_students"] = total
+            total = sum(r.get('student_count', 0) for r in manifest["rooms"].values())
+            manifest["metadata"]["total_students"] = total
             
             # Update room configurations list
-            if "room_configs" not in existing_data["inputs"]:
-                existing_data["inputs"]["room_configs"] = {}
-            existing_data["inputs"]["room_configs"][room_no] = current_room_entry["inputs"]
-            
-            payload = existing_data
+            if "room_configs" not in manifest["inputs"]:
+                manifest["inputs"]["room_configs"] = {}
+            manifest["inputs"]["room_configs"][room_no] = current_room_entry["inputs"]
+            _bump_version(manifest["metadata"])
         else:
             # Standard first-time payload
-            payload = {
+            manifest = {
                 "metadata": {
                     "plan_id": plan_id,
                     "latest_room": room_no,
                     "last_updated": datetime.now().isoformat(),
                     "total_students": len(all_seats),
-                    "type": "multi_room_snapshot"
+                    "type": "multi_room_snapshot",
+                    "version": 1,
+                    "generation": uuid.uuid4().hex[:12]
                 },
                 "inputs": {**input_config, "room_configs": {room_no: current_room_entry["inputs"]}},
-                "rooms": {room_no: current_room_entry}
+                "rooms": {room_no: room_entry}
             }
         
-        # 6. Save
-        file_path = self.get_file_path(plan_id)
-        with open(file_path, 'w') as f:
-            json.dump(payload, f, indent=4, cls=AlgoEncoder)
+        # 6. Save (manifest last: it is the commit point)
+        self._commit_manifest(plan_id, manifest, {str(room_no): stored_room}, base_view)
             
-        logger.info(f"✅ Updated cache: {os.path.basename(file_path)}")
+        logger.info(f"✅ Updated cache: {_safe_name(plan_id)}/{room_entry['file']}")
         return plan_id
 
     def load_snapshot(self, plan_id, silent=False):
-        """Load saved snapshot"""
-        file_path = self.get_file_path(plan_id)
-        if os.path.exists(file_path):
+        """Load saved snapshot as a single {metadata, inputs, rooms} document.
+
+        Sharded plans are assembled from their manifest and room files; legacy
+        single-file plans are read as-is. Parsed snapshots are served from an
+        in-process LRU while the underlying files are unchanged. The returned
+        dict is shared: treat it as read-only and persist edits through
+        CacheManager methods.
+        """
+        stamp = self._plan_stamp(plan_id)
+        if stamp is None:
+            _SNAPSHOT_CACHE.invalidate(plan_id)
+            return None
+
+        data = _SNAPSHOT_CACHE.get(plan_id, stamp)
+        if data is None:
             try:
-                with open(file_path, 'r') as f:
-                    if not silent:
-                        logger.info(f"🔍 [L1-CACHE] Checking cache for plan: {plan_id}")
-                    data = json.load(f)
-                    
-                    # Log hit if successful
-                    if not silent:
-                        room_report = data.get('metadata', {}).get('latest_room') or data.get('inputs', {}).get('room_no', 'Unknown')
-                        logger.info(f"⚡ [L1-CACHE HIT] Seating loaded from cache (room: {room_report})")
-                    return data
-            except Exception:
+                if not silent:
+                    logger.info(f"🔍 [L1-CACHE] Checking cache for plan: {plan_id}")
+                data = self._read_plan(plan_id)
+            except Exception as e:
+                logger.warning(f"Could not read snapshot for plan {plan_id}: {e}")
                 return None
+            _SNAPSHOT_CACHE.put(plan_id, stamp, data)
+
+        # Log hit if successful
+        if not silent:
+            room_report = data.get('metadata', {}).get('latest_room') or data.get('inputs', {}).get('room_no', 'Unknown')
+            logger.info(f"⚡ [L1-CACHE HIT] Seating loaded from cache (room: {room_report})")
+        return data
+
+    def load_room(self, plan_id, room_no=None):
+        """
+        Room-scoped read: a snapshot-shaped {metadata, inputs, rooms} dict whose
+        rooms hold just room_no (default: the first room), or None if absent.
+
+        Served from the in-memory view when valid; otherwise only the manifest,
+        that room's shard and the patch journal are read, so fetching one room
+        of an R-room plan does not parse the other R-1. Metadata is the plan
+        header (total_students may lag patches pending on other rooms).
+        Shared and read-only, like load_snapshot().
+        """
+        view = self._cached_view(plan_id)
+        manifest_path = self._manifest_path(plan_id)
+        if view is None and os.path.exists(manifest_path):
+            for attempt in range(SHARD_READ_ATTEMPTS):
+                try:
+                    manifest = self._read_json(manifest_path)
+                    entries = manifest.get("rooms", {})
+                    if room_no is None:
+                        room_no = next(iter(entries), None)
+                    if room_no not in entries:
+                        return None
+                    room_data = self._read_room(plan_id, entries[room_no])
+                    break
+                except FileNotFoundError as e:
+                    # A writer replaced the shard after we read the manifest: read the new one
+                    if attempt + 1 < SHARD_READ_ATTEMPTS:
+                        continue
+                    logger.warning(f"Could not read room {room_no} of plan {plan_id}: {e}")
+                    return None
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Could not read room {room_no} of plan {plan_id}: {e}")
+                    return None
+
+            metadata = manifest.get("metadata", {})
+            for entry in self._read_journal(plan_id):
+                if entry.get("room") == room_no:
+                    self._apply_seat_patch(room_data, room_no, entry["row"], entry["col"], entry["seat"])
+                metadata["last_updated"] = entry.get("at", metadata.get("last_updated"))
+                if "version" in entry:
+                    metadata["version"] = entry["version"]
+            return {"metadata": metadata, "inputs": manifest.get("inputs", {}), "rooms": {room_no: room_data}}
+
+        return self.room_view(view or self.load_snapshot(plan_id, silent=True), room_no)
+
+    def iter_rooms(self, plan_id, room_nos=None):
+        """
+        Yield (room_no, room_view) for the given rooms (default: all, in plan
+        order) from a single snapshot load. Requested rooms missing from the
+        plan yield (room_no, None), so callers can fall back per room.
+        """
+        snapshot = self.load_snapshot(plan_id, silent=True)
+        rooms = (snapshot or {}).get("rooms", {})
+        for room_no in (room_nos if room_nos is not None else list(rooms)):
+            yield room_no, self.room_view(snapshot, room_no)
+
+    @staticmethod
+    def room_view(snapshot, room_no=None):
+        """One-room {metadata, inputs, rooms} view of a loaded snapshot (no copying)."""
+        rooms = (snapshot or {}).get("rooms", {})
+        if room_no is None:
+            room_no = next(iter(rooms), None)
+        if room_no not in rooms:
+            return None
+        return {"metadata": snapshot.get("metadata", {}), "inputs": snapshot.get("inputs", {}),
+                "rooms": {room_no: rooms[room_no]}}
+
+    def get_plan_etag(self, plan_id):
+        """
+        Current snapshot_etag() of a plan without assembling its rooms: served
+        from the in-memory view when valid, else from the manifest plus the
+        version carried by the last journal entry. None if absent/unversioned.
+        """
+        view = self._cached_view(plan_id)
+        if view is not None:
+            return snapshot_etag(view)
+        manifest_path = self._manifest_path(plan_id)
+        if not os.path.exists(manifest_path):
+            return snapshot_etag(self.load_snapshot(plan_id, silent=True))
+        try:
+            metadata = dict(self._read_json(manifest_path).get("metadata", {}))
+        except (OSError, ValueError):
+            return None
+        journal = self._read_journal(plan_id)
+        if journal and "version" in journal[-1]:
+            metadata["version"] = journal[-1]["version"]
+        return snapshot_etag({"metadata": metadata})
+
+    # ==================================================
+    # SHARDED STORAGE - manifest + one file per room
+    # ==================================================
+    def _plan_stamp(self, plan_id):
+        """Validation stamp covering every file a plan is built from, or None if absent."""
+        manifest_stamp = _file_stamp(self._manifest_path(plan_id))
+        if manifest_stamp is None:
+            return _file_stamp(self.get_file_path(plan_id))
+        try:
+            with os.scandir(self._rooms_dir(plan_id)) as entries:
+                rooms = tuple(sorted(
+                    (e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                    for e in entries if not e.name.startswith(_TEMP_PREFIX)
+                ))
+        except OSError:
+            rooms = ()
+        return (manifest_stamp, rooms, _file_stamp(self._journal_path(plan_id)))
+
+    def _read_json(self, path):
+        """Read a snapshot file in any supported encoding (plain/indented JSON, gzip, zstd)."""
+        with open(path, 'rb') as f:
+            return json.loads(_decompress(f.read()))
+
+    def _read_room(self, plan_id, entry):
+        return _decode_room(self._read_json(os.path.join(self._rooms_dir(plan_id), entry["file"])))
+
+    def _read_plan(self, plan_id):
+        """Compatibility reader: assemble the legacy single-file view from disk."""
+        manifest_path = self._manifest_path(plan_id)
+        if not os.path.exists(manifest_path):
+            return self._read_json(self.get_file_path(plan_id))
+
+        for attempt in range(SHARD_READ_ATTEMPTS):
+            manifest = self._read_json(manifest_path)
+            try:
+                rooms = self._read_rooms(plan_id, manifest, retry=attempt + 1 < SHARD_READ_ATTEMPTS)
+                break
+            except FileNotFoundError:
+                # A writer replaced a shard after we read the manifest: start over from the new one
+                continue
+        data = {"metadata": manifest.get("metadata", {}), "inputs": manifest.get("inputs", {}), "rooms": rooms}
+
+        # Replay pending seat patches on top of the shards
+        journal = self._read_journal(plan_id)
+        for entry in journal:
+            room_data = rooms.get(entry.get("room"))
+            if room_data is not None:
+                self._apply_seat_patch(room_data, entry["room"], entry["row"], entry["col"], entry["seat"])
+                data["metadata"]["last_updated"] = entry.get("at", data["metadata"].get("last_updated"))
+            if "version" in entry:
+                data["metadata"]["version"] = entry["version"]
+        if journal:
+            data["metadata"]["total_students"] = sum(r.get('student_count', 0) for r in rooms.values())
+        return data
+
+    def _read_rooms(self, plan_id, manifest, retry=False):
+        """
+        Every room shard a manifest names. Unreadable shards are skipped; with
+        retry=True a missing one raises FileNotFoundError so the caller can
+        re-read the manifest.
+        """
+        rooms = {}
+        for room_no, entry in manifest.get("rooms", {}).items():
+            try:
+                rooms[room_no] = self._read_room(plan_id, entry)
+            except FileNotFoundError as e:
+                if retry:
+                    raise
+                logger.warning(f"Skipping missing room shard {room_no} of plan {plan_id}: {e}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable room shard {room_no} of plan {plan_id}: {e}")
+        return rooms
+
+    # ==================================================
+    # SEAT PATCH JOURNAL
+    # ==================================================
+    def _read_journal(self, plan_id):
+        """Pending seat patches in append order (a torn trailing line from a crash is skipped)."""
+        try:
+            with open(self._journal_path(plan_id), 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping corrupt journal entry in plan {plan_id}")
+        return entries
+
+    def _append_journal(self, plan_id, entry):
+        """Durably append one patch; returns the JSON-normalised entry."""
+        line = json.dumps(entry, separators=(',', ':'), cls=AlgoEncoder)
+        with open(self._journal_path(plan_id), 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return json.loads(line)
+
+    def _compact_journal(self, plan_id):
+        """
+        Fold pending seat patches into the room shards and drop the journal.
+        Replaying a patch is idempotent, so a crash between the manifest commit
+        and the journal removal is harmless. Caller holds the plan lock.
+        """
+        journal_path = self._journal_path(plan_id)
+        if not os.path.exists(journal_path):
+            return
+        view = self.load_snapshot(plan_id, silent=True)
+        manifest = self._load_manifest(plan_id)
+        if view is None or manifest is None:
+            return
+
+        changed = {}
+        for room_no in {entry.get("room") for entry in self._read_journal(plan_id)}:
+            if room_no in manifest["rooms"] and room_no in view["rooms"]:
+                manifest["rooms"][room_no], changed[room_no] = self._write_room(plan_id, room_no, view["rooms"][room_no])
+        manifest["metadata"]["last_updated"] = view["metadata"].get("last_updated")
+        manifest["metadata"]["total_students"] = view["metadata"].get("total_students", 0)
+        if "version" in view["metadata"]:
+            manifest["metadata"]["version"] = view["metadata"]["version"]
+        self._commit_manifest(plan_id, manifest, changed, view)
+
+        compacted = _SNAPSHOT_CACHE.get(plan_id, self._plan_stamp(plan_id))
+        os.remove(journal_path)
+        fsync_dir(self.get_plan_dir(plan_id))
+        if compacted is not None:
+            _SNAPSHOT_CACHE.put(plan_id, self._plan_stamp(plan_id), compacted)
+        logger.info(f"🗜️  Compacted seat patch journal of plan {plan_id}")
+
+    def _cached_view(self, plan_id):
+        """Current in-memory view of a plan if it is still valid (shared, read-only)."""
+        return _SNAPSHOT_CACHE.get(plan_id, self._plan_stamp(plan_id))
+
+    def _load_manifest(self, plan_id):
+        """Mutable manifest for writers; migrates a legacy single-file plan on first write."""
+        manifest_path = self._manifest_path(plan_id)
+        if os.path.exists(manifest_path):
+            return self._read_json(manifest_path)
+        if os.path.exists(self.get_file_path(plan_id)):
+            return self._migrate_legacy(plan_id)
         return None
 
+    def _migrate_legacy(self, plan_id):
+        legacy_path = self.get_file_path(plan_id)
+        data = self._read_json(legacy_path)
+        manifest = {
+            "metadata": data.get("metadata", {}),
+            "inputs": data.get("inputs", {}),
+            "rooms": {},
+        }
+        manifest["metadata"].setdefault("version", 0)
+        manifest["metadata"].setdefault("generation", uuid.uuid4().hex[:12])
+        os.makedirs(self.get_plan_dir(plan_id), exist_ok=True)
+        for room_no, room_data in data.get("rooms", {}).items():
+            manifest["rooms"][room_no], _ = self._write_room(plan_id, room_no, room_data)
+        self._write_json(self._manifest_path(plan_id), manifest)
+        os.remove(legacy_path)
+        logger.info(f"📦 Migrated plan {plan_id} to sharded cache layout")
+        return manifest
+
+    def _write_json(self, path, payload, compress=False):
+        """
+        Atomically serialise payload to path as compact (non-indented) JSON,
+        optionally compressed. Returns the JSON-normalised object (e.g. int keys -> str).
+        """
+        text = json.dumps(payload, separators=(',', ':'), cls=AlgoEncoder)
+        data = text.encode('utf-8')
+        if compress:
+            data = _compress(data, SNAPSHOT_COMPRESSION)
+        _atomic_write(path, data)
+        return json.loads(text)
+
+    def _write_room(self, plan_id, room_no, room_data):
+        """
+        Write one room shard (compact encoding) under a fresh file name; the
+        previous shard stays readable until the manifest stops referencing it.
+        Returns (manifest entry, stored room).
+        """
+        rooms_dir = self._rooms_dir(plan_id)
+        os.makedirs(rooms_dir, exist_ok=True)
+        file_name = _room_file_name(room_no)
+        stored = _decode_room(self._write_json(os.path.join(rooms_dir, file_name), _encode_room(room_data), compress=True))
+        return {"file": file_name, "student_count": stored.get("student_count", 0)}, stored
+
+    def _load_room_for_update(self, plan_id, room_no, manifest, base_view):
+        """Private, mutable copy of one room (copy-on-write from the cached view if possible)."""
+        if base_view is not None and room_no in base_view.get("rooms", {}):
+            return _clone_json(base_view["rooms"][room_no])
+        return self._read_room(plan_id, manifest["rooms"][room_no])
+
+    def _commit_manifest(self, plan_id, manifest, changed_rooms, base_view):
+        """
+        Write the manifest (the commit point), remove shards it no longer references
+        and refresh the cached view. Unchanged rooms are shared with base_view, so a
+        room update never re-reads or re-copies the other rooms.
+        """
+        try:
+            manifest = self._write_json(self._manifest_path(plan_id), manifest)
+        except Exception:
+            _SNAPSHOT_CACHE.invalidate(plan_id)
+            raise
+        self._remove_stale_shards(plan_id, manifest)
+        self._update_index(plan_id, manifest)
+
+        base_rooms = (base_view or {}).get("rooms", {})
+        rooms = {}
+        for room_no in manifest["rooms"]:
+            if room_no in changed_rooms:
+                rooms[room_no] = changed_rooms[room_no]
+            elif room_no in base_rooms:
+                rooms[room_no] = base_rooms[room_no]
+            else:
+                # Not in memory; the next load assembles the view from disk
+                _SNAPSHOT_CACHE.invalidate(plan_id)
+                return
+        view = {"metadata": manifest["metadata"], "inputs": manifest["inputs"], "rooms": rooms}
+        _SNAPSHOT_CACHE.put(plan_id, self._plan_stamp(plan_id), view)
+
+    def _remove_stale_shards(self, plan_id, manifest):
+        """Delete shards the committed manifest no longer references (replaced, dropped or orphaned by a crash)."""
+        live = {entry["file"] for entry in manifest.get("rooms", {}).values()}
+        rooms_dir = self._rooms_dir(plan_id)
+        try:
+            names = os.listdir(rooms_dir)
+        except OSError:
+            return
+        for name in names:
+            if name in live or name.startswith(_TEMP_PREFIX):
+                continue
+            try:
+                os.remove(os.path.join(rooms_dir, name))
+            except OSError:
+                pass
+
+    def _update_index(self, plan_id, manifest):
+        """Refresh the plan's row in the metadata index (never fails the write itself)."""
+        try:
+            _SNAPSHOT_INDEX.upsert(
+                _safe_name(plan_id), manifest.get("metadata", {}),
+                manifest.get("rooms", {}).keys(), self.get_plan_size(plan_id),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update snapshot index for {plan_id}: {e}")
+
+    @_locked_plan
     def delete_snapshot(self, plan_id):
-        """Delete a snapshot"""
+        """Delete a snapshot (sharded directory and/or legacy file)"""
+        _SNAPSHOT_CACHE.invalidate(plan_id)
+        deleted = False
+        plan_dir = self.get_plan_dir(plan_id)
+        if os.path.isdir(plan_dir):
+            shutil.rmtree(plan_dir, ignore_errors=True)
+            deleted = True
         file_path = self.get_file_path(plan_id)
         if os.path.exists(file_path):
             os.remove(file_path)
-            return True
-        return False
+            deleted = True
+        try:
+            _SNAPSHOT_INDEX.remove([_safe_name(plan_id)])
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update snapshot index for {plan_id}: {e}")
+        return deleted
+
+    def _indexed_snapshots(self):
+        """
+        Index rows reconciled against the directory listing: plans deleted
+        externally (e.g. clean_old_data) are dropped, unindexed plans (legacy
+        files, pre-index caches) are read once and added.
+        """
+        on_disk = set(self.list_plan_ids())
+        rows = {row['key']: row for row in _SNAPSHOT_INDEX.rows()}
+
+        _SNAPSHOT_INDEX.remove([key for key in rows if key not in on_disk])
+        missing = on_disk.difference(rows)
+        for key in missing:
+            try:
+                path = os.path.join(CACHE_DIR, key, MANIFEST_FILE)
+                data = self._read_json(path if os.path.isfile(path) else self.get_file_path(key))
+                _SNAPSHOT_INDEX.upsert(key, data['metadata'], data.get('rooms', {}).keys(), self.get_plan_size(key))
+            except Exception:
+                continue
+        if missing:
+            rows = {row['key']: row for row in _SNAPSHOT_INDEX.rows()}
+        return [row for key, row in rows.items() if key in on_disk]
 
     def list_snapshots(self):
-        """List all cached snapshots"""
-        snapshots = []
+        """List all cached snapshots (served from the metadata index)"""
         if not os.path.exists(CACHE_DIR): return []
-        for filename in os.listdir(CACHE_DIR):
-            if filename.endswith('.json'):
-                filepath = os.path.join(CACHE_DIR, filename)
-                try:
-                    with open(filepath, 'r') as f:
-                        data = json.load(f)
-                        snapshots.append({
-                            'plan_id': data['metadata']['plan_id'],
-                            'room_no': data['metadata'].get('latest_room', 'N/A'),
-                            'last_updated': data['metadata']['last_updated'],
-                            'total_students': data['metadata']['total_students'],
-                            'rooms': list(data.get('rooms', {}).keys())
-                        })
-                except:
-                    continue
-        return snapshots
+        try:
+            rows = self._indexed_snapshots()
+        except sqlite3.Error as e:
+            logger.warning(f"Snapshot index unavailable: {e}")
+            return []
+        return [{
+            'plan_id': row['plan_id'],
+            'room_no': row['latest_room'],
+            'last_updated': row['last_updated'],
+            'total_students': row['total_students'],
+            'rooms': json.loads(row['rooms'] or '[]'),
+            'size_bytes': row['size_bytes'],
+        } for row in rows]
     
+    def list_plan_ids(self):
+        """Plan ids present in the cache directory, in either storage layout"""
+        if not os.path.exists(CACHE_DIR): return []
+        plan_ids = []
+        for filename in sorted(os.listdir(CACHE_DIR)):
+            path = os.path.join(CACHE_DIR, filename)
+            if os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+                plan_ids.append(filename)
+            elif filename.endswith('.json') and os.path.isfile(path):
+                plan_ids.append(filename[:-len('.json')])
+        return plan_ids
+
+    def get_plan_size(self, plan_id):
+        """Bytes on disk used by a plan (legacy file + sharded directory)"""
+        size = 0
+        legacy_path = self.get_file_path(plan_id)
+        if os.path.isfile(legacy_path):
+            size += os.path.getsize(legacy_path)
+        for dirpath, _, files in os.walk(self.get_plan_dir(plan_id)):
+            for file in files:
+                size += os.path.getsize(os.path.join(dirpath, file))
+        return size
+
+    @_locked_plan
+    def rewrite_snapshot(self, plan_id):
+        """
+        Re-encode every file of a plan in the current format (compact JSON,
+        configured compression), migrating legacy single-file plans.
+        Used by scripts/migrate_cache_format.py.
+
+        Returns:
+            (bytes_before, bytes_after), or None if the plan does not exist
+        """
+        bytes_before = self.get_plan_size(plan_id)
+        self._compact_journal(plan_id)
+        manifest = self._load_manifest(plan_id)
+        if manifest is None or "rooms" not in manifest:
+            return None
+        for room_no, entry in manifest["rooms"].items():
+            room_data = self._read_room(plan_id, entry)
+            manifest["rooms"][room_no], _ = self._write_room(plan_id, room_no, room_data)
+        self._commit_manifest(plan_id, manifest, {}, None)
+        return bytes_before, self.get_plan_size(plan_id)
+
     # ==================================================
     # TO REMOVE EXTERIMENTAL ROOMS FROM CACHE 
     # ==================================================
+    @_locked_plan
     def finalize_rooms(self, plan_id, finalized_room_list):
         """
         Prune cache to keep only finalized rooms with allocated students.
@@ -277,7 +1149,9 @@ class CacheManager:
         if not plan_id or not finalized_room_list:
             return False
         
-        data = self.load_snapshot(plan_id)
+        self._compact_journal(plan_id)
+        base_view = self._cached_view(plan_id)
+        data = self._load_manifest(plan_id)
         if not data or "rooms" not in data:
             return False
         
@@ -314,14 +1188,78 @@ class CacheManager:
         )
         data["metadata"]["last_updated"] = datetime.now().isoformat()
         data["metadata"]["status"] = "FINALIZED"
+        _bump_version(data["metadata"])
+
+        # 4. Save the cleaned manifest (shards of discarded rooms are removed after the commit)
+        self._commit_manifest(plan_id, data, {}, base_view)
 
-        # 4. Save the cleaned file
-        file_path = self.get_file_path(plan_id)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4, cls=AlgoEncoder)
-        
         return True
-    
+
+    # ==================================================
+    # ROOM SNAPSHOTS - Undo/redo journal support
+    # ==================================================
+    def plan_lock(self, plan_id):
+        """
+        The plan's write lock, as a context manager. Hold it across export_room()
+        and the DB commit that records the export, so no cache write lands in between.
+        """
+        return _plan_lock(plan_id)
+
+    def export_room(self, plan_id, room_no):
+        """
+        Compact, JSON-ready copy of one room as currently cached (pending seat
+        patches applied), or None if the plan has no such room. Feed it back to
+        restore_room() to put the room into exactly this state.
+        """
+        view = self.load_room(plan_id, room_no)
+        if view is None:
+            return None
+        return _clone_json(_encode_room(view["rooms"][room_no]))
+
+    @_locked_plan
+    def restore_room(self, plan_id, room_no, room_data):
+        """
+        Put one room back to an export_room() state, or drop it when room_data
+        is None. Only that room's shard and the manifest are written; the other
+        rooms are untouched. Bumps the plan version.
+
+        Returns:
+            True if the plan changed, False otherwise
+        """
+        self._compact_journal(plan_id)
+        base_view = self._cached_view(plan_id)
+        manifest = self._load_manifest(plan_id)
+        changed_rooms = {}
+
+        if room_data is None:
+            if not manifest or room_no not in manifest.get("rooms", {}):
+                return False
+            manifest["rooms"].pop(room_no)
+            manifest.get("inputs", {}).get("room_configs", {}).pop(room_no, None)
+        else:
+            room = _decode_room(_clone_json(room_data))
+            if not manifest or "rooms" not in manifest:
+                manifest = {
+                    "metadata": {"plan_id": plan_id, "type": "multi_room_snapshot"},
+                    "inputs": {"room_configs": {}},
+                    "rooms": {},
+                }
+            room_entry, stored_room = self._write_room(plan_id, room_no, room)
+            manifest["rooms"][room_no] = room_entry
+            manifest.setdefault("inputs", {}).setdefault("room_configs", {})[room_no] = room.get("inputs", {})
+            changed_rooms[str(room_no)] = stored_room
+
+        metadata = manifest["metadata"]
+        if metadata.get("latest_room") not in manifest["rooms"]:
+            metadata["latest_room"] = next(reversed(manifest["rooms"]), None)
+        metadata["total_students"] = sum(r.get('student_count', 0) for r in manifest["rooms"].values())
+        metadata["last_updated"] = datetime.now().isoformat()
+        _bump_version(metadata)
+        self._commit_manifest(plan_id, manifest, changed_rooms, base_view)
+
+        logger.info(f"↩️ Restored room {room_no} of plan {plan_id} ({'removed' if room_data is None else 'snapshot'})")
+        return True
+
     # ==================================================
     # CACHE SEARCH - Find by configuration
     # ==================================================
@@ -337,13 +1275,8 @@ class CacheManager:
         total_students = sum(s.get('total_students', 0) for s in snapshots)
         total_rooms = sum(len(s.get('rooms', [])) for s in snapshots)
         
-        # Calculate cache disk size
-        cache_size_bytes = 0
-        if os.path.exists(CACHE_DIR):
-            for file in os.listdir(CACHE_DIR):
-                filepath = os.path.join(CACHE_DIR, file)
-                if os.path.isfile(filepath):
-                    cache_size_bytes += os.path.getsize(filepath)
+        # Cache disk size (per-plan sizes are recorded in the index on write)
+        cache_size_bytes = sum(s.get('size_bytes', 0) for s in snapshots)
         
         return {
             'total_plans': len(snapshots),
@@ -357,10 +1290,15 @@ class CacheManager:
     # ==================================================
     # PATCH SINGLE SEAT - For external student additions
     # ==================================================
+    @_locked_plan
     def patch_seat(self, plan_id: str, room_no: str, row: int, col: int, seat_data: dict) -> bool:
         """
         Update a single seat in the cache without regenerating the entire plan.
         Used for adding/removing external students to empty seats.
+
+        The change is appended to the plan's patch journal (one small fsync'd
+        write) instead of rewriting the room; load_snapshot replays the journal
+        and it is folded into the room shards on finalize or once it grows large.
         
         Args:
             plan_id: The plan ID to update
@@ -372,7 +1310,12 @@ class CacheManager:
         Returns:
             True if successful, False otherwise
         """
-        data = self.load_snapshot(plan_id)
+        # The journal lives next to the manifest, so legacy single-file plans are migrated first
+        if not os.path.exists(self._manifest_path(plan_id)) and self._load_manifest(plan_id) is None:
+            logger.warning(f"Cannot patch seat: Plan {plan_id} not found")
+            return False
+
+        data = self.load_snapshot(plan_id, silent=True)
         if not data or "rooms" not in data:
             logger.warning(f"Cannot patch seat: Plan {plan_id} not found")
             return False
@@ -381,8 +1324,7 @@ class CacheManager:
             logger.warning(f"Cannot patch seat: Room {room_no} not found in plan")
             return False
         
-        room_data = data["rooms"][room_no]
-        seating_matrix = room_data.get("raw_matrix", [])
+        seating_matrix = data["rooms"][room_no].get("raw_matrix", [])
         
         # Validate coordinates
         if row < 0 or row >= len(seating_matrix):
@@ -391,23 +1333,69 @@ class CacheManager:
         if col < 0 or col >= len(seating_matrix[row]):
             logger.warning(f"Invalid col {col} for seat patch")
             return False
+
+        # 1. Append the delta to the journal (it carries the version it produces)
+        journal_path = self._journal_path(plan_id)
+        journal_before = (_file_stamp(journal_path) or (0, 0))[1]
+        entry = self._append_journal(plan_id, {
+            "room": room_no, "row": row, "col": col, "seat": seat_data,
+            "at": datetime.now().isoformat(),
+            "version": int(data["metadata"].get("version", 0)) + 1,
+        })
+        journal_size = os.path.getsize(journal_path)
+
+        # 2. Apply it to a shallow copy of the room (only the touched row and batch
+        #    lists are copied; the cached view is shared) and swap the new view in
+        room_data = dict(data["rooms"][room_no])
+        students_before = room_data.get("student_count", 0)
+        self._apply_seat_patch(room_data, room_no, row, col, entry["seat"])
+        metadata = {
+            **data["metadata"],
+            "last_updated": entry["at"],
+            "version": entry["version"],
+            "total_students": data["metadata"].get("total_students", 0)
+                              + room_data.get("student_count", 0) - students_before,
+        }
+        view = {**data, "metadata": metadata, "rooms": {**data["rooms"], room_no: room_data}}
+        _SNAPSHOT_CACHE.put(plan_id, self._plan_stamp(plan_id), view)
+        try:
+            # Rooms are unchanged and only the journal grew: no need to re-measure the plan
+            _SNAPSHOT_INDEX.patch(_safe_name(plan_id), metadata, journal_size - journal_before)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update snapshot index for {plan_id}: {e}")
+
+        # 3. Lazy compaction
+        if journal_size > JOURNAL_COMPACT_BYTES:
+            self._compact_journal(plan_id)
+        
+        logger.info(f"✅ Patched seat [{row},{col}] in room {room_no} of plan {plan_id}")
+        return True
+
+    def _apply_seat_patch(self, room_data, room_no, row, col, seat_data):
+        """
+        Apply one seat patch to a room entry (used live and on journal replay).
+
+        room_data's own keys are reassigned, but the matrix, the seat's row, the
+        batches dict and any batch it touches are replaced by copies rather than
+        mutated, so a shallow copy of a shared room is enough.
+        """
+        seating_matrix = list(room_data.get("raw_matrix", []))
         
         # 1. Update the raw_matrix
-        old_seat = seating_matrix[row][col]
-        seating_matrix[row][col] = {**old_seat, **seat_data}
+        seat_row = list(seating_matrix[row])
+        old_seat = seat_row[col]
+        new_seat = seat_row[col] = {**old_seat, **seat_data}
+        seating_matrix[row] = seat_row
+        room_data["raw_matrix"] = seating_matrix
+        batches = dict(room_data.get("batches", {}))
         
         # 2. Update the batches structure if adding a student
         if seat_data.get('roll_number') and not seat_data.get('is_unallocated'):
             batch_label = seat_data.get('batch_label', 'External')
-            
-            if "batches" not in room_data:
-                room_data["batches"] = {}
-            
-            if batch_label not in room_data["batches"]:
-                room_data["batches"][batch_label] = {
-                    "info": {"degree": "External", "branch": "N/A", "joining_year": "N/A"},
-                    "students": []
-                }
+            batch_data = batches.get(batch_label) or {
+                "info": {"degree": "External", "branch": "N/A", "joining_year": "N/A"},
+                "students": []
+            }
             
             # Add student to batch list (avoid duplicates)
             student_entry = {
@@ -424,40 +1412,29 @@ class CacheManager:
             }
             
             # Remove any existing entry for this position
-            room_data["batches"][batch_label]["students"] = [
-                s for s in room_data["batches"][batch_label]["students"]
-                if s.get('position') != seat_data.get('position')
-            ]
-            room_data["batches"][batch_label]["students"].append(student_entry)
+            students = [s for s in batch_data["students"] if s.get('position') != seat_data.get('position')]
+            students.append(student_entry)
+            batches[batch_label] = {**batch_data, "students": students}
+            room_data["batches"] = batches
         
         # 3. If removing a student (clearing seat), update batch list
         elif seat_data.get('is_unallocated'):
             position = seat_data.get('position') or old_seat.get('position')
-            for batch_label, batch_data in room_data.get("batches", {}).items():
-                batch_data["students"] = [
-                    s for s in batch_data["students"]
-                    if s.get('position') != position
-                ]
-        
-        # 4. Recalculate student count
-        all_seats = [seat for row in seating_matrix for seat in row 
-                     if seat and not seat.get('is_broken') and not seat.get('is_unallocated')]
-        room_data["student_count"] = len(all_seats)
-        
-        # 5. Update metadata
-        data["metadata"]["last_updated"] = datetime.now().isoformat()
-        data["metadata"]["total_students"] = sum(
-            r.get('student_count', 0) for r in data["rooms"].values()
-        )
-        
-        # 6. Save updated data
-        file_path = self.get_file_path(plan_id)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4, cls=AlgoEncoder)
+            for batch_label, batch_data in batches.items():
+                if any(s.get('position') == position for s in batch_data["students"]):
+                    batches[batch_label] = {
+                        **batch_data,
+                        "students": [s for s in batch_data["students"] if s.get('position') != position],
+                    }
+                    room_data["batches"] = batches
         
-        logger.info(f"✅ Patched seat [{row},{col}] in room {room_no} of plan {plan_id}")
-        return True
-    
+        # 4. Adjust the student count by this seat's change
+        def occupied(seat):
+            return bool(seat) and not seat.get('is_broken') and not seat.get('is_unallocated')
+
+        room_data["student_count"] = (room_data.get("student_count", 0)
+                                      + occupied(new_seat) - occupied(old_seat))
+
     def get_empty_seats(self, plan_id: str, room_no: str) -> list:
         """
         Get all empty (unallocated, non-broken) seats in a room.
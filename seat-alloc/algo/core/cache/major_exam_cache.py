@@ -1,24 +1,87 @@
 """
 Major Exam Cache Manager
 Handles cache operations for major exam plans
+
+Each user directory holds the plan files plus a small manifest.json with the
+listing fields of every plan, so listing plans never opens plan bodies.
+Parsed plans are kept in an in-process LRU (validated by file mtime/size).
 """
 import json
 import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 
+from algo.core.cache.cache_manager import fsync_dir
+
 logger = logging.getLogger(__name__)
 
+MANIFEST_FILE = 'manifest.json'
+PLAN_CACHE_SIZE = 32
+
+
+def _file_stamp(path: Path):
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _atomic_write_text(path: Path, text: str):
+    """
+    Write via temp file + fsync + os.replace so readers never see a partial
+    file and a crash never leaves a renamed-but-empty one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_dir(str(path.parent))
+
+
+def _manifest_entry(plan: dict, mtime: float) -> dict:
+    metadata = plan.get('metadata', {})
+    return {
+        'plan_id': plan.get('plan_id'),
+        'created_at': plan.get('created_at'),
+        'total_students': metadata.get('total_students', 0),
+        'allocated_count': metadata.get('allocated_count', 0),
+        'room_count': metadata.get('room_count', 0),
+        'status': metadata.get('status', 'pending'),
+        'mtime': mtime,
+    }
+
 
 class MajorExamCacheManager:
     """Manages cache for major exam plans"""
     
-    def __init__(self, cache_dir='cache'):
+    def __init__(self, cache_dir='cache', plan_cache_size=PLAN_CACHE_SIZE):
         self.cache_dir = Path(cache_dir)
         self.major_dir = self.cache_dir / 'major'
         self.major_dir.mkdir(parents=True, exist_ok=True)
         
+        self._lock = threading.RLock()
+        self._manifests = {}                # user_id -> (stamp, {safe_plan_id: entry})
+        self._plan_cache = OrderedDict()    # plan path -> (stamp, pickled plan)
+        self._plan_cache_size = plan_cache_size
+        
     def _get_user_dir(self, user_id: str) -> Path:
         """Get user-specific directory, maintaining isolation"""
         user_dir = self.major_dir / str(user_id)
@@ -52,36 +115,39 @@ class MajorExamCacheManager:
             if 'metadata' not in plan_data:
                 plan_data['metadata'] = {}
             
-            created_at = plan_data.get('created_at')
-            if not created_at and path.exists():
-                try:
-                    with open(path, 'r') as existing_file:
-                        existing_plan = json.load(existing_file)
-                    created_at = existing_plan.get('created_at')
-                except Exception as e:
-                    logger.warning('Failed to preserve created_at for %s: %s', plan_id, e)
-
-            if not created_at:
-                created_at = datetime.utcnow().isoformat() + 'Z'
-
-            plan_data['user_id'] = user_id
-            plan_data['plan_id'] = plan_id
-            plan_data['created_at'] = created_at
-            
-            # Write to file
-            with open(path, 'w') as f:
-                json.dump(plan_data, f, indent=2)
-            
-            # VERIFY file was actually written
-            if not path.exists():
-                logger.error('File write verification failed: path=%s parent=%s parent_exists=%s', path, path.parent, path.parent.exists())
-                return False
-            
-            # Verify file has content
-            file_size = path.stat().st_size
-            if file_size == 0:
-                logger.error('File is empty after write: %s', path)
-                return False
+            with self._lock:
+                manifest = self._load_manifest(user_id)
+                key = path.stem
+
+                # Preserve created_at from the manifest instead of re-reading the previous version
+                created_at = plan_data.get('created_at') or manifest.get(key, {}).get('created_at')
+                if not created_at:
+                    created_at = datetime.utcnow().isoformat() + 'Z'
+
+                plan_data['user_id'] = user_id
+                plan_data['plan_id'] = plan_id
+                plan_data['created_at'] = created_at
+                
+                # Write to file
+                text = json.dumps(plan_data, indent=2)
+                _atomic_write_text(path, text)
+                
+                # VERIFY file was actually written
+                stamp = _file_stamp(path)
+                if stamp is None:
+                    logger.error('File write verification failed: path=%s parent=%s parent_exists=%s', path, path.parent, path.parent.exists())
+                    return False
+                
+                # Verify file has content
+                file_size = stamp[1]
+                if file_size == 0:
+                    logger.error('File is empty after write: %s', path)
+                    return False
+
+                # Write-through: cache exactly what was written (JSON-normalised)
+                self._cache_put(path, stamp, json.loads(text))
+                manifest[key] = _manifest_entry(plan_data, time.time())
+                self._save_manifest(user_id, manifest)
             
             logger.info('Stored major plan: user_id=%s plan_id=%s path=%s size=%s', user_id, plan_id, path, file_size)
             return True
@@ -90,15 +156,22 @@ class MajorExamCacheManager:
             return False
     
     def retrieve_plan(self, user_id: str, plan_id: str) -> dict:
-        """Retrieve plan from cache"""
+        """Retrieve plan from cache (a private copy; callers may modify it)"""
         try:
             path = self._get_plan_path(user_id, plan_id)
             
-            if not path.exists():
+            stamp = _file_stamp(path)
+            if stamp is None:
                 return None
+
+            cached = self._cache_get(path, stamp)
+            if cached is not None:
+                return cached
             
             with open(path, 'r') as f:
-                return json.load(f)
+                plan = json.load(f)
+            self._cache_put(path, stamp, plan)
+            return plan
         except Exception as e:
             logger.error('Error retrieving major plan: user_id=%s plan_id=%s error=%s', user_id, plan_id, e)
             return None
@@ -108,28 +181,15 @@ class MajorExamCacheManager:
         return self.store_plan(user_id, plan_id, plan_data)
     
     def get_all_user_plans(self, user_id: str, limit: int = 5) -> list:
-        """Get recent plans for a user (newest first)"""
+        """Get recent plans for a user (newest first), served from the user's manifest"""
         try:
-            user_dir = self._get_user_dir(user_id)
-            
-            plans = []
-            for file in sorted(
-                user_dir.glob('PLAN-major-*.json'),
-                key=lambda p: p.stat().st_mtime,
-                reverse=True
-            )[:limit]:
-                with open(file, 'r') as f:
-                    plan = json.load(f)
-                    plans.append({
-                        'plan_id': plan.get('plan_id'),
-                        'created_at': plan.get('created_at'),
-                        'total_students': plan.get('metadata', {}).get('total_students', 0),
-                        'allocated_count': plan.get('metadata', {}).get('allocated_count', 0),
-                        'room_count': plan.get('metadata', {}).get('room_count', 0),
-                        'status': plan.get('metadata', {}).get('status', 'pending')
-                    })
-            
-            return plans
+            with self._lock:
+                manifest = self._load_manifest(user_id)
+                entries = sorted(manifest.values(), key=lambda e: e.get('mtime', 0), reverse=True)[:limit]
+            return [
+                {k: entry.get(k) for k in ('plan_id', 'created_at', 'total_students', 'allocated_count', 'room_count', 'status')}
+                for entry in entries
+            ]
         except Exception as e:
             logger.error('Error getting major plans for user_id=%s: %s', user_id, e)
             return []
@@ -147,9 +207,14 @@ class MajorExamCacheManager:
         try:
             path = self._get_plan_path(user_id, plan_id)
             
-            if path.exists():
-                path.unlink()
-                return True
+            with self._lock:
+                self._cache_invalidate(path)
+                if path.exists():
+                    path.unlink()
+                    manifest = self._load_manifest(user_id)
+                    if manifest.pop(path.stem, None) is not None:
+                        self._save_manifest(user_id, manifest)
+                    return True
             
             return False
         except Exception as e:
@@ -159,19 +224,24 @@ class MajorExamCacheManager:
     def cleanup_old_plans(self, days: int = 30) -> int:
         """Remove plans older than specified days"""
         try:
-            import time
-            
             current_time = time.time()
             cutoff_time = current_time - (days * 86400)  # 86400 seconds per day
             
             deleted_count = 0
             for user_dir in self.major_dir.iterdir():
                 if user_dir.is_dir():
+                    user_deleted = 0
                     for plan_file in user_dir.glob('PLAN-major-*.json'):
                         file_time = plan_file.stat().st_mtime
                         if file_time < cutoff_time:
+                            self._cache_invalidate(plan_file)
                             plan_file.unlink()
-                            deleted_count += 1
+                            user_deleted += 1
+                    if user_deleted:
+                        # Re-sync the manifest with what is left on disk
+                        with self._lock:
+                            self._load_manifest(user_dir.name)
+                    deleted_count += user_deleted
             
             if deleted_count > 0:
                 logger.info('Cleaned up %s old major exam plans', deleted_count)
@@ -181,6 +251,88 @@ class MajorExamCacheManager:
             logger.error('Error cleaning up major exam plans: %s', e)
             return 0
 
+    # ==================================================
+    # PER-USER MANIFEST
+    # ==================================================
+    def _manifest_path(self, user_id: str) -> Path:
+        return self._get_user_dir(user_id) / MANIFEST_FILE
+
+    def _load_manifest(self, user_id: str) -> dict:
+        """
+        The user's {safe_plan_id: listing entry} map (caller holds self._lock).
+
+        Served from memory while manifest.json is unchanged, then reconciled with
+        the directory listing: plan files created or removed behind our back
+        (older versions, other workers, manual cleanup) are added or dropped, so
+        only unknown plans are ever opened.
+        """
+        user_id = str(user_id)
+        path = self._manifest_path(user_id)
+        stamp = _file_stamp(path)
+        cached = self._manifests.get(user_id)
+        if cached is not None and cached[0] == stamp and stamp is not None:
+            manifest = cached[1]
+        else:
+            try:
+                with open(path, 'r') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = {}
+
+        on_disk = {p.stem: p for p in path.parent.glob('PLAN-major-*.json')}
+        changed = False
+        for key in [k for k in manifest if k not in on_disk]:
+            del manifest[key]
+            changed = True
+        for key, plan_path in on_disk.items():
+            if key in manifest:
+                continue
+            try:
+                with open(plan_path, 'r') as f:
+                    plan = json.load(f)
+                manifest[key] = _manifest_entry(plan, plan_path.stat().st_mtime)
+                changed = True
+            except (OSError, ValueError) as e:
+                logger.warning('Skipping unreadable major plan %s: %s', plan_path, e)
+
+        if changed or stamp is None:
+            self._save_manifest(user_id, manifest)
+        else:
+            self._manifests[user_id] = (stamp, manifest)
+        return manifest
+
+    def _save_manifest(self, user_id: str, manifest: dict):
+        path = self._manifest_path(user_id)
+        _atomic_write_text(path, json.dumps(manifest, separators=(',', ':')))
+        self._manifests[str(user_id)] = (_file_stamp(path), manifest)
+
+    # ==================================================
+    # PARSED-PLAN LRU
+    # ==================================================
+    def _cache_get(self, path: Path, stamp):
+        """Private copy of a cached plan if the file is unchanged, else None."""
+        with self._lock:
+            entry = self._plan_cache.get(str(path))
+            if entry is None or entry[0] != stamp:
+                return None
+            self._plan_cache.move_to_end(str(path))
+            blob = entry[1]
+        # Plans are stored pickled: unpickling gives each caller its own copy
+        # and is several times faster than re-parsing the JSON file
+        return pickle.loads(blob)
+
+    def _cache_put(self, path: Path, stamp, plan: dict):
+        blob = pickle.dumps(plan, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._plan_cache[str(path)] = (stamp, blob)
+            self._plan_cache.move_to_end(str(path))
+            while len(self._plan_cache) > self._plan_cache_size:
+                self._plan_cache.popitem(last=False)
+
+    def _cache_invalidate(self, path: Path):
+        with self._lock:
+            self._plan_cache.pop(str(path), None)
+
 
 # Singleton instance
 _cache_manager = None
@@ -6,7 +6,9 @@ class PaperSet(Enum):
     A = "A"
     B = "B"
 
-@dataclass
+# slots=True: a room grid holds rows*cols Seat objects, so dropping the
+# per-instance __dict__ keeps plan generation memory flat for large halls.
+@dataclass(slots=True)
 class Seat:
     row: int
     col: int
@@ -1,2 +1,2 @@
-from .db import get_db, close_db, get_db_connection_standalone
+from .db import get_db, get_read_db, close_db, get_db_connection_standalone
 from .schema import ensure_demo_db
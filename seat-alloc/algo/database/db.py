@@ -1,31 +1,33 @@
 # Primary database connection and session management module.
 # Provides global access to the SQLite database for both request-bound and standalone contexts.
-import sqlite3
 import logging
 from flask import g
 from algo.config.settings import Config
+from algo.database.pool import connect
 
 logger = logging.getLogger(__name__)
 
 def get_db():
     """Get database connection for the current request"""
     if 'db' not in g:
-        g.db = sqlite3.connect(Config.DB_PATH, timeout=20)
-        g.db.row_factory = sqlite3.Row
-        g.db.execute("PRAGMA journal_mode=WAL")
+        g.db = connect(Config.DB_PATH, timeout=20)
     return g.db
 
+def get_read_db():
+    """Read-only (mode=ro) connection for the current request; sees committed data only"""
+    if 'read_db' not in g:
+        g.read_db = connect(Config.DB_PATH, timeout=20, readonly=True)
+    return g.read_db
+
 def close_db(e=None):
-    """Close database connection at end of request"""
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    """Return the request's database connections to the pool"""
+    for key in ('db', 'read_db'):
+        db = g.pop(key, None)
+        if db is not None:
+            db.close()
 
 def get_db_connection_standalone():
-    """Get a standalone database connection (for scripts/outside context)"""
-    conn = sqlite3.connect(Config.DB_PATH, timeout=20)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+    """Get a standalone database connection (for scripts/outside context); close() returns it to the pool"""
+    return connect(Config.DB_PATH, timeout=20)
 
 get_db_connection = get_db_connection_standalone
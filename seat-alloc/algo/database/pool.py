@@ -0,0 +1,178 @@
+# Shared SQLite connection pool.
+# Connections are opened once with tuned PRAGMAs and recycled when callers close() them,
+# so request handlers stop paying for connect + PRAGMA round trips on every call.
+import os
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from algo.config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Applied once per physical connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",      # durable at checkpoints; safe with WAL
+    "PRAGMA cache_size=-16000",       # 16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",     # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Idle connections are kept for the most recently used database files only
+POOL_MAX_PATHS = 4
+
+
+class PooledConnection:
+    """
+    sqlite3.Connection stand-in handed out by the pool.
+
+    Behaves like the wrapped connection; close() returns it to the pool instead
+    of closing it (rolling back anything left uncommitted, like a real close),
+    after which this handle is unusable. Handles dropped without close() are
+    returned when garbage collected.
+    """
+    __slots__ = ('_conn', '_pool', '_key')
+
+    def __init__(self, conn, pool, key):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_key', key)
+
+    def _raw(self):
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return conn
+
+    def __getattr__(self, name):
+        return getattr(self._raw(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw(), name, value)
+
+    def __enter__(self):
+        self._raw().__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._raw().__exit__(*exc)
+
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, '_conn', None)
+            self._pool.release(self._key, conn)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of idle SQLite connections, keyed by database file.
+
+    Each connection is checked out by one caller at a time, so it may move
+    between threads (check_same_thread=False) and survives the dev server's
+    thread-per-request model. Idle connections are dropped after a fork.
+    """
+
+    def __init__(self, max_idle=None):
+        self.max_idle = Config.DB_POOL_MAX_IDLE if max_idle is None else max_idle
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()  # (path, timeout, readonly) -> [sqlite3.Connection, ...]
+        self._pid = os.getpid()
+        self.opened = 0
+
+    def connect(self, path=None, timeout=20, readonly=False):
+        """
+        Check out a connection (row_factory=sqlite3.Row) to path (default Config.DB_PATH).
+        readonly connections are opened with a mode=ro URI: they never take the
+        write lock and, under WAL, read the last committed state without
+        waiting on writers.
+        """
+        key = (str(path if path is not None else Config.DB_PATH), timeout, bool(readonly))
+        conn = None
+        with self._lock:
+            if self._pid != os.getpid():
+                # Never share SQLite handles with a parent process
+                self._idle.clear()
+                self._pid = os.getpid()
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                self._idle.move_to_end(key)
+        if conn is None:
+            conn = self._open(*key)
+        return PooledConnection(conn, self, key)
+
+    def _open(self, path, timeout, readonly=False):
+        if readonly:
+            conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True,
+                                   timeout=timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        for pragma in PRAGMAS:
+            if readonly and pragma.startswith("PRAGMA journal_mode"):
+                continue  # persistent in the file; set by read-write connections
+            conn.execute(pragma)
+        conn.row_factory = sqlite3.Row
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def release(self, key, conn):
+        """Return a connection to the idle list (or close it if the pool is full)."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+            conn.text_factory = str
+        except sqlite3.Error:
+            conn.close()
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                idle = self._idle.setdefault(key, [])
+                self._idle.move_to_end(key)
+                if len(idle) < self.max_idle:
+                    idle.append(conn)
+                    conn = None
+                evicted = []
+                while len(self._idle) > POOL_MAX_PATHS:
+                    evicted.extend(self._idle.popitem(last=False)[1])
+            else:
+                evicted = []
+        for stale in evicted + ([conn] if conn is not None else []):
+            stale.close()
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close when returned)."""
+        with self._lock:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+    def idle_count(self):
+        with self._lock:
+            return sum(len(conns) for conns in self._idle.values())
+
+
+_POOL = ConnectionPool()
+
+
+def get_pool():
+    return _POOL
+
+
+def connect(path=None, timeout=20, readonly=False):
+    """Pooled replacement for sqlite3.connect(path, timeout) + row_factory=sqlite3.Row."""
+    return _POOL.connect(path, timeout, readonly)
@@ -1,10 +1,21 @@
-from typing import List, Dict, Optional
-from algo.database.db import get_db
+from typing import Iterable, List, Dict, Optional
+from algo.database.db import get_db, get_read_db
+
+# Per-connection staging table for one room's seats (see allocate_room_seats)
+_ROOM_STAGE_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS room_seat_stage (
+        ord INTEGER PRIMARY KEY,
+        enrollment TEXT NOT NULL UNIQUE,
+        seat_position TEXT,
+        paper_set TEXT,
+        batch_name TEXT
+    )
+"""
 
 class AllocationQueries:
     @staticmethod
     def get_allocations_by_session(session_id: int) -> List[Dict]:
-        db = get_db()
+        db = get_read_db()
         cursor = db.execute("""
             SELECT a.seat_position, a.paper_set, a.enrollment, s.name, s.batch_name, c.name as room_name, a.classroom_id
             FROM allocations a
@@ -29,10 +40,77 @@ class AllocationQueries:
         """, allocations)
         db.commit()
 
+    @staticmethod
+    def allocate_room_seats(session_id: int, classroom_id: int, seats: Iterable[tuple],
+                            batch_names: Optional[List[str]] = None, conn=None) -> List[tuple]:
+        """
+        Set-based persistence of one room's seats.
+
+        seats: iterable of (enrollment, seat_position, paper_set, batch_name or None)
+        in seat order. They are staged in a TEMP table and resolved to student ids
+        by one INSERT ... SELECT probing students(upload_id, enrollment) for each
+        of the session's uploads, so the cost follows the room, not the session.
+        The first seat wins for a repeated enrollment; unknown, out-of-batch and
+        already-allocated students are skipped. batch_name falls back to the
+        student's batch. Session counters follow via the allocations triggers.
+        With conn the caller commits; otherwise committed here.
+
+        Returns:
+            The inserted rows as (id, student_id, enrollment, seat_position,
+            batch_name, paper_set) tuples in seat order (the undo journal keeps them)
+        """
+        seats = [tuple(seat) for seat in seats]
+        # RETURNING order is unspecified, so seat order is restored here from the staged ord
+        seat_order = {}
+        for i, seat in enumerate(seats):
+            seat_order.setdefault(seat[0], i)
+
+        db = conn if conn is not None else get_db()
+        db.execute(_ROOM_STAGE_DDL)
+        db.execute("DELETE FROM temp.room_seat_stage")
+        db.executemany("""
+            INSERT OR IGNORE INTO temp.room_seat_stage (ord, enrollment, seat_position, paper_set, batch_name)
+            VALUES (?, ?, ?, ?, ?)
+        """, ((i,) + seat for i, seat in enumerate(seats)))
+
+        batch_filter, params = "", [session_id, classroom_id, session_id, session_id]
+        if batch_names:
+            # Unary + keeps the planner on the (upload_id, enrollment) probe
+            batch_filter = f"AND +s.batch_name IN ({','.join('?' * len(batch_names))})"
+            params.extend(batch_names)
+
+        # CROSS JOIN pins the loop order: staged seats drive, each probing the
+        # session's uploads and UNIQUE(upload_id, enrollment). MAX(s.id) picks one
+        # student if an enrollment appears in two uploads; the bare s.batch_name
+        # then comes from that same row.
+        cursor = db.execute(f"""
+            INSERT INTO allocations
+            (session_id, classroom_id, student_id, enrollment, seat_position, batch_name, paper_set)
+            SELECT ?, ?, MAX(s.id), r.enrollment, r.seat_position,
+                   COALESCE(r.batch_name, s.batch_name), COALESCE(r.paper_set, 'A')
+            FROM temp.room_seat_stage r
+            CROSS JOIN uploads u
+            CROSS JOIN students s
+            WHERE u.session_id = ? AND s.upload_id = u.id AND s.enrollment = r.enrollment
+              AND NOT EXISTS (
+                SELECT 1 FROM allocations a WHERE a.session_id = ? AND a.student_id = s.id
+              ) {batch_filter}
+            GROUP BY r.ord
+            ORDER BY r.ord
+            RETURNING id, student_id, enrollment, seat_position, batch_name, paper_set
+        """, params)
+        inserted = sorted((tuple(row) for row in cursor.fetchall()), key=lambda row: seat_order[row[2]])
+        db.execute("DELETE FROM temp.room_seat_stage")
+        if conn is None:
+            db.commit()
+        return inserted
+
     @staticmethod
     def clear_session_allocations(session_id: int):
+        """Delete a session's allocations and its undo/redo journal."""
         db = get_db()
         db.execute("DELETE FROM allocations WHERE session_id = ?", (session_id,))
+        db.execute("DELETE FROM allocation_history WHERE session_id = ?", (session_id,))
         db.commit()
     
     @staticmethod
@@ -52,7 +130,7 @@ class AllocationQueries:
         Returns:
             List of dicts with classroom_id, classroom_name, and count
         """
-        db = get_db()
+        db = get_read_db()
         cursor = db.execute("""
             SELECT 
                 a.classroom_id,
@@ -1,7 +1,7 @@
 import sqlite3
 import datetime
 from typing import Optional, Dict, List, Any
-from algo.database.db import get_db
+from algo.database.db import get_db, get_read_db
 
 class SessionQueries:
     @staticmethod
@@ -44,6 +44,34 @@ class SessionQueries:
         )
         db.commit()
 
+    @staticmethod
+    def get_session_counters(session_id: int) -> tuple:
+        """(total_students, allocated_count) as maintained by the counter triggers."""
+        db = get_read_db()
+        row = db.execute(
+            "SELECT total_students, allocated_count FROM allocation_sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        return (row[0] or 0, row[1] or 0) if row else (0, 0)
+
+    @staticmethod
+    def touch_session(session_id: int):
+        db = get_db()
+        db.execute(
+            "UPDATE allocation_sessions SET last_activity = CURRENT_TIMESTAMP WHERE session_id = ?",
+            (session_id,)
+        )
+        db.commit()
+
+    @staticmethod
+    def rebuild_session_counters(session_id: Optional[int] = None, dry_run: bool = False) -> List[tuple]:
+        """Recount session counters from students/allocations; returns the drifted sessions."""
+        from algo.database.schema import rebuild_session_counters
+        db = get_db()
+        drift = rebuild_session_counters(db, session_id, dry_run=dry_run)
+        db.commit()
+        return drift
+
     @staticmethod
     def mark_session_completed(session_id: int):
         db = get_db()
@@ -8,6 +8,111 @@ from algo.config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+# INSERT ... RETURNING (allocation_queries.allocate_room_seats) needs SQLite 3.35+
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+
+def check_sqlite_version():
+    """Fail fast at startup if the linked SQLite library is too old for our SQL."""
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        raise RuntimeError(
+            f"SQLite {'.'.join(map(str, MIN_SQLITE_VERSION))} or newer is required "
+            f"(INSERT ... RETURNING); this Python is linked against SQLite {sqlite3.sqlite_version}. "
+            f"Upgrade Python/SQLite or use a build that bundles a newer libsqlite3."
+        )
+
+# allocation_sessions.total_students / allocated_count are denormalised counts of
+# students (via uploads.session_id) and allocations rows. These triggers keep them
+# current inside whatever transaction touches those tables, so readers never
+# recount. Deleting an upload subtracts its students up front; with foreign_keys
+# ON the cascaded student deletes then find no upload and change nothing.
+SESSION_COUNTER_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_students_insert_count AFTER INSERT ON students
+    BEGIN
+        UPDATE allocation_sessions SET total_students = total_students + 1
+        WHERE session_id = (SELECT session_id FROM uploads WHERE id = NEW.upload_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_students_delete_count AFTER DELETE ON students
+    BEGIN
+        UPDATE allocation_sessions SET total_students = MAX(0, total_students - 1)
+        WHERE session_id = (SELECT session_id FROM uploads WHERE id = OLD.upload_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_uploads_delete_count BEFORE DELETE ON uploads
+    WHEN OLD.session_id IS NOT NULL
+    BEGIN
+        UPDATE allocation_sessions
+        SET total_students = MAX(0, total_students - (SELECT COUNT(*) FROM students WHERE upload_id = OLD.id))
+        WHERE session_id = OLD.session_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_uploads_move_count AFTER UPDATE OF session_id ON uploads
+    WHEN OLD.session_id IS NOT NEW.session_id
+    BEGIN
+        UPDATE allocation_sessions
+        SET total_students = MAX(0, total_students - (SELECT COUNT(*) FROM students WHERE upload_id = NEW.id))
+        WHERE session_id = OLD.session_id;
+        UPDATE allocation_sessions
+        SET total_students = total_students + (SELECT COUNT(*) FROM students WHERE upload_id = NEW.id)
+        WHERE session_id = NEW.session_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_allocations_insert_count AFTER INSERT ON allocations
+    BEGIN
+        UPDATE allocation_sessions SET allocated_count = allocated_count + 1
+        WHERE session_id = NEW.session_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_allocations_delete_count AFTER DELETE ON allocations
+    BEGIN
+        UPDATE allocation_sessions SET allocated_count = MAX(0, allocated_count - 1)
+        WHERE session_id = OLD.session_id;
+    END
+    """,
+)
+
+_COUNTER_TRUTH_SQL = """
+    SELECT sess.session_id, sess.total_students, sess.allocated_count,
+           (SELECT COUNT(*) FROM uploads u JOIN students s ON s.upload_id = u.id
+             WHERE u.session_id = sess.session_id) AS actual_total,
+           (SELECT COUNT(*) FROM allocations a
+             WHERE a.session_id = sess.session_id) AS actual_allocated
+    FROM allocation_sessions sess
+"""
+
+
+def rebuild_session_counters(conn, session_id=None, dry_run=False):
+    """
+    Recount total_students / allocated_count from the source tables.
+
+    Returns [(session_id, (old_total, new_total), (old_allocated, new_allocated)), ...]
+    for every session whose stored counters had drifted. With dry_run the
+    drift is only reported. The caller commits.
+    """
+    sql, params = _COUNTER_TRUTH_SQL, ()
+    if session_id is not None:
+        sql, params = sql + " WHERE sess.session_id = ?", (session_id,)
+
+    drift = []
+    for sid, total, allocated, actual_total, actual_allocated in conn.execute(sql, params).fetchall():
+        if (total or 0, allocated or 0) != (actual_total, actual_allocated):
+            drift.append((sid, (total, actual_total), (allocated, actual_allocated)))
+
+    if not dry_run and drift:
+        conn.executemany(
+            "UPDATE allocation_sessions SET total_students = ?, allocated_count = ? WHERE session_id = ?",
+            [(total[1], allocated[1], sid) for sid, total, allocated in drift],
+        )
+    return drift
+
+
 def ensure_demo_db():
     """
     Initialize database with all required tables.
@@ -16,6 +121,7 @@ def ensure_demo_db():
     This function is idempotent - safe to run multiple times.
     """
     logger.info("🔧 Initializing database...")
+    check_sqlite_version()
 
     # Guard against accidental secondary DB creation inside algo/.
     # The canonical DB path is Config.DB_PATH (repo root/demo.db).
@@ -372,6 +478,7 @@ def ensure_demo_db():
                 action_type TEXT CHECK(action_type IN ('allocate', 'undo', 'reset')) NOT NULL,
                 students_affected INTEGER DEFAULT 0,
                 snapshot_data TEXT,
+                undone INTEGER DEFAULT 0,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (session_id) REFERENCES allocation_sessions(session_id) ON DELETE CASCADE,
                 UNIQUE(session_id, step_number)
@@ -443,6 +550,7 @@ def ensure_demo_db():
             ("ALTER TABLE classrooms ADD COLUMN updated_at DATETIME DEFAULT CURRENT_TIMESTAMP", "classrooms.updated_at"),
             ("ALTER TABLE classrooms ADD COLUMN block_width INTEGER DEFAULT 2", "classrooms.block_width"),
             ("ALTER TABLE classrooms ADD COLUMN block_structure TEXT DEFAULT NULL", "classrooms.block_structure"),
+            ("ALTER TABLE allocation_history ADD COLUMN undone INTEGER DEFAULT 0", "allocation_history.undone"),
             # Auth-related columns (consolidated from user_auth.db)
             ("ALTER TABLE users ADD COLUMN full_name TEXT", "users.full_name"),
             ("ALTER TABLE users ADD COLUMN auth_provider TEXT DEFAULT 'local'", "users.auth_provider"),
@@ -458,6 +566,49 @@ def ensure_demo_db():
                 # Column already exists
                 pass
 
+        # ====================================================================
+        # 12. HOT-QUERY INDEXES (students -> uploads -> allocation_sessions)
+        # ====================================================================
+        # Session-scoped student lookups, dashboard counts and the admin
+        # isolation filters all walk this chain; without these they scan
+        # every semester's rows. Created after the column migrations above
+        # (older DBs gain user_id there). Checked by tests/test_query_plans.py.
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_uploads_session
+            ON uploads(session_id);
+        """)
+
+        # Covers per-session batch counts (GROUP BY batch_name) without touching rows
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_students_upload_batch
+            ON students(upload_id, batch_name, batch_color);
+        """)
+
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sessions_user_status
+            ON allocation_sessions(user_id, status);
+        """)
+
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_feedback_user
+            ON feedback(user_id);
+        """)
+
+        # ====================================================================
+        # 13. SESSION COUNTER TRIGGERS (see SESSION_COUNTER_TRIGGERS)
+        # ====================================================================
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_%_count'")
+        had_triggers = cur.fetchone()[0] == len(SESSION_COUNTER_TRIGGERS)
+        for ddl in SESSION_COUNTER_TRIGGERS:
+            cur.execute(ddl)
+        if not had_triggers:
+            # Counters written by the old application-side updates may have drifted
+            drift = rebuild_session_counters(conn)
+            if drift:
+                logger.info(f"🔧 Rebuilt counters for {len(drift)} session(s)")
+
+        cur.execute("PRAGMA optimize")
+
         conn.commit()
         logger.info(f"✅ Database initialized successfully at {Config.DB_PATH}")
         
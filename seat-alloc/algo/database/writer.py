@@ -0,0 +1,208 @@
+# Single-writer queue for SQLite.
+# One thread per database file owns the only write connection. Request threads hand it
+# small write jobs and it runs whatever has queued up inside one BEGIN IMMEDIATE ... COMMIT
+# (group commit), so writers never fight over the lock and a burst of N writes pays for
+# one commit instead of N.
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future
+
+from algo.config.settings import Config
+from algo.database.pool import PRAGMAS, connect
+
+logger = logging.getLogger(__name__)
+
+# Writer threads exit after this long without work and restart on the next submit
+WRITER_IDLE_SECONDS = 5.0
+
+
+class WriteQueue:
+    """
+    Serialises writes to one database file through a dedicated thread.
+
+    A job is a callable fn(conn, *args, **kwargs). It runs on the writer's
+    connection inside the open group transaction, under a SAVEPOINT, so a job
+    that raises is rolled back alone and the rest of the batch still commits.
+    Jobs must not commit, roll back or touch any other connection (there is no
+    Flask app context on the writer thread). A job's result is delivered only
+    once its group has committed.
+    """
+
+    def __init__(self, path, timeout=20, max_batch=None, idle_timeout=WRITER_IDLE_SECONDS):
+        self.path = str(path)
+        self.timeout = timeout
+        self.max_batch = max_batch or Config.DB_WRITE_BATCH_MAX
+        self.idle_timeout = idle_timeout
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.commits = 0
+        self.jobs_run = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(conn, *args, **kwargs); returns a Future for its result."""
+        future = Future()
+        self._jobs.put((fn, args, kwargs, future))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"db-writer:{os.path.basename(self.path)}",
+                                                daemon=True)
+                self._thread.start()
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """submit() and wait: returns fn's result once committed, or raises its exception."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("write jobs cannot wait on the write queue")
+        return self.submit(fn, *args, **kwargs).result()
+
+    def close(self):
+        """Finish queued jobs and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            self._jobs.put(None)
+            thread.join()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _loop(self):
+        conn = None
+        try:
+            conn = self._open()
+            while True:
+                try:
+                    job = self._jobs.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    job = None
+                batch = [job] if job is not None else []
+                stop = job is None  # idle, or close() asked us to stop
+                while len(batch) < self.max_batch:
+                    try:
+                        job = self._jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        stop = True
+                    else:
+                        batch.append(job)
+                if batch:
+                    self._run_batch(conn, batch)
+                if stop:
+                    with self._lock:
+                        if self._jobs.empty():
+                            self._thread = None
+                            return
+        except BaseException as e:
+            logger.error(f"Writer for {self.path} failed: {e}")
+            with self._lock:
+                self._thread = None
+            self._fail_pending(e)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _run_batch(self, conn, batch):
+        """Run one group of jobs in a single transaction; resolve futures after COMMIT."""
+        done = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    result = fn(conn, *args, **kwargs)
+                except Exception as e:
+                    if not conn.in_transaction:
+                        raise  # SQLite aborted the whole group
+                    conn.execute("ROLLBACK TO write_job")
+                    conn.execute("RELEASE write_job")
+                    future.set_exception(e)
+                    continue
+                conn.execute("RELEASE write_job")
+                done.append((future, result))
+            conn.commit()
+        except BaseException as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.commits += 1
+        self.jobs_run += len(done)
+        for future, result in done:
+            future.set_result(result)
+
+    def _fail_pending(self, error):
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None and job[3].set_running_or_notify_cancel():
+                job[3].set_exception(error)
+
+
+_WRITERS = {}
+_WRITERS_LOCK = threading.Lock()
+_WRITERS_PID = os.getpid()
+
+
+def get_writer(path=None):
+    """The process-wide WriteQueue for path (default Config.DB_PATH)."""
+    global _WRITERS_PID
+    key = str(path if path is not None else Config.DB_PATH)
+    with _WRITERS_LOCK:
+        if _WRITERS_PID != os.getpid():
+            # Writer threads do not survive a fork
+            _WRITERS.clear()
+            _WRITERS_PID = os.getpid()
+        writer = _WRITERS.get(key)
+        if writer is None:
+            writer = _WRITERS[key] = WriteQueue(key)
+        return writer
+
+
+def close_writers():
+    """Drain and stop every writer thread (tests, shutdown)."""
+    with _WRITERS_LOCK:
+        writers = list(_WRITERS.values())
+        _WRITERS.clear()
+    for writer in writers:
+        writer.close()
+
+
+def run_write(fn, *args, path=None, **kwargs):
+    """
+    Run write job fn(conn, *args, **kwargs) and return its result once committed.
+
+    Goes through the database's single-writer queue; with Config.DB_WRITE_QUEUE
+    off it runs inline on a pooled connection in its own BEGIN IMMEDIATE
+    transaction (same contract, no batching). The calling thread must not hold
+    uncommitted writes on another connection to the same database.
+    """
+    if Config.DB_WRITE_QUEUE:
+        return get_writer(path).run(fn, *args, **kwargs)
+
+    conn = connect(path, timeout=20)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        result = fn(conn, *args, **kwargs)
+        conn.commit()
+        return result
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -35,6 +35,15 @@ ROLE_MAP = {
 VALID_ROLES = ['developer', 'admin', 'faculty']
 
 
+def _invalidate_auth_cache():
+    """Drop cached roles when migrating in-process; a running server refreshes within AUTH_CACHE_TTL."""
+    try:
+        from algo.services.auth_service import invalidate_user_cache
+    except ImportError:
+        return
+    invalidate_user_cache()
+
+
 def migrate(apply=False):
     if not os.path.exists(DB_PATH):
         print(f"❌ Database not found at: {DB_PATH}")
@@ -112,6 +121,7 @@ def migrate(apply=False):
         for user_id, old_role, new_role in changes:
             cursor.execute("UPDATE users SET role = ? WHERE id = ?", (new_role, user_id))
         conn.commit()
+        _invalidate_auth_cache()
         print("✅ Migration complete!")
     else:
         print("\n⚠️  DRY RUN — no changes made. Run with --apply to execute.")
@@ -1,5 +1,5 @@
-import sqlite3
 import os
+from algo.database.pool import connect
 
 # Update this path to match your project structure
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,10 +10,9 @@ def init_database():
     # Ensure directory exists
     os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
     
-    conn = sqlite3.connect(DATABASE_PATH, timeout=20)
+    # Pooled connection: WAL, busy_timeout and the other PRAGMAs are applied by the pool
+    conn = connect(DATABASE_PATH, timeout=20)
     cursor = conn.cursor()
-    cursor.execute("PRAGMA journal_mode=WAL")
-    cursor.execute("PRAGMA busy_timeout=20000")
     
     # Create user_templates table
     cursor.execute('''
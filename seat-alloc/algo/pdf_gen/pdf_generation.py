@@ -3,6 +3,8 @@ import io
 import json
 import os
 import hashlib
+import threading
+from collections import OrderedDict
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet
@@ -26,9 +28,21 @@ CACHE_DIR = os.path.join(PDF_GEN_DIR, "seat_plan_generated")
 IMAGE_PATH = os.path.join(PDF_GEN_DIR, "data", "banner.png")
 CUSTOM_PAGE_SIZE = (364 * mm, 235 * mm)
 
-def seating_payload_digest(data: dict, user_id: str = 'system', template_name: str = 'default') -> str:
-    """Create hash including user template configuration"""
-    seating_data_normalized = json.dumps(data, sort_keys=True, separators=(',', ':'))
+# In-memory PDFs of versioned plan rooms, keyed by seating_payload_digest(version_key=...)
+PDF_BUFFER_CACHE_SIZE = 32
+_PDF_BUFFER_CACHE = OrderedDict()
+_PDF_BUFFER_LOCK = threading.Lock()
+
+def seating_payload_digest(data: dict, user_id: str = 'system', template_name: str = 'default', version_key: str = None) -> str:
+    """Create hash including user template configuration.
+
+    When version_key (plan etag + room) is given it stands in for the payload,
+    so cached plans are identified without serialising the seating matrix.
+    """
+    if version_key:
+        seating_data_normalized = f"version:{version_key}"
+    else:
+        seating_data_normalized = json.dumps(data, sort_keys=True, separators=(',', ':'))
     
     if template_manager:
         template_hash = template_manager.get_template_hash(user_id, template_name)
@@ -578,19 +592,23 @@ def generate_seating_pdf_to_buffer(
     data: dict,
     user_id: str = 'system',
     template_name: str = 'default',
-    room_no: str = None
+    room_no: str = None,
+    version_key: str = None
 ) -> io.BytesIO:
     """
     Generate a seating-plan PDF entirely in memory and return a BytesIO buffer.
 
-    Bypasses the L2 disk cache completely — every call produces a fresh PDF
-    that is streamed directly to the caller without touching the filesystem.
+    Bypasses the L2 disk cache completely — the PDF is streamed directly to the
+    caller without touching the filesystem. Payloads from a versioned cache
+    snapshot pass version_key, and their PDF bytes are reused from a small
+    in-process LRU until the plan (or the user's template) changes.
 
     Args:
         data:          Seating payload (same shape accepted by create_seating_pdf).
         user_id:       Used to select the user's template configuration.
         template_name: Template name to pass to template_manager.
         room_no:       Optional room label; auto-extracted from data when omitted.
+        version_key:   Optional "<plan etag>:<room>" identifying the payload.
 
     Returns:
         BytesIO buffer positioned at byte 0, ready for send_file / read.
@@ -612,6 +630,15 @@ def generate_seating_pdf_to_buffer(
                 if room_no:
                     break
 
+    digest = None
+    if version_key:
+        digest = seating_payload_digest(data, user_id, template_name, version_key=f"{version_key}|{room_no}")
+        with _PDF_BUFFER_LOCK:
+            pdf_bytes = _PDF_BUFFER_CACHE.get(digest)
+            if pdf_bytes is not None:
+                _PDF_BUFFER_CACHE.move_to_end(digest)
+                return io.BytesIO(pdf_bytes)
+
     buffer = io.BytesIO()
     # ReportLab's SimpleDocTemplate accepts any file-like object as first argument
     create_seating_pdf(
@@ -621,6 +648,13 @@ def generate_seating_pdf_to_buffer(
         template_name=template_name,
         room_no=room_no
     )
+
+    if digest:
+        with _PDF_BUFFER_LOCK:
+            _PDF_BUFFER_CACHE[digest] = buffer.getvalue()
+            _PDF_BUFFER_CACHE.move_to_end(digest)
+            while len(_PDF_BUFFER_CACHE) > PDF_BUFFER_CACHE_SIZE:
+                _PDF_BUFFER_CACHE.popitem(last=False)
     buffer.seek(0)
     return buffer
     
@@ -4,6 +4,7 @@ import os
 import sqlite3
 from datetime import datetime
 from .database import DATABASE_PATH, init_database
+from algo.database.pool import connect
 
 # Simple secure_filename fallback
 def secure_filename(filename):
@@ -30,11 +31,7 @@ class TemplateManager:
         """Get database connection with proper setup"""
         # Ensure directory exists to prevent connection errors
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path, timeout=20)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA busy_timeout=20000")
-        return conn
+        return connect(self.db_path, timeout=20)
     
     def _get_default_template(self):
         """Fallback default template"""
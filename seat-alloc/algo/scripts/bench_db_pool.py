@@ -0,0 +1,97 @@
+"""
+Benchmark: request throughput with and without the SQLite connection pool.
+
+Spins up the Flask app in-process against a throwaway database, signs up one
+user and replays authenticated read requests (token check + DB reads) through
+the test client:
+  - "unpooled": every connection is a fresh sqlite3.connect + PRAGMAs (old behaviour)
+  - "pooled"  : connections come from algo.database.pool
+
+Run from project root:
+    python algo/scripts/bench_db_pool.py [--requests 2000] [--threads 4]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+algo_dir = os.path.join(script_dir, '..')
+project_root = os.path.join(algo_dir, '..')
+sys.path.insert(0, os.path.abspath(project_root))
+
+from algo.database import pool as pool_module
+
+ENDPOINTS = ["/api/auth/profile", "/api/classrooms", "/api/sessions/active"]
+
+
+def _unpooled_connect(path=None, timeout=20):
+    """Pre-pool behaviour: a new connection per call."""
+    conn = sqlite3.connect(str(path if path is not None else pool_module.Config.DB_PATH), timeout=timeout)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _run(client, headers, total, threads):
+    per_thread = total // threads
+
+    def worker():
+        for i in range(per_thread):
+            resp = client.get(ENDPOINTS[i % len(ENDPOINTS)], headers=headers)
+            assert resp.status_code < 500, resp.status_code
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request throughput with/without the DB connection pool")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        # Keep the log, the plan cache and the cleanup scheduler away from the real app files
+        with patch("algo.config.settings.Config.DB_PATH", db_path), \
+             patch("algo.config.settings.Config.LOG_FILE", Path(tmp) / "app.log"), \
+             patch("algo.core.cache.cache_manager.CACHE_DIR", str(Path(tmp) / "cache")), \
+             patch("algo.scripts.clean_old_data.start_scheduler", lambda: None):
+            from algo.main import create_app
+            app = create_app(test_config={"TESTING": True, "DB_PATH": str(db_path)})
+            client = app.test_client()
+            resp = client.post("/api/auth/signup", json={
+                "username": "bench", "email": "bench@example.com",
+                "password": "BenchPass123!", "role": "faculty",
+            })
+            headers = {"Authorization": f"Bearer {resp.get_json()['token']}"}
+
+            results = {}
+            with patch.object(pool_module.get_pool(), "connect", _unpooled_connect):
+                _run(client, headers, 100, 1)  # warm-up
+                results["unpooled"] = _run(client, headers, args.requests, args.threads)
+
+            _run(client, headers, 100, 1)
+            results["pooled"] = _run(client, headers, args.requests, args.threads)
+            pool_module.get_pool().close_all()
+
+    print(f"📊 {args.requests} requests, {args.threads} thread(s), endpoints: {', '.join(ENDPOINTS)}")
+    for mode, rps in results.items():
+        print(f"  {mode:>9}: {rps:8.1f} req/s")
+    print(f"  speed-up : {results['pooled'] / results['unpooled']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
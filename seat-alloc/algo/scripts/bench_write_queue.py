@@ -0,0 +1,149 @@
+"""
+Benchmark: many faculty users allocating rooms in parallel.
+
+Spins up the Flask app in-process against a throwaway database per mode,
+signs up --users faculty accounts (each with a classroom, a session and
+--rooms rooms' worth of students) and lets one thread per user save its rooms
+through POST /api/sessions/<id>/allocate-room, polling the pending list in
+between, all at once:
+  - "direct": each request writes on its own connection (DB_WRITE_QUEUE off)
+  - "queued": writes go through the single-writer queue with group commit,
+              reads through read-only connections
+
+Reports room saves per second, save latency percentiles and failed requests
+(e.g. "database is locked").
+
+Run from project root:
+    python algo/scripts/bench_write_queue.py [--users 16] [--rooms 6] [--seats 30]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+algo_dir = os.path.join(script_dir, '..')
+project_root = os.path.join(algo_dir, '..')
+sys.path.insert(0, os.path.abspath(project_root))
+
+from algo.config.settings import Config
+from algo.database import pool as pool_module
+from algo.database import writer as writer_module
+
+
+def _setup_users(app, client, users, rooms, seats):
+    """Sign up faculty users and give each a classroom, a session and students."""
+    from algo.database.db import get_db
+    from algo.database.queries.student_queries import StudentQueries
+    from algo.services.session_service import SessionService
+
+    actors = []
+    for u in range(users):
+        resp = client.post("/api/auth/signup", json={
+            "username": f"faculty{u}", "email": f"faculty{u}@example.com",
+            "password": "BenchPass123!", "role": "faculty",
+        })
+        data = resp.get_json()
+        headers = {"Authorization": f"Bearer {data['token']}"}
+        resp = client.post("/api/classrooms", headers=headers,
+                           json={"name": f"F{u}-R1", "rows": 5, "cols": max(1, seats // 5), "block_width": 2})
+        classroom = resp.get_json()
+        classroom_id = classroom.get("id") or classroom.get("classroom", {}).get("id")
+
+        rolls = [f"0901CS{u:02d}{i:04d}" for i in range(rooms * seats)]
+        with app.app_context():
+            session = SessionService.create_session(f"Bench {u}", user_id=data["user"]["id"])
+            db = get_db()
+            upload_id = db.execute(
+                "INSERT INTO uploads (session_id, batch_id, batch_name) VALUES (?, ?, 'CSE')",
+                (session["session_id"], f"bench-{u}")
+            ).lastrowid
+            StudentQueries.bulk_insert_students(
+                ((upload_id, f"bench-{u}", "CSE", roll, f"Student {roll}", "#BFDBFE", "") for roll in rolls),
+                conn=db,
+            )
+            db.commit()
+        actors.append({"headers": headers, "session_id": session["session_id"],
+                       "classroom_id": classroom_id, "rolls": rolls})
+    return actors
+
+
+def _run(client, actors, rooms, seats):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(actors))
+
+    def faculty(actor):
+        sid = actor["session_id"]
+        barrier.wait()
+        for r in range(rooms):
+            room_rolls = actor["rolls"][r * seats:(r + 1) * seats]
+            seating = [[{"roll_number": roll, "paper_set": "A"} for roll in room_rolls[i:i + 5]]
+                       for i in range(0, len(room_rolls), 5)]
+            started = time.perf_counter()
+            resp = client.post(f"/api/sessions/{sid}/allocate-room", headers=actor["headers"],
+                               json={"classroom_id": actor["classroom_id"], "seating_data": {"seating": seating}})
+            elapsed = time.perf_counter() - started
+            client.get(f"/api/sessions/{sid}/pending", headers=actor["headers"])
+            with lock:
+                if resp.status_code == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors.append((resp.get_json() or {}).get("error", resp.status_code))
+
+    threads = [threading.Thread(target=faculty, args=(actor,)) for actor in actors]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, sorted(latencies), errors
+
+
+def _bench(mode, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        # Keep the log, the plan cache and the cleanup scheduler away from the real app files
+        with patch.object(Config, "DB_PATH", db_path), \
+             patch.object(Config, "DB_WRITE_QUEUE", mode == "queued"), \
+             patch.object(Config, "LOG_FILE", Path(tmp) / "app.log"), \
+             patch("algo.core.cache.cache_manager.CACHE_DIR", str(Path(tmp) / "cache")), \
+             patch("algo.scripts.clean_old_data.start_scheduler", lambda: None):
+            from algo.main import create_app
+            app = create_app(test_config={"TESTING": True, "DB_PATH": str(db_path)})
+            client = app.test_client()
+            actors = _setup_users(app, client, args.users, args.rooms, args.seats)
+            elapsed, latencies, errors = _run(client, actors, args.rooms, args.seats)
+            writer = writer_module.get_writer(db_path)
+            commits, jobs = writer.commits, writer.jobs_run
+            writer_module.close_writers()
+            pool_module.get_pool().close_all()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else float('nan')
+
+    print(f"  {mode:>6}: {len(latencies) / elapsed:8.1f} saves/s   p50 {pct(0.5):7.1f} ms   "
+          f"p95 {pct(0.95):7.1f} ms   failed {len(errors)}"
+          + (f"   ({jobs} jobs in {commits} commits)" if mode == "queued" else ""))
+    for error in sorted(set(map(str, errors)))[:3]:
+        print(f"          ⚠️  {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel room allocation with/without the single-writer queue")
+    parser.add_argument('--users', type=int, default=16, help="Faculty users allocating at once")
+    parser.add_argument('--rooms', type=int, default=6, help="Rooms saved per user")
+    parser.add_argument('--seats', type=int, default=30, help="Students per room")
+    args = parser.parse_args()
+
+    print(f"📊 {args.users} faculty x {args.rooms} rooms x {args.seats} seats, allocating in parallel")
+    for mode in ("direct", "queued"):
+        _bench(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,7 @@ DO NOT add CLI arguments - this is a server-side scheduled process.
 
 """
 
+import shutil
 import sqlite3
 import logging
 import threading
@@ -144,6 +145,7 @@ def _clean_cache_files(cur) -> int:
     cur.execute("SELECT plan_id FROM allocation_sessions")
     live = {r[0] for r in cur.fetchall()}
     removed = 0
+    # Legacy single-file snapshots
     for f in _CACHE_DIR.glob("PLAN-*.json"):
         if f.stem not in live:
             try:
@@ -153,6 +155,15 @@ def _clean_cache_files(cur) -> int:
                 removed += 1
             except OSError as exc:
                 log.warning(f"  [cache]      could not remove {f.name}: {exc}")
+    # Sharded snapshots (PLAN-xxx/manifest.json + rooms/)
+    for d in _CACHE_DIR.glob("PLAN-*"):
+        if d.is_dir() and d.name not in live:
+            try:
+                shutil.rmtree(d)
+                log.info(f"  [cache]      removed {d.name}/")
+                removed += 1
+            except OSError as exc:
+                log.warning(f"  [cache]      could not remove {d.name}/: {exc}")
     return removed
 
 
@@ -0,0 +1,70 @@
+"""
+One-time migration script: convert cached plan snapshots to the compact format.
+
+This script:
+1. Finds every plan in algo/cache (legacy single-file PLAN-*.json and sharded PLAN-*/ dirs)
+2. Splits legacy files into manifest + per-room shards
+3. Rewrites every room as compact JSON (no indentation, batch lists as raw_matrix refs)
+4. Compresses room shards according to CACHE_COMPRESSION (or --compression)
+
+Safe to re-run: already-converted plans are simply re-encoded.
+
+Run from project root:
+    python algo/scripts/migrate_cache_format.py [--compression none|gzip|zstd] [PLAN_ID ...]
+"""
+import argparse
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+algo_dir = os.path.join(script_dir, '..')
+project_root = os.path.join(algo_dir, '..')
+sys.path.insert(0, os.path.abspath(project_root))
+
+import algo.core.cache.cache_manager as cache_module
+from algo.core.cache.cache_manager import CacheManager
+
+
+def migrate(plan_ids=None, compression=None):
+    """Re-encode the given plans (default: all). Returns (plans, bytes_before, bytes_after)."""
+    if compression:
+        cache_module.SNAPSHOT_COMPRESSION = compression
+
+    cache_mgr = CacheManager()
+    plan_ids = plan_ids or cache_mgr.list_plan_ids()
+    migrated, total_before, total_after = 0, 0, 0
+
+    for plan_id in plan_ids:
+        try:
+            result = cache_mgr.rewrite_snapshot(plan_id)
+        except Exception as e:
+            print(f"  ❌ {plan_id}: {e}")
+            continue
+        if result is None:
+            print(f"  ⚠️  {plan_id}: not found")
+            continue
+        before, after = result
+        ratio = f"{before / after:.1f}x" if after else "-"
+        print(f"  ✅ {plan_id}: {before // 1024} KB -> {after // 1024} KB ({ratio})")
+        migrated += 1
+        total_before += before
+        total_after += after
+
+    return migrated, total_before, total_after
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert cached plan snapshots to the compact format")
+    parser.add_argument('plan_ids', nargs='*', help="Plans to convert (default: all)")
+    parser.add_argument('--compression', choices=['none', 'gzip', 'zstd'],
+                        help="Override CACHE_COMPRESSION for this run")
+    args = parser.parse_args()
+
+    print(f"📂 Cache: {os.path.abspath(cache_module.CACHE_DIR)}")
+    print(f"🗜️  Compression: {args.compression or cache_module.SNAPSHOT_COMPRESSION}")
+    migrated, before, after = migrate(args.plan_ids, args.compression)
+    print(f"\n✅ Migrated {migrated} plan(s): {before / (1024 * 1024):.2f} MB -> {after / (1024 * 1024):.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Consistency check for the denormalised session counters.
+
+allocation_sessions.total_students / allocated_count are maintained by SQLite
+triggers (see SESSION_COUNTER_TRIGGERS in algo/database/schema.py). This script
+recounts them from students/uploads/allocations and reports any session whose
+stored values disagree; without --check it also rewrites them.
+
+Run from project root:
+    python algo/scripts/rebuild_session_counters.py [--check] [SESSION_ID ...]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+algo_dir = os.path.join(script_dir, '..')
+project_root = os.path.join(algo_dir, '..')
+sys.path.insert(0, os.path.abspath(project_root))
+
+from algo.config.settings import Config
+from algo.database.schema import rebuild_session_counters
+
+
+def rebuild(session_ids=None, dry_run=False, db_path=None):
+    """Check (and unless dry_run, fix) the given sessions (default: all). Returns the drift list."""
+    conn = sqlite3.connect(str(db_path or Config.DB_PATH), timeout=20)
+    try:
+        if session_ids:
+            drift = [d for sid in session_ids for d in rebuild_session_counters(conn, sid, dry_run)]
+        else:
+            drift = rebuild_session_counters(conn, dry_run=dry_run)
+        conn.commit()
+    finally:
+        conn.close()
+    return drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recount session total_students / allocated_count")
+    parser.add_argument('session_ids', nargs='*', type=int, help="Sessions to check (default: all)")
+    parser.add_argument('--check', action='store_true', help="Report drift without rewriting")
+    args = parser.parse_args()
+
+    print(f"📂 Database: {Config.DB_PATH}")
+    if not os.path.exists(Config.DB_PATH):
+        print("❌ Database not found")
+        sys.exit(1)
+    drift = rebuild(args.session_ids, dry_run=args.check)
+    for sid, (old_total, total), (old_alloc, alloc) in drift:
+        print(f"  ⚠️  session {sid}: total {old_total} -> {total}, allocated {old_alloc} -> {alloc}")
+
+    if not drift:
+        print("✅ All session counters consistent")
+    elif args.check:
+        print(f"\n❌ {len(drift)} session(s) drifted (re-run without --check to fix)")
+        sys.exit(1)
+    else:
+        print(f"\n✅ Rebuilt counters for {len(drift)} session(s)")
+
+
+if __name__ == '__main__':
+    main()
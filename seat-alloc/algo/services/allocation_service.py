@@ -2,6 +2,7 @@
 # Orchestrates the seating algorithm and handles the conversion between models and database records.
 import logging
 import json
+from contextlib import nullcontext
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 
@@ -9,6 +10,7 @@ from algo.config.settings import Config
 from algo.database.queries.session_queries import SessionQueries
 from algo.database.queries.student_queries import StudentQueries
 from algo.database.queries.allocation_queries import AllocationQueries
+from algo.database.writer import run_write
 from algo.core.algorithm.seating import SeatingAlgorithm
 from algo.core.models.allocation import Seat, PaperSet
 from algo.core.cache.cache_manager import CacheManager
@@ -244,153 +246,272 @@ class AllocationService:
     def save_allocations_to_db(session_id: int, classroom_id: int, seating_plan: List[List[Dict]]):
         """
         Persist the allocation results to the relational DB.
-        This requires resolving student IDs from enrollments.
-        """
-        # Fetch all students for this session once to create a lookup map
-        # enrollment -> student_id
-        # Note: Enrollments should be unique within a session ideally, or at least (batch, enrollment)
         
-        all_students = StudentQueries.get_students_by_session(session_id)
-        enrollment_map = {s['enrollment']: s['id'] for s in all_students}
+        Student ids are resolved set-based in SQL (AllocationQueries.allocate_room_seats);
+        the session's allocated_count follows in the same transaction via trigger.
+        """
+        seats = [
+            (seat['roll_number'], f"{seat['row']},{seat['col']}", seat['paper_set'], seat['batch_label'])
+            for row in seating_plan
+            for seat in row
+            if seat and seat.get('status') == 'allocated' and seat.get('roll_number')
+        ]
+        if not seats:
+            return
         
-        allocations_to_insert = []
+        from algo.database.db import get_db
+        db = get_db()
+        inserted = len(AllocationQueries.allocate_room_seats(session_id, classroom_id, seats, conn=db))
+        db.execute("""
+            UPDATE allocation_sessions SET last_activity = CURRENT_TIMESTAMP
+            WHERE session_id = ?
+        """, (session_id,))
+        db.commit()
         
-        for row in seating_plan:
-            for seat in row:
-                if seat and seat.get('status') == 'allocated' and seat.get('roll_number'):
-                    enrollment = seat['roll_number']
-                    student_id = enrollment_map.get(enrollment)
-                    
-                    if student_id:
-                        allocations_to_insert.append((
-                            session_id,
-                            classroom_id,
-                            student_id,
-                            enrollment,
-                            f"{seat['row']},{seat['col']}",
-                            seat['batch_label'],
-                            seat['paper_set']
-                        ))
-                    else:
-                        logger.warning(f"Student ID not found for allocated enrollment: {enrollment}")
-
-        if allocations_to_insert:
-            AllocationQueries.save_allocation_batch(allocations_to_insert)
-            
-            # Update session stats
-            SessionService.update_stats(session_id)
+        if inserted < len(seats):
+            logger.warning(f"{len(seats) - inserted} seat(s) in classroom {classroom_id} matched no unallocated student")
 
     @staticmethod
     def reset_allocations(session_id: int):
         """Clear all allocations for a session"""
         AllocationQueries.clear_session_allocations(session_id)
-        SessionService.update_stats(session_id)
         # Also clear cache?
         # The cache manager logic for deletion might be needed.
         session = SessionQueries.get_session_by_id(session_id)
         if session:
              CacheManager().delete_snapshot(session['plan_id'])
 
+    @staticmethod
+    def _export_cached_room(plan_id: Optional[str], room_no: str) -> Optional[Dict]:
+        """Compact snapshot of a cached room for the undo journal (None if unavailable)."""
+        if not plan_id:
+            return None
+        try:
+            return CacheManager().export_room(plan_id, room_no)
+        except Exception as e:
+            logger.warning(f"Could not snapshot cached room {room_no}: {e}")
+            return None
+
+    @staticmethod
+    def _record_step(db, session_id: int, classroom_id: int, room_no: str,
+                     room: Optional[Dict], rows: List[tuple]):
+        """
+        Append an 'allocate' step to the undo journal (caller commits).
+
+        snapshot_data holds the step's inserted allocation rows and the room as
+        cached at allocation time (compact encoding), so undo/redo touch only
+        this step's rows and one cache room. Recording a new step discards any
+        undone steps: the redo branch ends here.
+        """
+        db.execute("DELETE FROM allocation_history WHERE session_id = ? AND undone = 1", (session_id,))
+        step_num = db.execute(
+            "SELECT COALESCE(MAX(step_number), 0) + 1 FROM allocation_history WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()[0]
+        snapshot = {"room_no": room_no, "allocations": [list(row) for row in rows], "room": room}
+        db.execute("""
+            INSERT INTO allocation_history
+            (session_id, step_number, classroom_id, action_type, students_affected, snapshot_data, created_at)
+            VALUES (?, ?, ?, 'allocate', ?, ?, CURRENT_TIMESTAMP)
+        """, (session_id, step_num, classroom_id, len(rows), json.dumps(snapshot, separators=(',', ':'))))
+
+    @staticmethod
+    def _restore_cached_room(plan_id: Optional[str], room_no: str, room_data: Optional[Dict]):
+        """Bring the plan cache in line with a committed undo/redo (logged, never raised)."""
+        if not plan_id or not room_no:
+            return
+        try:
+            CacheManager().restore_room(plan_id, room_no, room_data)
+        except Exception as e:
+            logger.warning(f"Could not restore cached room {room_no} of plan {plan_id}: {e}")
+
+    @staticmethod
+    def _undo_step_job(db, session_id: int) -> Dict[str, Any]:
+        """Write job: roll back the newest live journal step (see undo_last_allocation)."""
+        step = db.execute("""
+            SELECT id, step_number, classroom_id, snapshot_data
+            FROM allocation_history
+            WHERE session_id = ? AND action_type = 'allocate' AND undone = 0
+            ORDER BY step_number DESC LIMIT 1
+        """, (session_id,)).fetchone()
+        if not step:
+            return {"success": False, "message": "Nothing to undo"}
+        
+        target_classroom = step['classroom_id']
+        cursor = db.execute("SELECT name FROM classrooms WHERE id = ?", (target_classroom,))
+        classroom_row = cursor.fetchone()
+        classroom_name = classroom_row['name'] if classroom_row else f"Room {target_classroom}"
+        
+        journal = json.loads(step['snapshot_data']) if step['snapshot_data'] else None
+        room_no, previous_room = None, None
+        if journal:
+            cursor = db.executemany(
+                "DELETE FROM allocations WHERE id = ? AND session_id = ?",
+                [(row[0], session_id) for row in journal["allocations"]]
+            )
+            deleted = max(cursor.rowcount, 0)
+            room_no = journal.get("room_no") or classroom_name
+            previous = db.execute("""
+                SELECT snapshot_data FROM allocation_history
+                WHERE session_id = ? AND classroom_id = ? AND action_type = 'allocate'
+                  AND undone = 0 AND step_number < ?
+                ORDER BY step_number DESC LIMIT 1
+            """, (session_id, target_classroom, step['step_number'])).fetchone()
+            if previous and previous['snapshot_data']:
+                previous_room = json.loads(previous['snapshot_data']).get("room")
+            db.execute("UPDATE allocation_history SET undone = 1 WHERE id = ?", (step['id'],))
+        else:
+            # Legacy step without recorded rows: cannot be redone
+            cursor = db.execute("""
+                DELETE FROM allocations WHERE session_id = ? AND classroom_id = ?
+            """, (session_id, target_classroom))
+            deleted = cursor.rowcount
+            db.execute("DELETE FROM allocation_history WHERE id = ?", (step['id'],))
+        
+        # External students added to this room after allocation go with it
+        db.execute("""
+            DELETE FROM external_students 
+            WHERE session_id = ? AND room_no = ?
+        """, (session_id, classroom_name))
+        
+        # allocated_count is maintained by the allocations triggers
+        db.execute("""
+            UPDATE allocation_sessions SET last_activity = CURRENT_TIMESTAMP
+            WHERE session_id = ?
+        """, (session_id,))
+        plan_row = db.execute("SELECT plan_id FROM allocation_sessions WHERE session_id = ?",
+                              (session_id,)).fetchone()
+        return {
+            "success": True,
+            "message": f"Undid allocation for {classroom_name} ({deleted} students)",
+            "classroom_name": classroom_name,
+            "students_restored": deleted,
+            "_cache": (plan_row['plan_id'] if plan_row else None, room_no, previous_room),
+        }
+
     @staticmethod
     def undo_last_allocation(session_id: int) -> Dict[str, Any]:
         """
         Undo the last room allocation for a session.
         
-        Finds the most recent classroom allocation (via history or fallback to last modified),
-        removes all allocations for that classroom, and updates session counts.
+        Takes the newest live step from the allocation_history journal, deletes
+        exactly the allocation ids it recorded and marks it undone (so it can be
+        redone). The cached room is rolled back to the previous step's snapshot
+        of that room, or dropped if no earlier step allocated it. Steps recorded
+        before the journal kept snapshots fall back to clearing the classroom.
         
         Returns:
             Dict with success, message, classroom_name, students_restored
         """
-        from algo.database.db import get_db
-        db = get_db()
-        
         try:
-            # Try to find last allocation from history
-            history_id = None
-            target_classroom = None
-            affected = 0
-            
-            try:
-                cursor = db.execute("""
-                    SELECT id, classroom_id, students_affected
-                    FROM allocation_history
-                    WHERE session_id = ? AND action_type = 'allocate'
-                    ORDER BY step_number DESC LIMIT 1
-                """, (session_id,))
-                last_step = cursor.fetchone()
-                
-                if last_step:
-                    history_id = last_step['id']
-                    target_classroom = last_step['classroom_id']
-                    affected = last_step['students_affected']
-            except Exception:
-                pass  # Table might not exist
-            
-            # Fallback: find last classroom with allocations
-            if not target_classroom:
-                cursor = db.execute("""
-                    SELECT classroom_id, COUNT(*) as cnt
-                    FROM allocations WHERE session_id = ?
-                    GROUP BY classroom_id ORDER BY MAX(id) DESC LIMIT 1
-                """, (session_id,))
-                fallback = cursor.fetchone()
-                
-                if not fallback:
-                    return {"success": False, "message": "Nothing to undo"}
-                
-                target_classroom = fallback['classroom_id']
-                affected = fallback['cnt']
-            
-            # Get classroom name for message
-            cursor = db.execute("SELECT name FROM classrooms WHERE id = ?", (target_classroom,))
-            classroom_row = cursor.fetchone()
-            classroom_name = classroom_row['name'] if classroom_row else f"Room {target_classroom}"
-            
-            # Delete allocations for that classroom
-            cursor = db.execute("""
-                DELETE FROM allocations WHERE session_id = ? AND classroom_id = ?
-            """, (session_id, target_classroom))
-            deleted = cursor.rowcount
-            
-            # Also delete any external students manually added to this room
-            try:
-                db.execute("""
-                    DELETE FROM external_students 
-                    WHERE session_id = ? AND room_no = ?
-                """, (session_id, classroom_name))
-                logger.info(f"Cleared external students for room {classroom_name}")
-            except Exception as e:
-                logger.warning(f"Could not clear external students: {e}")
-            
-            # Update session count
-            db.execute("""
-                UPDATE allocation_sessions
-                SET allocated_count = MAX(0, allocated_count - ?), last_activity = CURRENT_TIMESTAMP
-                WHERE session_id = ?
-            """, (deleted, session_id))
-            
-            # Remove history record if exists
-            if history_id:
-                try:
-                    db.execute("DELETE FROM allocation_history WHERE id = ?", (history_id,))
-                except:
-                    pass
-            
-            db.commit()
-            
-            logger.info(f"Undid allocation for {classroom_name} ({deleted} students)")
-            
-            return {
-                "success": True,
-                "message": f"Undid allocation for {classroom_name} ({deleted} students)",
-                "classroom_name": classroom_name,
-                "students_restored": deleted
-            }
-            
+            result = run_write(AllocationService._undo_step_job, session_id)
         except Exception as e:
             logger.error(f"Error undoing allocation for session {session_id}: {e}")
             return {"success": False, "error": str(e)}
+        
+        if result.get("success"):
+            AllocationService._restore_cached_room(*result.pop("_cache"))
+            logger.info(result["message"])
+        return result
+
+    @staticmethod
+    def _redo_step_job(db, session_id: int) -> Dict[str, Any]:
+        """Write job: re-apply the oldest undone journal step (see redo_allocation)."""
+        session_row = db.execute("SELECT plan_id, status FROM allocation_sessions WHERE session_id = ?",
+                                 (session_id,)).fetchone()
+        if not session_row:
+            return {"success": False, "error": "Session not found"}
+        if session_row['status'] != 'active':
+            return {"success": False, "error": f"Session is {session_row['status']}, not active"}
+        
+        step = db.execute("""
+            SELECT id, classroom_id, snapshot_data
+            FROM allocation_history
+            WHERE session_id = ? AND action_type = 'allocate' AND undone = 1
+            ORDER BY step_number ASC LIMIT 1
+        """, (session_id,)).fetchone()
+        if not step:
+            return {"success": False, "message": "Nothing to redo"}
+        
+        journal = json.loads(step['snapshot_data'])
+        classroom_id = step['classroom_id']
+        cursor = db.executemany("""
+            INSERT OR IGNORE INTO allocations
+            (id, session_id, classroom_id, student_id, enrollment, seat_position, batch_name, paper_set)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(row[0], session_id, classroom_id, *row[1:]) for row in journal["allocations"]])
+        restored = max(cursor.rowcount, 0)
+        if restored != len(journal["allocations"]):
+            # Some students were allocated elsewhere since the undo: the recorded
+            # room no longer matches what the DB would hold, so redo nothing
+            raise ValueError(f"Cannot redo {journal.get('room_no')}: "
+                             f"{len(journal['allocations']) - restored} of its students are allocated elsewhere")
+        db.execute("UPDATE allocation_history SET undone = 0 WHERE id = ?", (step['id'],))
+        db.execute("""
+            UPDATE allocation_sessions SET last_activity = CURRENT_TIMESTAMP
+            WHERE session_id = ?
+        """, (session_id,))
+        
+        room_no = journal.get("room_no")
+        return {
+            "success": True,
+            "message": f"Redid allocation for {room_no} ({restored} students)",
+            "classroom_name": room_no,
+            "students_allocated": restored,
+            "_cache": (session_row['plan_id'], room_no, journal.get("room")),
+        }
+
+    @staticmethod
+    def redo_allocation(session_id: int) -> Dict[str, Any]:
+        """
+        Re-apply the oldest undone room allocation for a session.
+        
+        Re-inserts the step's recorded allocation rows (same ids, seats and
+        sets) and puts the room snapshot taken at allocation time back into the
+        plan cache. If any of those students has been allocated elsewhere in the
+        meantime the redo fails and neither the DB nor the cache changes.
+        
+        Returns:
+            Dict with success, message, classroom_name, students_allocated
+        """
+        try:
+            result = run_write(AllocationService._redo_step_job, session_id)
+        except Exception as e:
+            logger.error(f"Error redoing allocation for session {session_id}: {e}")
+            return {"success": False, "error": str(e)}
+        
+        if result.get("success"):
+            AllocationService._restore_cached_room(*result.pop("_cache"))
+            logger.info(result["message"])
+        return result
+
+    @staticmethod
+    def _save_room_job(db, session_id: int, classroom_id: int, room_no: str, seats: List[tuple],
+                       selected_batch_names: Optional[List[str]], room: Optional[Dict]) -> Dict[str, Any]:
+        """Write job: persist one room's seats and journal the step (see save_room_allocation)."""
+        status = db.execute("SELECT status FROM allocation_sessions WHERE session_id = ?",
+                            (session_id,)).fetchone()
+        if not status or status['status'] != 'active':
+            return {"success": False, "error": "Session is no longer active"}
+        
+        allocated_rows = AllocationQueries.allocate_room_seats(
+            session_id, classroom_id, seats, batch_names=selected_batch_names or None, conn=db
+        )
+        
+        # allocated_count is maintained by the allocations triggers
+        db.execute("""
+            UPDATE allocation_sessions SET last_activity = CURRENT_TIMESTAMP
+            WHERE session_id = ?
+        """, (session_id,))
+        
+        # Journal the step (rows + cached room) for undo/redo
+        AllocationService._record_step(db, session_id, classroom_id, room_no, room, allocated_rows)
+        
+        fresh = db.execute("""
+            SELECT total_students, allocated_count, plan_id 
+            FROM allocation_sessions WHERE session_id = ?
+        """, (session_id,)).fetchone()
+        return {"success": True, "allocated_count": len(allocated_rows), "fresh": dict(fresh)}
 
     @staticmethod
     def save_room_allocation(
@@ -402,6 +523,10 @@ class AllocationService:
         """
         Save allocation for one room from seating matrix data.
         
+        Validation reads use the request's read-only connection; the inserts,
+        journal entry and fresh counters run as one job on the single-writer
+        queue (algo.database.writer).
+        
         Args:
             session_id: Session ID
             classroom_id: Classroom ID  
@@ -411,8 +536,8 @@ class AllocationService:
         Returns:
             Dict with allocation result including updated session stats
         """
-        from algo.database.db import get_db
-        db = get_db()
+        from algo.database.db import get_read_db
+        db = get_read_db()
         
         try:
             # Validate session
@@ -434,85 +559,26 @@ class AllocationService:
             if not classroom:
                 return {"success": False, "error": "Classroom not found"}
             
-            # Process seating matrix
+            # Process seating matrix: stage (enrollment, position, set) and let
+            # SQL resolve student ids, skipping unknown/allocated/out-of-batch ones
             seating_matrix = seating_data.get('seating', [])
-            allocated_students = []
-            
-            # Bulk-fetch all pending students once → O(1) instead of O(seats) queries
-            all_students = StudentQueries.get_students_by_session(session_id)
-            already_allocated = set(AllocationQueries.get_allocated_student_ids(session_id))
-            
-            # Build enrollment → {id, batch_name} lookup for unallocated students only
-            enrollment_map = {}
-            for s in all_students:
-                if s['id'] not in already_allocated:
-                    enrollment_map[s['enrollment']] = {'id': s['id'], 'batch_name': s.get('batch_name')}
-            
-            for row_idx, row in enumerate(seating_matrix):
-                if not isinstance(row, list):
-                    continue
-                for col_idx, seat in enumerate(row):
-                    if not seat or seat.get('is_broken') or seat.get('is_unallocated'):
-                        continue
-                    
-                    enrollment = seat.get('roll_number')
-                    if not enrollment:
-                        continue
-                    
-                    # Look up student from pre-fetched map
-                    student_info = enrollment_map.get(enrollment)
-                    
-                    if student_info:
-                        # Filter by batch if specified
-                        if selected_batch_names and student_info['batch_name'] not in selected_batch_names:
-                            continue
-                        
-                        # Insert allocation
-                        db.execute("""
-                            INSERT INTO allocations
-                            (session_id, classroom_id, student_id, enrollment, seat_position, batch_name, paper_set)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            session_id, 
-                            classroom_id, 
-                            student_info['id'], 
-                            enrollment,
-                            f"{row_idx + 1}-{col_idx + 1}", 
-                            student_info['batch_name'], 
-                            seat.get('paper_set', 'A')
-                        ))
-                        
-                        allocated_students.append(enrollment)
-                        # Remove from map to prevent double-allocation within same save
-                        del enrollment_map[enrollment]
-            
-            # Update session totals
-            db.execute("""
-                UPDATE allocation_sessions
-                SET allocated_count = allocated_count + ?, last_activity = CURRENT_TIMESTAMP
-                WHERE session_id = ?
-            """, (len(allocated_students), session_id))
-            
-            # Add to history (if table exists)
-            try:
-                cursor = db.execute("SELECT COALESCE(MAX(step_number), 0) + 1 FROM allocation_history WHERE session_id = ?", (session_id,))
-                step_num = cursor.fetchone()[0]
-                
-                db.execute("""
-                    INSERT INTO allocation_history (session_id, step_number, classroom_id, action_type, students_affected, created_at)
-                    VALUES (?, ?, ?, 'allocate', ?, CURRENT_TIMESTAMP)
-                """, (session_id, step_num, classroom_id, len(allocated_students)))
-            except Exception:
-                pass  # allocation_history table might not exist
-            
-            db.commit()
-            
-            # Get fresh totals
-            cursor = db.execute("""
-                SELECT total_students, allocated_count, plan_id 
-                FROM allocation_sessions WHERE session_id = ?
-            """, (session_id,))
-            fresh = cursor.fetchone()
+            seats = [
+                (seat['roll_number'], f"{row_idx + 1}-{col_idx + 1}", seat.get('paper_set', 'A'), None)
+                for row_idx, row in enumerate(seating_matrix) if isinstance(row, list)
+                for col_idx, seat in enumerate(row)
+                if seat and not seat.get('is_broken') and not seat.get('is_unallocated') and seat.get('roll_number')
+            ]
+            # Snapshot the cached room for the undo journal under the plan lock and keep
+            # it until the step is committed, so no cache write slips in between
+            plan_id = session_row['plan_id']
+            with CacheManager().plan_lock(plan_id) if plan_id else nullcontext():
+                room = AllocationService._export_cached_room(plan_id, classroom['name'])
+                saved = run_write(AllocationService._save_room_job, session_id, classroom_id, classroom['name'],
+                                  seats, selected_batch_names, room)
+            if not saved["success"]:
+                return saved
+            allocated_count = saved["allocated_count"]
+            fresh = saved["fresh"]
             
             # Get all allocated rooms
             allocated_rooms = AllocationQueries.get_allocated_rooms(session_id)
@@ -521,12 +587,12 @@ class AllocationService:
             fresh_allocated = fresh['allocated_count'] or 0
             fresh_pending = max(0, fresh_total - fresh_allocated)
             
-            logger.info(f"Allocated {len(allocated_students)} students to {classroom['name']}")
+            logger.info(f"Allocated {allocated_count} students to {classroom['name']}")
             
             return {
                 "success": True,
-                "message": f"Allocated {len(allocated_students)} students to {classroom['name']}",
-                "allocated_count": len(allocated_students),
+                "message": f"Allocated {allocated_count} students to {classroom['name']}",
+                "allocated_count": allocated_count,
                 "remaining_count": fresh_pending,
                 "session": {
                     "session_id": session_id,
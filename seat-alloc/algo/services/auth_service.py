@@ -4,6 +4,9 @@ import sqlite3
 import os
 import secrets
 import time
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 import jwt
 import bcrypt
@@ -27,6 +30,7 @@ load_dotenv()
 # ============================================================================
 
 from algo.config.settings import Config
+from algo.database.pool import connect
 
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-stable-secret-key-change-in-prod")
 JWT_ALGORITHM = "HS256"
@@ -46,10 +50,8 @@ VALID_ROLES_LOWERCASE = ['developer', 'admin', 'faculty']
 DEFAULT_ROLE = 'faculty'
 
 def _get_conn():
-    """Get a standalone connection to the consolidated database."""
-    conn = sqlite3.connect(str(Config.DB_PATH), timeout=20)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get a pooled connection to the consolidated database."""
+    return connect(Config.DB_PATH, timeout=20)
 
 # ============================================================================
 # ADMIN EMAIL LIST (Optional: auto-assign developer role to these emails)
@@ -92,6 +94,68 @@ def _consume_pending_google_signup(signup_token: str) -> Optional[Dict]:
         return None
     return payload
 
+# ============================================================================
+# VERIFICATION CACHE
+# ============================================================================
+# token_required runs on every authenticated request. Decoded JWT payloads
+# (keyed by token hash) and each user's live role are held briefly so the hot
+# path skips the signature check and the users-table read. Writes made through
+# this module invalidate explicitly; a separate process (migrate_roles.py
+# against a running server) is picked up within AUTH_CACHE_TTL seconds.
+AUTH_CACHE_MAX_ENTRIES = 1024
+_TOKEN_CACHE = OrderedDict()  # sha256(token) -> (expires_at, payload)
+_USER_CACHE = OrderedDict()   # (db_path, user_id) -> (expires_at, (role, active))
+_AUTH_CACHE_LOCK = threading.Lock()
+
+
+def _auth_cache_get(cache, key):
+    with _AUTH_CACHE_LOCK:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return entry[1]
+
+
+def _auth_cache_put(cache, key, value, expires_at):
+    with _AUTH_CACHE_LOCK:
+        cache[key] = (expires_at, value)
+        cache.move_to_end(key)
+        while len(cache) > AUTH_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+
+def invalidate_user_cache(user_id: int = None) -> None:
+    """Drop cached auth state for one user (default: everyone, plus all decoded tokens)."""
+    with _AUTH_CACHE_LOCK:
+        if user_id is None:
+            _USER_CACHE.clear()
+            _TOKEN_CACHE.clear()
+            return
+        for key in [k for k in _USER_CACHE if k[1] == user_id]:
+            del _USER_CACHE[key]
+
+
+def get_user_auth_state(user_id: int) -> Tuple[Optional[str], bool]:
+    """(role, active) for user_id; active is False when the user no longer exists."""
+    key = (str(Config.DB_PATH), user_id)
+    state = _auth_cache_get(_USER_CACHE, key)
+    if state is not None:
+        return state
+
+    conn = _get_conn()
+    try:
+        row = conn.execute("SELECT role FROM users WHERE id = ?", (user_id,)).fetchone()
+    finally:
+        conn.close()
+    state = (row["role"], True) if row else (None, False)
+    _auth_cache_put(_USER_CACHE, key, state, time.time() + Config.AUTH_CACHE_TTL)
+    return state
+
+
 def token_required(f):
     """Decorator to require valid JWT token"""
     from functools import wraps
@@ -116,9 +180,9 @@ def token_required(f):
             user_id = payload.get('user_id')
             token_role = payload.get('role')
 
-            # Prefer live role from DB so role changes apply immediately.
-            db_user = get_user_by_id(user_id) if user_id else None
-            resolved_role = _normalize_role(db_user.get('role')) if db_user else _normalize_role(token_role)
+            # Prefer live role from DB (cached briefly) so role changes apply.
+            db_role, active = get_user_auth_state(user_id) if user_id else (None, False)
+            resolved_role = _normalize_role(db_role if active else token_role)
 
             # Set user info on request object
             request.user_id = user_id
@@ -183,12 +247,20 @@ def create_auth_token(user_id: int, role: str) -> str:
     return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 def verify_token(token: str) -> Optional[Dict]:
-    """Verify JWT token"""
+    """Verify JWT token (decoded payloads are cached by token hash until AUTH_CACHE_TTL or exp)"""
+    key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    payload = _auth_cache_get(_TOKEN_CACHE, key)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
     except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
         return None
+    expires_at = time.time() + Config.AUTH_CACHE_TTL
+    if isinstance(payload.get('exp'), (int, float)):
+        expires_at = min(expires_at, payload['exp'])
+    _auth_cache_put(_TOKEN_CACHE, key, payload, expires_at)
+    return payload
 
 # ============================================================================
 # USER HELPERS
@@ -304,9 +376,6 @@ def signup(username: str, email: str, password: str, role: str = "faculty") -> T
     
     try:
         conn = _get_conn()
-        # Ensure database is not locked
-        conn.execute("PRAGMA busy_timeout=20000")
-        conn.execute("PRAGMA journal_mode=WAL")
         
         cursor = conn.execute(
             """INSERT INTO users 
@@ -396,6 +465,7 @@ def update_user_profile(user_id: int, username: str = None, email: str = None) -
         conn.execute(query, tuple(params))
         conn.commit()
         conn.close()
+        invalidate_user_cache(user_id)
         return True, "Profile updated successfully."
     except sqlite3.Error as e:
         return False, f"Update failed: {str(e)}"
@@ -476,6 +546,7 @@ def google_auth_handler(token: str, role: str = None, signup_token: str = None)
                     params.append(user_id)
                     conn.execute(query, tuple(params))
                     conn.commit()
+                    invalidate_user_cache(user_id)
                 
                 conn.close()
             except Exception as e:
@@ -13,6 +13,7 @@ import logging
 import os
 import time
 import uuid
+from typing import Optional
 
 import requests
 
@@ -35,14 +36,15 @@ class CloudSyncService:
         return f"sha256={digest}"
 
     @staticmethod
-    def _build_event(*, plan_id: str, transformed_payload: dict, date: str, time_slot: str) -> dict:
+    def _build_event(*, plan_id: str, transformed_payload: dict, date: str, time_slot: str,
+                     payload_sha256: Optional[str] = None) -> dict:
         return {
             "event_id": str(uuid.uuid4()),
             "event_type": "PLAN_UPSERT",
             "plan_id": plan_id,
             "date": date,
             "time_slot": time_slot,
-            "sha256": hashlib.sha256(
+            "sha256": payload_sha256 or hashlib.sha256(
                 json.dumps(transformed_payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
             ).hexdigest(),
             "plan_json": transformed_payload,
@@ -284,12 +286,14 @@ class CloudSyncService:
         }
 
     @staticmethod
-    def push_plan(*, plan_id: str, transformed_payload: dict, date: str, time_slot: str) -> dict:
+    def push_plan(*, plan_id: str, transformed_payload: dict, date: str, time_slot: str,
+                  payload_sha256: Optional[str] = None) -> dict:
         event = CloudSyncService._build_event(
             plan_id=plan_id,
             transformed_payload=transformed_payload,
             date=date,
             time_slot=time_slot,
+            payload_sha256=payload_sha256,
         )
 
         mode = CloudSyncService._resolve_mode()
@@ -123,21 +123,26 @@ class SessionService:
         return False, "Active"
 
     @staticmethod
-    def update_stats(session_id: int) -> Dict:
+    def update_stats(session_id: int, rebuild: bool = False) -> Dict:
         """
-        Recalculate and update student counts and allocation counts for a session.
+        Read the student and allocation counts for a session.
+        
+        The counters are kept current by triggers on students/uploads/allocations,
+        so this is a single-row read. rebuild=True recounts them from the source
+        tables first (consistency check).
         
         Returns:
             Dict with success status and updated counts
         """
         try:
-            student_counts = StudentQueries.get_batch_counts(session_id)
-            total_students = sum(s['count'] for s in student_counts)
-            allocated_ids = AllocationQueries.get_allocated_student_ids(session_id)
-            allocated_count = len(allocated_ids)
+            if rebuild:
+                drift = SessionQueries.rebuild_session_counters(session_id)
+                if drift:
+                    logger.warning(f"Session {session_id} counters had drifted: {drift[0][1:]}")
+            total_students, allocated_count = SessionQueries.get_session_counters(session_id)
             pending_count = max(0, total_students - allocated_count)
             
-            SessionQueries.update_session_stats(session_id, total_students, allocated_count)
+            SessionQueries.touch_session(session_id)
             
             logger.info(f"Refreshed session {session_id}: total={total_students}, allocated={allocated_count}")
             
@@ -436,28 +441,17 @@ class SessionService:
                         """, (existing_id, upload_id, existing_id))
                         linked_count += cursor.rowcount
                     
-                    # Recalculate total students
-                    cursor = db.execute("""
-                        SELECT COUNT(*) FROM students s
-                        JOIN uploads u ON s.upload_id = u.id
-                        WHERE u.session_id = ?
-                    """, (existing_id,))
-                    new_total = cursor.fetchone()[0] or 0
-                    
-                    # Get current allocated count
-                    cursor = db.execute("SELECT COUNT(*) FROM allocations WHERE session_id = ?", (existing_id,))
-                    current_allocated = cursor.fetchone()[0] or 0
-                    
-                    # Update session
+                    # Relinking uploads moves their students' counts via trigger
                     db.execute("""
                         UPDATE allocation_sessions
-                        SET total_students = ?, allocated_count = ?, last_activity = CURRENT_TIMESTAMP,
-                            user_id = COALESCE(user_id, ?)
+                        SET last_activity = CURRENT_TIMESTAMP, user_id = COALESCE(user_id, ?)
                         WHERE session_id = ?
-                    """, (new_total, current_allocated, user_id, existing_id))
+                    """, (user_id, existing_id))
                     
                     db.commit()
                     
+                    new_total, current_allocated = SessionQueries.get_session_counters(existing_id)
+                    
                     # Get allocated rooms
                     allocated_rooms = AllocationQueries.get_allocated_rooms(existing_id)
                     
@@ -482,31 +476,23 @@ class SessionService:
             # Create new session
             plan_id = f"PLAN-{''.join(random.choices(string.ascii_uppercase + string.digits, k=8))}"
             
-            # Calculate total students from uploads
-            total_students = 0
-            if upload_ids:
-                placeholders = ','.join('?' * len(upload_ids))
-                cursor = db.execute(f"""
-                    SELECT COUNT(*) FROM students 
-                    WHERE upload_id IN ({placeholders})
-                """, upload_ids)
-                total_students = cursor.fetchone()[0] or 0
-            
             # Create session
             cursor = db.execute("""
                 INSERT INTO allocation_sessions 
                 (user_id, plan_id, total_students, allocated_count, status, created_at, last_activity)
-                VALUES (?, ?, ?, 0, 'active', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-            """, (user_id, plan_id, total_students))
+                VALUES (?, ?, 0, 0, 'active', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            """, (user_id, plan_id))
             
             session_id = cursor.lastrowid
             
-            # Link uploads to session
+            # Link uploads to session (total_students follows via trigger)
             for upload_id in upload_ids:
                 db.execute("UPDATE uploads SET session_id = ? WHERE id = ?", (session_id, upload_id))
             
             db.commit()
             
+            total_students, _ = SessionQueries.get_session_counters(session_id)
+            
             logger.info(f"Created session {session_id} with {total_students} students")
             
             return {
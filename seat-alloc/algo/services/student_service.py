@@ -89,12 +89,13 @@ class StudentService:
                 student['department']
             ))
             
-        StudentQueries.bulk_insert_students(students_data)
+        inserted, duplicates = StudentQueries.bulk_insert_students(students_data)
         
         return {
             "upload_id": upload_id,
             "batch_id": batch_id,
-            "count": len(students_data),
+            "count": inserted,
+            "duplicates": duplicates,
             "warnings": result.warnings
         }
 
@@ -35,6 +35,10 @@ def tmp_db(tmp_path):
          patch("algo.config.settings.Config.DB_NAME", "test.db"):
         yield db_path
 
+    # Stop the single-writer thread(s) bound to this database file
+    from algo.database.writer import close_writers
+    close_writers()
+
 
 # ---------------------------------------------------------------------------
 # 2. FLASK APP + CLIENT FIXTURE
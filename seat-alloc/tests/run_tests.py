@@ -11,6 +11,7 @@ Usage:
     python tests/run_tests.py --suite auth  # Run only auth tests
     python tests/run_tests.py --suite api   # Run only API endpoint tests
     python tests/run_tests.py --suite red   # Run only redundancy/service tests
+    python tests/run_tests.py --suite plan  # Run only query-plan regression tests
 """
 import sys
 import os
@@ -29,6 +30,7 @@ SUITE_MAP = {
     "algo": "tests/test_core_algorithm.py",
     "api":  "tests/test_api_endpoints.py",
     "red":  "tests/test_redundancy_and_services.py",
+    "plan": "tests/test_query_plans.py",
 }
 
 SUITE_LABELS = {
@@ -38,6 +40,7 @@ SUITE_LABELS = {
     "algo": "Core Seating Algorithm",
     "api":  "API Endpoints",
     "red":  "Redundancy Fixes & Service Layer",
+    "plan": "Query Plans for Hot Queries",
 }
 
 
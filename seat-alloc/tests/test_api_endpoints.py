@@ -7,8 +7,10 @@ Tests the major API blueprints through the Flask test client:
 - Students (upload preview + confirm)
 - Classrooms (CRUD, validation)
 - Dashboard (user-scoped stats)
-- Allocations (generate seating)
+- Allocations (generate seating, streamed responses)
 - Plans (listing)
+- Admin table browser (keyset pagination, cached counts, FTS search)
+- Room repair (broken seats -> DB positions, unplaced students back to pending)
 """
 import pytest
 import json
@@ -291,6 +293,251 @@ class TestFeedback:
         assert resp.status_code == 200
 
 
+# ============================================================================
+# ADMIN TABLE BROWSER
+# ============================================================================
+
+class TestDatabaseTableBrowser:
+    """GET /api/database/table/<table>: seek pagination, count cache, search."""
+
+    @pytest.fixture()
+    def students(self, app, client, user_a, tmp_db):
+        session = create_session_direct(app, user_a["user"]["id"], "Browser Test")
+        upload_students(client, user_a["token"], session["session_id"], session["plan_id"],
+                        [(f"0901CS23{i:04d}", f"Student {chr(65 + i % 4)}") for i in range(9)])
+        # Some NULL names to exercise NULL ordering
+        import sqlite3
+        conn = sqlite3.connect(str(tmp_db))
+        conn.execute("UPDATE students SET name = NULL WHERE id IN (2, 5)")
+        conn.commit()
+        conn.close()
+        return user_a["token"]
+
+    def _walk(self, client, token, **query):
+        ids, after = [], None
+        for _ in range(10):
+            params = dict(query, per_page=2, **({"after": after} if after else {}))
+            data = client.get("/api/database/table/students", query_string=params,
+                              headers=_auth_header(token)).get_json()
+            assert data["success"], data
+            ids += [row["id"] for row in data["data"]]
+            after = data["pagination"]["next_cursor"]
+            if not data["pagination"]["has_more"]:
+                assert after is None
+                return ids
+        raise AssertionError("pagination did not terminate")
+
+    @pytest.mark.parametrize("sort_by,sort_order", [("id", "DESC"), ("name", "ASC"), ("name", "DESC")])
+    def test_keyset_walk_matches_offset_order(self, client, students, sort_by, sort_order):
+        full = client.get("/api/database/table/students", headers=_auth_header(students),
+                          query_string={"per_page": 100, "sort_by": sort_by, "sort_order": sort_order}).get_json()
+        expected = [row["id"] for row in full["data"]]
+        assert len(expected) == 9
+        assert self._walk(client, students, sort_by=sort_by, sort_order=sort_order) == expected
+
+    def test_invalid_cursor_is_rejected(self, client, students):
+        resp = client.get("/api/database/table/students", query_string={"after": "not-a-cursor"},
+                          headers=_auth_header(students))
+        assert resp.status_code == 400
+
+    def test_counts_are_cached_per_filter_until_admin_write(self, client, students):
+        def page(**query):
+            return client.get("/api/database/table/students", query_string=query,
+                              headers=_auth_header(students)).get_json()["pagination"]
+
+        assert (page()["total"], page(page=2)["total_cached"]) == (9, True)
+        assert page(search="Student A")["total_cached"] is False
+        resp = client.delete("/api/database/table/students/1", headers=_auth_header(students))
+        assert resp.status_code == 200
+        after_delete = page()
+        assert (after_delete["total"], after_delete["total_cached"]) == (8, False)
+
+    def test_fts_search_matches_like_search(self, app, client, students, tmp_db, monkeypatch):
+        from algo.config.settings import Config
+
+        def search(term):
+            data = client.get("/api/database/table/students", query_string={"search": term, "per_page": 100},
+                              headers=_auth_header(students)).get_json()
+            return sorted(row["id"] for row in data["data"])
+
+        like = {term: search(term) for term in ("cs230003", "Student B", "zz")}
+        monkeypatch.setattr(Config, "ADMIN_FTS_SEARCH", True)
+        assert {term: search(term) for term in like} == like
+        assert like["cs230003"] == [4] and like["Student B"] == [6]
+
+        import sqlite3
+        conn = sqlite3.connect(str(tmp_db))
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'students_fts'").fetchone()
+        conn.execute("UPDATE students SET name = 'Renamed Person' WHERE id = 3")
+        conn.commit()
+        conn.close()
+        assert search("renamed") == [3]
+
+    def test_concurrent_first_searches_build_index_once(self, app, tmp_db, monkeypatch):
+        import threading
+        from algo.api.blueprints import admin
+        from algo.config.settings import Config
+        monkeypatch.setattr(Config, "ADMIN_FTS_SEARCH", True)
+        monkeypatch.setattr(admin, "_FTS_INDEXES", {})
+        builds, barrier = [], threading.Barrier(4)
+
+        def slow_build(*args):
+            builds.append(args)
+            threading.Event().wait(0.05)
+
+        monkeypatch.setattr(admin, "run_write", slow_build)
+        results = []
+
+        def search():
+            barrier.wait()
+            results.append(admin._search_index("students", "id", ["enrollment", "name"]))
+
+        threads = [threading.Thread(target=search) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(builds) == 1
+        assert results == ["students_fts"] * 4
+
+# ============================================================================
+# SEATING GENERATION
+# ============================================================================
+
+class TestGenerateSeating:
+    """POST /api/generate-seating and /api/manual-generate-seating stream the plan back."""
+
+    @pytest.fixture(autouse=True)
+    def cache_dir(self, tmp_path, monkeypatch):
+        import algo.core.cache.cache_manager as cache_module
+        monkeypatch.setattr(cache_module, "CACHE_DIR", str(tmp_path))
+        cache_module._SNAPSHOT_CACHE.clear()
+        yield
+        cache_module._SNAPSHOT_CACHE.clear()
+
+    def test_generate_streams_plan_and_caches_same_rows(self, client, user_a):
+        from algo.api.blueprints.allocations import CACHE_MGR
+        resp = client.post("/api/generate-seating", headers=_auth_header(user_a["token"]), json={
+            "use_demo_db": False, "plan_id": "PLAN-STREAM", "room_no": "R1",
+            "rows": 3, "cols": 4, "block_width": 2, "num_batches": 2,
+            "batch_student_counts": {"1": 6, "2": 6}, "batch_labels": {"1": "CSE", "2": "ECE"},
+        })
+        assert resp.status_code == 200
+        assert resp.is_streamed
+        data = resp.get_json()
+        assert data["plan_id"] == "PLAN-STREAM"
+        assert data["pending_count"] == 12
+        assert data["selected_batches"] == ["CSE", "ECE"]
+        assert data["validation"]["is_valid"] is True
+        assert data["metadata"]["rows"] == 3 and len(data["seating"]) == 3
+
+        room = CACHE_MGR.load_snapshot("PLAN-STREAM")["rooms"]["R1"]
+        assert room["raw_matrix"] == data["seating"]
+
+    @pytest.mark.parametrize("budget", ["NaN", "-1", '"soon"'])
+    def test_invalid_time_budget_rejected(self, client, user_a, budget):
+        # Raw JSON text: NaN is not expressible with json=
+        body = ('{"rows": 2, "cols": 2, "num_batches": 1, "batch_student_counts": "1:2", '
+                f'"optimize": true, "optimize_time_budget": {budget}}}')
+        for route in ("/api/generate-seating", "/api/manual-generate-seating"):
+            resp = client.post(route, headers={**_auth_header(user_a["token"]), "Content-Type": "application/json"},
+                               data=body)
+            assert resp.status_code == 400, route
+            assert "optimize_time_budget" in resp.get_json()["error"]
+
+    def test_time_budget_clamped_to_config_max(self, client, user_a, monkeypatch):
+        import algo.api.blueprints.allocations as allocations
+        from algo.config.settings import Config
+        monkeypatch.setattr(Config, "OPTIMIZE_MAX_TIME_BUDGET", 0.25)
+        budgets = []
+        real_init = allocations.SeatingAlgorithm.__init__
+
+        def spy(self, *args, **kwargs):
+            budgets.append(kwargs["optimize_time_budget"])
+            real_init(self, *args, **kwargs)
+
+        monkeypatch.setattr(allocations.SeatingAlgorithm, "__init__", spy)
+        resp = client.post("/api/manual-generate-seating", headers=_auth_header(user_a["token"]), json={
+            "rows": 2, "cols": 2, "num_batches": 1, "batch_student_counts": "1:2",
+            "optimize": True, "optimize_time_budget": 3600,
+        })
+        assert resp.status_code == 200
+        assert budgets == [0.25]
+
+    def test_manual_generate_streams_plan(self, client, user_a):
+        resp = client.post("/api/manual-generate-seating", headers=_auth_header(user_a["token"]), json={
+            "rows": 2, "cols": 4, "num_batches": 2, "batch_student_counts": "1:4,2:4",
+        })
+        assert resp.status_code == 200
+        assert resp.is_streamed
+        data = resp.get_json()
+        assert len(data["seating"]) == 2 and len(data["seating"][0]) == 4
+        assert "validation" in data and "summary" in data
+
+
+# ============================================================================
+# ROOM REPAIR
+# ============================================================================
+
+class TestRoomRepair:
+    """POST /api/sessions/<id>/rooms/<room>/repair-seats keeps the DB in step with the plan."""
+
+    def test_repair_updates_positions_and_releases_unplaced(self, app, client, user_a, tmp_path, monkeypatch):
+        import algo.core.cache.cache_manager as cache_module
+        from algo.api.blueprints.allocations import CACHE_MGR
+        from algo.core.algorithm.seating import SeatingAlgorithm
+        monkeypatch.setattr(cache_module, "CACHE_DIR", str(tmp_path))
+        cache_module._SNAPSHOT_CACHE.clear()
+
+        token = user_a["token"]
+        session = create_session_direct(app, user_a["user"]["id"], "Repair Test")
+        sid, plan_id = session["session_id"], session["plan_id"]
+        rolls = ["0901CS230001", "0901CS230002", "0901CS230003"]
+        upload_students(client, token, sid, plan_id, [(r, f"Student {r[-1]}") for r in rolls])
+        classroom, _ = create_classroom(client, token, "R-101", rows=2, cols=2, block_width=2)
+        classroom_id = classroom.get("id") or classroom.get("classroom", {}).get("id")
+
+        # 2x2 room: three students seated, (1, 1) free. Adjacency is allowed for this room.
+        algo = SeatingAlgorithm(rows=2, cols=2, num_batches=1, block_width=2,
+                                batch_roll_numbers={1: rolls}, batch_student_counts={1: 3},
+                                batch_labels={1: "CSE"}, allow_adjacent_same_batch=True)
+        algo.generate_seating()
+        matrix = algo.to_web_format()["seating"]
+        CACHE_MGR.save_or_update(plan_id, {"rows": 2, "cols": 2, "block_width": 2, "broken_seats": [],
+                                           "allow_adjacent_same_batch": True}, {"seating": matrix}, "R-101")
+        resp = client.post(f"/api/sessions/{sid}/allocate-room", headers=_auth_header(token),
+                           json={"classroom_id": classroom_id, "seating_data": {"seating": matrix}})
+        assert resp.status_code == 200, resp.get_json()
+
+        seated = {(r, c): matrix[r][c]["roll_number"] for r in range(2) for c in range(2)
+                  if matrix[r][c].get("roll_number")}
+        free = next((r, c) for r in range(2) for c in range(2) if (r, c) not in seated)
+        broken = sorted(seated)[:2]
+
+        resp = client.post(f"/api/sessions/{sid}/rooms/R-101/repair-seats", headers=_auth_header(token),
+                           json={"broken_seats": [list(seat) for seat in broken]})
+        data = resp.get_json()
+        assert resp.status_code == 200, data
+        assert data["moved"] == 1
+        assert len(data["unplaced"]) == 1
+        assert data["returned_to_pending"] == data["unplaced"]
+
+        move = next(ch for ch in data["changes"] if ch["action"] == "moved")
+        assert (move["row"], move["col"]) == free
+        with app.app_context():
+            from algo.database.db import get_db
+            rows = dict(get_db().execute(
+                "SELECT enrollment, seat_position FROM allocations WHERE session_id = ?", (sid,)).fetchall())
+        # Same "row-col" format every other writer uses
+        assert rows[move["roll_number"]] == f"{free[0] + 1}-{free[1] + 1}"
+        assert data["unplaced"][0] not in rows
+        assert len(rows) == 2
+
+        pending = client.get(f"/api/sessions/{sid}/pending", headers=_auth_header(token)).get_json()
+        assert data["unplaced"][0] in [s["enrollment"] for s in pending["pending"]]
+        cache_module._SNAPSHOT_CACHE.clear()
+
+
 # ============================================================================
 # ERROR HANDLING
 # ============================================================================
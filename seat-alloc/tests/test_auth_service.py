@@ -244,6 +244,84 @@ class TestAdminRequired:
             f"faculty should be denied admin access, got {resp.status_code}"
 
 
+# ============================================================================
+# VERIFICATION CACHE
+# ============================================================================
+
+class TestAuthCache:
+    """token_required reuses decoded tokens and live roles between requests."""
+
+    def _count_user_reads(self, monkeypatch):
+        import algo.services.auth_service as auth
+        reads = []
+        original = auth._get_conn
+
+        def counting_conn():
+            reads.append(1)
+            return original()
+
+        monkeypatch.setattr(auth, "_get_conn", counting_conn)
+        return reads
+
+    def test_repeat_requests_skip_user_lookup(self, client, user_b, monkeypatch):
+        """Only the first authenticated request reads the users table."""
+        import algo.services.auth_service as auth
+        client.get("/api/classrooms", headers=_auth_header(user_b["token"]))
+        reads = self._count_user_reads(monkeypatch)
+
+        with patch.object(auth.jwt, "decode", side_effect=AssertionError("decoded again")):
+            for _ in range(5):
+                resp = client.get("/api/classrooms", headers=_auth_header(user_b["token"]))
+                assert resp.status_code == 200
+        assert reads == []
+
+    def test_role_change_visible_after_invalidation(self, client, user_b, tmp_db):
+        """A role written behind the cache applies after invalidate_user_cache / TTL."""
+        import sqlite3
+        from algo.services.auth_service import invalidate_user_cache
+        headers = _auth_header(user_b["token"])
+        assert client.get("/api/feedback/admin/all", headers=headers).status_code == 403
+
+        conn = sqlite3.connect(str(tmp_db))
+        conn.execute("UPDATE users SET role = 'admin' WHERE id = ?", (user_b["user"]["id"],))
+        conn.commit()
+        conn.close()
+        assert client.get("/api/feedback/admin/all", headers=headers).status_code == 403
+
+        invalidate_user_cache(user_b["user"]["id"])
+        assert client.get("/api/feedback/admin/all", headers=headers).status_code != 403
+
+        conn = sqlite3.connect(str(tmp_db))
+        conn.execute("UPDATE users SET role = 'faculty' WHERE id = ?", (user_b["user"]["id"],))
+        conn.commit()
+        conn.close()
+        with patch("algo.services.auth_service.time.time", return_value=time.time() + 3600):
+            assert client.get("/api/feedback/admin/all", headers=headers).status_code == 403
+
+    def test_profile_update_invalidates(self, client, user_b, monkeypatch):
+        """update_user_profile drops the user's cached state."""
+        from algo.services.auth_service import update_user_profile
+        headers = _auth_header(user_b["token"])
+        client.get("/api/classrooms", headers=headers)
+        reads = self._count_user_reads(monkeypatch)
+
+        update_user_profile(user_b["user"]["id"], username="bob_renamed")
+        assert len(reads) == 1
+        client.get("/api/classrooms", headers=headers)
+        assert len(reads) == 2
+
+    def test_cached_payload_respects_exp(self, client):
+        """A cached payload is not served past the token's own expiry."""
+        from algo.services.auth_service import verify_token, JWT_SECRET_KEY, JWT_ALGORITHM
+        exp = int(time.time()) + 60
+        token = pyjwt.encode({"exp": exp, "user_id": 5, "role": "faculty"}, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+        assert verify_token(token)["user_id"] == 5
+        with patch("algo.services.auth_service.time.time", return_value=exp + 1), \
+             patch("algo.services.auth_service.jwt.decode", side_effect=pyjwt.ExpiredSignatureError) as decode:
+            assert verify_token(token) is None
+            decode.assert_called_once()
+
+
 # ============================================================================
 # PASSWORD HASHING
 # ============================================================================
@@ -0,0 +1,753 @@
+"""
+Test Suite 7: Plan Snapshot Cache (CacheManager)
+=================================================
+Tests CacheManager in isolation against a temporary cache directory:
+- Multi-room save / load round trip
+- In-memory snapshot cache (hits, mtime validation, invalidation)
+- Copy-on-write: readers never see a writer's in-progress edits
+- Sharded layout (manifest + per-room files) and legacy single-file compatibility
+- Compact / compressed encoding and the format migration
+- Atomic writes and per-plan write locking
+- Metadata index for list_snapshots / get_cache_stats
+- Append-only seat patch journal (replay and compaction)
+- Plan version stamps / etags for downstream caches
+- Room-scoped reads (load_room / iter_rooms)
+- Enrollment parsing and bulk batch-info inference
+- Major exam plan cache (per-user manifest, parsed-plan LRU)
+"""
+import os
+import json
+import threading
+import pytest
+
+import algo.core.cache.cache_manager as cache_module
+from algo.core.cache.cache_manager import CacheManager
+from algo.core.cache.major_exam_cache import MajorExamCacheManager
+
+
+# ============================================================================
+# FIXTURES / HELPERS
+# ============================================================================
+
+@pytest.fixture()
+def cache_mgr(tmp_path, monkeypatch):
+    """CacheManager writing into an isolated temp directory."""
+    monkeypatch.setattr(cache_module, "CACHE_DIR", str(tmp_path))
+    cache_module._SNAPSHOT_CACHE.clear()
+    yield CacheManager()
+    cache_module._SNAPSHOT_CACHE.clear()
+    cache_module._SNAPSHOT_INDEX.close()
+
+
+def make_room_output(rolls, label="CSE", cols=2):
+    """Build a minimal web-format seating payload for the given rolls."""
+    rows = []
+    for r in range(0, len(rolls), cols):
+        row = []
+        for c, roll in enumerate(rolls[r:r + cols]):
+            row.append({
+                "position": f"{chr(65 + c)}{r // cols + 1}",
+                "batch": 1,
+                "batch_label": label,
+                "paper_set": "A" if c % 2 == 0 else "B",
+                "roll_number": roll,
+                "is_broken": False,
+                "is_unallocated": roll is None,
+            })
+        rows.append(row)
+    return {"seating": rows}
+
+
+ROOM_INPUTS = {"rows": 2, "cols": 2, "block_width": 2, "broken_seats": []}
+
+
+# ============================================================================
+# SAVE / LOAD
+# ============================================================================
+
+class TestSaveLoad:
+
+    def test_round_trip_multi_room(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", "0901CS231002"]), "R1")
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231003"]), "R2")
+
+        data = cache_mgr.load_snapshot("PLAN-A")
+        assert set(data["rooms"]) == {"R1", "R2"}
+        assert data["metadata"]["total_students"] == 3
+        assert data["rooms"]["R1"]["batches"]["CSE"]["info"]["branch"] == "CS"
+
+    def test_missing_plan_returns_none(self, cache_mgr):
+        assert cache_mgr.load_snapshot("PLAN-NOPE") is None
+
+
+# ============================================================================
+# IN-MEMORY SNAPSHOT CACHE
+# ============================================================================
+
+class TestSnapshotCache:
+
+    def test_repeat_loads_skip_parsing(self, cache_mgr, monkeypatch):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+
+        def fail_read(*args, **kwargs):
+            raise AssertionError("snapshot was re-parsed")
+
+        monkeypatch.setattr(CacheManager, "_read_json", fail_read)
+        first = cache_mgr.load_snapshot("PLAN-A")
+        second = CacheManager().load_snapshot("PLAN-A")
+        assert first is second
+
+    def test_external_file_change_is_detected(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        cache_mgr.load_snapshot("PLAN-A")
+
+        path = os.path.join(cache_mgr.get_plan_dir("PLAN-A"), cache_module.MANIFEST_FILE)
+        with open(path) as f:
+            data = json.load(f)
+        data["metadata"]["total_students"] = 99
+        with open(path, "w") as f:
+            json.dump(data, f)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+        assert cache_mgr.load_snapshot("PLAN-A")["metadata"]["total_students"] == 99
+
+    def test_writers_do_not_mutate_shared_snapshot(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        before = cache_mgr.load_snapshot("PLAN-A")
+
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231002"]), "R2")
+        after = cache_mgr.load_snapshot("PLAN-A")
+
+        assert set(before["rooms"]) == {"R1"}
+        assert set(after["rooms"]) == {"R1", "R2"}
+
+    def test_patch_seat_is_visible_to_next_load(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", None]), "R1")
+        cache_mgr.load_snapshot("PLAN-A")
+
+        assert cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, {
+            "position": "B1", "roll_number": "EXT001", "batch_label": "External", "is_unallocated": False,
+        })
+        data = cache_mgr.load_snapshot("PLAN-A")
+        assert data["rooms"]["R1"]["raw_matrix"][0][1]["roll_number"] == "EXT001"
+
+    def test_finalize_and_delete_invalidate(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231002"]), "R2")
+        cache_mgr.load_snapshot("PLAN-A")
+
+        assert cache_mgr.finalize_rooms("PLAN-A", ["R2"])
+        assert list(cache_mgr.load_snapshot("PLAN-A")["rooms"]) == ["R2"]
+
+        assert cache_mgr.delete_snapshot("PLAN-A")
+        assert cache_mgr.load_snapshot("PLAN-A") is None
+
+    def test_lru_eviction(self, cache_mgr, monkeypatch):
+        monkeypatch.setattr(cache_module._SNAPSHOT_CACHE, "max_entries", 2)
+        for plan in ("P1", "P2", "P3"):
+            cache_mgr.save_or_update(plan, ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        assert list(cache_module._SNAPSHOT_CACHE._entries) == ["P2", "P3"]
+
+
+# ============================================================================
+# SHARDED STORAGE
+# ============================================================================
+
+def _shard_name(cache_mgr, plan_id, room_no):
+    """File name of a room's current shard, as referenced by the manifest."""
+    return cache_mgr._load_manifest(plan_id)["rooms"][room_no]["file"]
+
+
+class TestShardedStorage:
+
+    def _room_files(self, cache_mgr, plan_id):
+        rooms_dir = os.path.join(cache_mgr.get_plan_dir(plan_id), cache_module.ROOMS_DIR)
+        return {name: os.stat(os.path.join(rooms_dir, name)).st_mtime_ns for name in os.listdir(rooms_dir)}
+
+    def test_room_update_rewrites_only_that_room(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231002"]), "R2")
+        before = self._room_files(cache_mgr, "PLAN-A")
+        old_r2 = _shard_name(cache_mgr, "PLAN-A", "R2")
+
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231003", "0901CS231004"]), "R2")
+        after = self._room_files(cache_mgr, "PLAN-A")
+
+        r1 = _shard_name(cache_mgr, "PLAN-A", "R1")
+        r2 = _shard_name(cache_mgr, "PLAN-A", "R2")
+        assert after[r1] == before[r1]
+        # The new R2 shard got a new name; the replaced one was removed after the commit
+        assert r2 != old_r2
+        assert set(after) == {r1, r2}
+        assert not os.path.exists(cache_mgr.get_file_path("PLAN-A"))
+
+    def test_reader_retries_when_shard_replaced_mid_read(self, cache_mgr, monkeypatch):
+        """A reader holding the old manifest re-reads it instead of seeing a missing or newer shard."""
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        cache_module._SNAPSHOT_CACHE.clear()
+        original = cache_module.CacheManager._read_room
+        replaced = []
+
+        def racing_read(self, plan_id, entry):
+            if not replaced:
+                # Another writer commits between our manifest read and shard read
+                replaced.append(True)
+                cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231009"]), "R1")
+            return original(self, plan_id, entry)
+
+        monkeypatch.setattr(cache_module.CacheManager, "_read_room", racing_read)
+        data = cache_mgr._read_plan("PLAN-A")
+        assert data["rooms"]["R1"]["raw_matrix"][0][0]["roll_number"] == "0901CS231009"
+        assert data["metadata"]["version"] == 2
+
+    def test_cold_read_assembles_legacy_view(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231002"]), "M 101")
+        cache_module._SNAPSHOT_CACHE.clear()
+
+        data = cache_mgr.load_snapshot("PLAN-A")
+        assert list(data["rooms"]) == ["R1", "M 101"]
+        assert data["metadata"]["total_students"] == 2
+        assert set(data["inputs"]["room_configs"]) == {"R1", "M 101"}
+        assert data["rooms"]["M 101"]["raw_matrix"][0][0]["roll_number"] == "0901CS231002"
+
+    def test_finalize_removes_dropped_room_files(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231002"]), "R2")
+
+        cache_mgr.finalize_rooms("PLAN-A", ["R1"])
+        assert set(self._room_files(cache_mgr, "PLAN-A")) == {_shard_name(cache_mgr, "PLAN-A", "R1")}
+        assert cache_mgr.list_snapshots()[0]["rooms"] == ["R1"]
+
+    def test_legacy_file_is_read_and_migrated_on_write(self, cache_mgr):
+        legacy = {
+            "metadata": {"plan_id": "PLAN-OLD", "latest_room": "R1", "last_updated": "2025-01-01T00:00:00",
+                         "total_students": 1, "type": "multi_room_snapshot"},
+            "inputs": {"room_configs": {"R1": ROOM_INPUTS}},
+            "rooms": {"R1": {"batches": {}, "student_count": 1,
+                             "raw_matrix": make_room_output(["0901CS231001"])["seating"], "inputs": ROOM_INPUTS}},
+        }
+        with open(cache_mgr.get_file_path("PLAN-OLD"), "w") as f:
+            json.dump(legacy, f, indent=4)
+
+        assert cache_mgr.load_snapshot("PLAN-OLD")["metadata"]["total_students"] == 1
+
+        cache_mgr.save_or_update("PLAN-OLD", ROOM_INPUTS, make_room_output(["0901CS231002"]), "R2")
+        assert not os.path.exists(cache_mgr.get_file_path("PLAN-OLD"))
+        data = cache_mgr.load_snapshot("PLAN-OLD")
+        assert set(data["rooms"]) == {"R1", "R2"}
+        assert data["metadata"]["total_students"] == 2
+
+
+# ============================================================================
+# COMPACT ENCODING
+# ============================================================================
+
+class TestCompactEncoding:
+
+    def _room_path(self, cache_mgr, plan_id, room_no):
+        return os.path.join(cache_mgr._rooms_dir(plan_id), _shard_name(cache_mgr, plan_id, room_no))
+
+    def test_batches_stored_as_matrix_refs(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", "0901CS231002"]), "R1")
+
+        with open(self._room_path(cache_mgr, "PLAN-A", "R1"), "rb") as f:
+            raw = f.read()
+        assert b"\n" not in raw
+        stored = json.loads(raw)
+        assert stored["format"] == cache_module.COMPACT_FORMAT
+        assert stored["batches"]["CSE"]["refs"] == [[0, 0], [0, 1]]
+
+    def test_cold_read_round_trips_inline_students(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", None]), "R1")
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, {
+            "position": "B1", "roll_number": "EXT001", "batch_label": "External", "is_unallocated": False,
+        })
+        cache_module._SNAPSHOT_CACHE.clear()
+
+        room = cache_mgr.load_snapshot("PLAN-A")["rooms"]["R1"]
+        assert "format" not in room
+        assert room["batches"]["CSE"]["students"][0] == room["raw_matrix"][0][0]
+        external = room["batches"]["External"]["students"][0]
+        assert external["roll_number"] == "EXT001" and external["is_external"] is True
+
+    def test_gzip_compression_is_transparent(self, cache_mgr, monkeypatch):
+        monkeypatch.setattr(cache_module, "SNAPSHOT_COMPRESSION", "gzip")
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        cache_module._SNAPSHOT_CACHE.clear()
+
+        with open(self._room_path(cache_mgr, "PLAN-A", "R1"), "rb") as f:
+            assert f.read(2) == b"\x1f\x8b"
+        data = cache_mgr.load_snapshot("PLAN-A")
+        assert data["rooms"]["R1"]["raw_matrix"][0][0]["roll_number"] == "0901CS231001"
+
+    def test_migration_shrinks_legacy_files(self, cache_mgr, monkeypatch):
+        from algo.scripts import migrate_cache_format
+
+        rolls = [f"0901CS23{i:04d}" for i in range(40)]
+        seating = make_room_output(rolls, cols=8)["seating"]
+        legacy = {
+            "metadata": {"plan_id": "PLAN-OLD", "latest_room": "R1", "last_updated": "2025-01-01T00:00:00",
+                         "total_students": 40, "type": "multi_room_snapshot"},
+            "inputs": {"room_configs": {"R1": ROOM_INPUTS}},
+            "rooms": {"R1": {"batches": {"CSE": {"info": {"branch": "CS"}, "students": [s for row in seating for s in row]}},
+                             "student_count": 40, "raw_matrix": seating, "inputs": ROOM_INPUTS}},
+        }
+        with open(cache_mgr.get_file_path("PLAN-OLD"), "w") as f:
+            json.dump(legacy, f, indent=4)
+        before = cache_mgr.load_snapshot("PLAN-OLD")
+
+        # migrate() switches the module-level setting; let monkeypatch restore it
+        monkeypatch.setattr(cache_module, "SNAPSHOT_COMPRESSION", "none")
+        migrated, size_before, size_after = migrate_cache_format.migrate(compression="gzip")
+        assert migrated == 1
+        assert size_after * 4 < size_before
+
+        cache_module._SNAPSHOT_CACHE.clear()
+        assert cache_mgr.load_snapshot("PLAN-OLD")["rooms"] == before["rooms"]
+
+
+# ============================================================================
+# ATOMIC WRITES / LOCKING
+# ============================================================================
+
+class TestCrashSafety:
+
+    def test_failed_write_keeps_previous_file(self, cache_mgr, monkeypatch):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+
+        def crash(*args, **kwargs):
+            raise OSError("disk full")
+
+        with monkeypatch.context() as m:
+            m.setattr(cache_module.os, "replace", crash)
+            with pytest.raises(OSError):
+                cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS239999"]), "R1")
+
+        cache_module._SNAPSHOT_CACHE.clear()
+        data = cache_mgr.load_snapshot("PLAN-A")
+        assert data["rooms"]["R1"]["raw_matrix"][0][0]["roll_number"] == "0901CS231001"
+        leftovers = [
+            name for _, _, files in os.walk(cache_mgr.get_plan_dir("PLAN-A"))
+            for name in files if name.startswith(".tmp-")
+        ]
+        assert leftovers == []
+
+    def test_concurrent_room_saves_are_not_lost(self, cache_mgr):
+        rooms = [f"R{i}" for i in range(12)]
+        errors = []
+
+        def save(room):
+            try:
+                cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), room)
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        threads = [threading.Thread(target=save, args=(room,)) for room in rooms]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        cache_module._SNAPSHOT_CACHE.clear()
+        data = cache_mgr.load_snapshot("PLAN-A")
+        assert set(data["rooms"]) == set(rooms)
+        assert data["metadata"]["total_students"] == len(rooms)
+
+
+# ============================================================================
+# METADATA INDEX
+# ============================================================================
+
+class TestSnapshotIndex:
+
+    def test_listing_and_stats_do_not_open_plans(self, cache_mgr, monkeypatch):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", "0901CS231002"]), "R1")
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231003"]), "R2")
+        cache_mgr.save_or_update("PLAN-B", ROOM_INPUTS, make_room_output(["0901CS231004"]), "R1")
+
+        def fail_read(*args, **kwargs):
+            raise AssertionError("plan body was opened")
+
+        monkeypatch.setattr(CacheManager, "_read_json", fail_read)
+        snapshots = {s["plan_id"]: s for s in cache_mgr.list_snapshots()}
+        assert snapshots["PLAN-A"]["rooms"] == ["R1", "R2"]
+        assert snapshots["PLAN-A"]["total_students"] == 3
+        assert snapshots["PLAN-B"]["room_no"] == "R1"
+
+        stats = cache_mgr.get_cache_stats()
+        assert stats["total_plans"] == 2
+        assert stats["total_students_cached"] == 4
+        assert stats["total_rooms"] == 3
+
+    def test_index_follows_finalize_and_delete(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231002"]), "R2")
+        cache_mgr.finalize_rooms("PLAN-A", ["R2"])
+        assert cache_mgr.list_snapshots()[0]["rooms"] == ["R2"]
+
+        cache_mgr.delete_snapshot("PLAN-A")
+        assert cache_mgr.list_snapshots() == []
+
+    def test_index_connection_reused(self, cache_mgr, monkeypatch):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        real_connect = cache_module.sqlite3.connect
+        opened = []
+        monkeypatch.setattr(cache_module.sqlite3, "connect",
+                            lambda *a, **k: (opened.append(a), real_connect(*a, **k))[1])
+
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231002"]), "R2")
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, EXTERNAL_SEAT)
+        cache_mgr.list_snapshots()
+        assert opened == []
+
+    def test_index_reconciles_external_changes(self, cache_mgr):
+        import shutil
+
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        cache_mgr.save_or_update("PLAN-B", ROOM_INPUTS, make_room_output(["0901CS231002"]), "R1")
+        shutil.rmtree(cache_mgr.get_plan_dir("PLAN-B"))
+        legacy = {
+            "metadata": {"plan_id": "PLAN-OLD", "latest_room": "R9", "last_updated": "2025-01-01T00:00:00",
+                         "total_students": 7, "type": "multi_room_snapshot"},
+            "inputs": {}, "rooms": {"R9": {"student_count": 7}},
+        }
+        with open(cache_mgr.get_file_path("PLAN-OLD"), "w") as f:
+            json.dump(legacy, f)
+
+        snapshots = {s["plan_id"]: s for s in cache_mgr.list_snapshots()}
+        assert set(snapshots) == {"PLAN-A", "PLAN-OLD"}
+        assert snapshots["PLAN-OLD"]["total_students"] == 7
+
+
+# ============================================================================
+# SEAT PATCH JOURNAL
+# ============================================================================
+
+EXTERNAL_SEAT = {"position": "B1", "roll_number": "EXT001", "batch_label": "External", "is_unallocated": False}
+
+
+class TestPatchJournal:
+
+    def _room_path(self, cache_mgr, plan_id, room_no):
+        return os.path.join(cache_mgr._rooms_dir(plan_id), _shard_name(cache_mgr, plan_id, room_no))
+
+    def test_patch_appends_without_rewriting_room(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", None]), "R1")
+        room_path = self._room_path(cache_mgr, "PLAN-A", "R1")
+        before = os.stat(room_path).st_mtime_ns
+
+        assert cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, EXTERNAL_SEAT)
+        assert cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, {"position": "B1", "is_unallocated": True})
+        assert cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, EXTERNAL_SEAT)
+
+        assert os.stat(room_path).st_mtime_ns == before
+        assert len(cache_mgr._read_journal("PLAN-A")) == 3
+        assert cache_mgr.load_snapshot("PLAN-A")["metadata"]["total_students"] == 2
+
+    def test_patch_copies_only_the_touched_cell(self, cache_mgr, monkeypatch):
+        rolls = [f"0901CS23{i:04d}" for i in range(5)] + [None]
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(rolls), "R1")
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS239999"]), "R2")
+        before = cache_mgr.load_snapshot("PLAN-A")
+        size_before = cache_mgr.list_snapshots()[0]["size_bytes"]
+        monkeypatch.setattr(cache_module.os, "walk", lambda *a, **k: pytest.fail("plan directory walked"))
+
+        assert cache_mgr.patch_seat("PLAN-A", "R1", 2, 1, EXTERNAL_SEAT)
+        after = cache_mgr.load_snapshot("PLAN-A")
+        room_before, room_after = before["rooms"]["R1"], after["rooms"]["R1"]
+        assert after["rooms"]["R2"] is before["rooms"]["R2"]
+        assert room_after["raw_matrix"][0] is room_before["raw_matrix"][0]
+        assert room_after["raw_matrix"][2] is not room_before["raw_matrix"][2]
+        assert room_after["batches"]["CSE"] is room_before["batches"]["CSE"]
+        # The earlier view is untouched
+        assert room_before["raw_matrix"][2][1]["is_unallocated"] is True
+        assert "External" not in room_before["batches"]
+        assert room_after["student_count"] == 6
+        assert after["metadata"]["total_students"] == 7
+
+        indexed = cache_mgr.list_snapshots()[0]
+        assert indexed["total_students"] == 7
+        assert indexed["size_bytes"] == size_before + os.path.getsize(cache_mgr._journal_path("PLAN-A"))
+
+    def test_cold_load_replays_journal(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", None]), "R1")
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, EXTERNAL_SEAT)
+        live = cache_mgr.load_snapshot("PLAN-A")
+
+        cache_module._SNAPSHOT_CACHE.clear()
+        replayed = cache_mgr.load_snapshot("PLAN-A")
+        assert replayed == live
+        assert replayed["rooms"]["R1"]["student_count"] == 2
+        assert [s["roll_number"] for s in replayed["rooms"]["R1"]["batches"]["External"]["students"]] == ["EXT001"]
+
+    def test_finalize_compacts_journal(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", None]), "R1")
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, EXTERNAL_SEAT)
+
+        assert cache_mgr.finalize_rooms("PLAN-A", ["R1"])
+        assert not os.path.exists(cache_mgr._journal_path("PLAN-A"))
+
+        cache_module._SNAPSHOT_CACHE.clear()
+        room = cache_mgr.load_snapshot("PLAN-A")["rooms"]["R1"]
+        assert room["raw_matrix"][0][1]["roll_number"] == "EXT001"
+        assert room["student_count"] == 2
+
+    def test_large_journal_is_compacted_lazily(self, cache_mgr, monkeypatch):
+        monkeypatch.setattr(cache_module, "JOURNAL_COMPACT_BYTES", 200)
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", None]), "R1")
+
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, EXTERNAL_SEAT)
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, {**EXTERNAL_SEAT, "roll_number": "EXT002"})
+        assert not os.path.exists(cache_mgr._journal_path("PLAN-A"))
+        assert cache_mgr.load_snapshot("PLAN-A")["rooms"]["R1"]["raw_matrix"][0][1]["roll_number"] == "EXT002"
+
+    def test_room_regeneration_supersedes_pending_patches(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", None]), "R1")
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, EXTERNAL_SEAT)
+
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231005", None]), "R1")
+        cache_module._SNAPSHOT_CACHE.clear()
+        room = cache_mgr.load_snapshot("PLAN-A")["rooms"]["R1"]
+        assert room["raw_matrix"][0][1]["roll_number"] is None
+        assert "External" not in room["batches"]
+
+
+# ============================================================================
+# PLAN VERSIONS
+# ============================================================================
+
+class TestPlanVersion:
+
+    def test_every_mutation_bumps_version(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", None]), "R1")
+        assert cache_mgr.load_snapshot("PLAN-A")["metadata"]["version"] == 1
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231002"]), "R2")
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, EXTERNAL_SEAT)
+        assert cache_mgr.load_snapshot("PLAN-A")["metadata"]["version"] == 3
+        cache_mgr.finalize_rooms("PLAN-A", ["R1"])
+        assert cache_mgr.load_snapshot("PLAN-A")["metadata"]["version"] == 4
+
+        # Re-encoding does not change content, so the version stays put
+        cache_mgr.rewrite_snapshot("PLAN-A")
+        assert cache_mgr.load_snapshot("PLAN-A")["metadata"]["version"] == 4
+
+    def test_journal_replay_and_compaction_keep_version(self, cache_mgr, monkeypatch):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001", None]), "R1")
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, EXTERNAL_SEAT)
+        etag = cache_mgr.get_plan_etag("PLAN-A")
+        assert etag.endswith(".2")
+
+        cache_module._SNAPSHOT_CACHE.clear()
+        assert cache_mgr.get_plan_etag("PLAN-A") == etag
+        assert cache_module.snapshot_etag(cache_mgr.load_snapshot("PLAN-A")) == etag
+
+        monkeypatch.setattr(cache_module, "JOURNAL_COMPACT_BYTES", 0)
+        cache_mgr.patch_seat("PLAN-A", "R1", 0, 1, {"position": "B1", "is_unallocated": True})
+        cache_module._SNAPSHOT_CACHE.clear()
+        assert cache_mgr.get_plan_etag("PLAN-A").endswith(".3")
+
+    def test_recreated_plan_gets_a_new_etag(self, cache_mgr):
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        first = cache_mgr.get_plan_etag("PLAN-A")
+        cache_mgr.delete_snapshot("PLAN-A")
+        assert cache_mgr.get_plan_etag("PLAN-A") is None
+
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        assert cache_mgr.get_plan_etag("PLAN-A") not in (None, first)
+
+    def test_legacy_plan_is_versioned_on_first_write(self, cache_mgr):
+        legacy = {"metadata": {"plan_id": "PLAN-L"}, "inputs": {}, "rooms": {}}
+        with open(cache_mgr.get_file_path("PLAN-L"), "w") as f:
+            json.dump(legacy, f)
+        assert cache_mgr.get_plan_etag("PLAN-L") is None
+
+        cache_mgr.save_or_update("PLAN-L", ROOM_INPUTS, make_room_output(["0901CS231001"]), "R1")
+        assert cache_mgr.get_plan_etag("PLAN-L").endswith(".1")
+
+
+# ============================================================================
+# ROOM-SCOPED ACCESS
+# ============================================================================
+
+class TestRoomAccess:
+
+    def _three_room_plan(self, cache_mgr):
+        for i, room in enumerate(["R1", "R2", "R3"]):
+            cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output([f"0901CS23100{i}", None]), room)
+
+    def test_cold_load_room_reads_one_shard(self, cache_mgr, monkeypatch):
+        self._three_room_plan(cache_mgr)
+        cache_mgr.patch_seat("PLAN-A", "R2", 0, 1, EXTERNAL_SEAT)
+        full = cache_mgr.load_snapshot("PLAN-A")
+        cache_module._SNAPSHOT_CACHE.clear()
+
+        reads = []
+        original = CacheManager._read_room
+        monkeypatch.setattr(CacheManager, "_read_room",
+                            lambda self, plan_id, entry: reads.append(entry["file"]) or original(self, plan_id, entry))
+
+        view = cache_mgr.load_room("PLAN-A", "R2")
+        assert len(reads) == 1
+        assert list(view["rooms"]) == ["R2"]
+        assert view["rooms"]["R2"] == full["rooms"]["R2"]
+        assert cache_module.snapshot_etag(view) == cache_module.snapshot_etag(full)
+
+        assert list(cache_mgr.load_room("PLAN-A")["rooms"]) == ["R1"]
+        assert cache_mgr.load_room("PLAN-A", "R9") is None
+        assert cache_mgr.load_room("PLAN-X", "R1") is None
+
+    def test_iter_rooms_uses_one_load(self, cache_mgr, monkeypatch):
+        self._three_room_plan(cache_mgr)
+        cache_module._SNAPSHOT_CACHE.clear()
+
+        calls = []
+        original = CacheManager._read_plan
+        monkeypatch.setattr(CacheManager, "_read_plan",
+                            lambda self, plan_id: calls.append(plan_id) or original(self, plan_id))
+
+        assert [room for room, _ in cache_mgr.iter_rooms("PLAN-A")] == ["R1", "R2", "R3"]
+        rooms = dict(cache_mgr.iter_rooms("PLAN-A", ["R3", "R9"]))
+        assert list(rooms["R3"]["rooms"]) == ["R3"]
+        assert rooms["R9"] is None
+        assert len(calls) == 1
+
+    def test_export_and_restore_room(self, cache_mgr):
+        self._three_room_plan(cache_mgr)
+        cache_mgr.patch_seat("PLAN-A", "R2", 0, 1, EXTERNAL_SEAT)
+        exported = cache_mgr.export_room("PLAN-A", "R2")
+        patched = cache_mgr.load_room("PLAN-A", "R2")["rooms"]["R2"]
+        assert json.loads(json.dumps(exported)) == exported
+
+        cache_mgr.save_or_update("PLAN-A", ROOM_INPUTS, make_room_output(["0901CS239999"]), "R2")
+        version = cache_mgr.load_snapshot("PLAN-A")["metadata"]["version"]
+        assert cache_mgr.restore_room("PLAN-A", "R2", exported) is True
+        cache_module._SNAPSHOT_CACHE.clear()
+        data = cache_mgr.load_snapshot("PLAN-A")
+        assert data["rooms"]["R2"] == patched
+        assert data["metadata"]["version"] == version + 1
+
+        assert cache_mgr.restore_room("PLAN-A", "R3", None) is True
+        assert cache_mgr.restore_room("PLAN-A", "R3", None) is False
+        data = cache_mgr.load_snapshot("PLAN-A")
+        assert list(data["rooms"]) == ["R1", "R2"]
+        assert data["metadata"]["latest_room"] == "R2"
+        assert data["metadata"]["total_students"] == 3
+        assert cache_mgr.export_room("PLAN-A", "R3") is None
+        assert len(os.listdir(cache_mgr._rooms_dir("PLAN-A"))) == 2
+
+
+# ============================================================================
+# ENROLLMENT PARSING
+# ============================================================================
+
+class TestEnrollmentParsing:
+
+    @pytest.mark.parametrize("roll, expected", [
+        ("0901CD231067", {"degree": "B.Tech", "branch": "CD", "joining_year": "2023"}),
+        ("0901CSE24001", {"degree": "B.Tech", "branch": "CSE", "joining_year": "2024"}),
+        ("BTCS241001", {"degree": "B.Tech", "branch": "CS", "joining_year": "2024"}),
+        ("MCA23001", {"degree": "B.Tech", "branch": "N/A", "joining_year": "2024"}),
+        ("MTECE22010", {"degree": "M.Tech", "branch": "ECE", "joining_year": "2022"}),
+        ("  0901IT221005 ", {"degree": "B.Tech", "branch": "IT", "joining_year": "2022"}),
+        ("", {"degree": "B.Tech", "branch": "N/A", "joining_year": "2024"}),
+    ])
+    def test_formats(self, cache_mgr, roll, expected):
+        assert cache_mgr._parse_enrollment(roll) == expected
+
+    def test_parse_is_memoised_per_prefix(self, cache_mgr):
+        cache_module._parse_enrollment_prefix.cache_clear()
+        for serial in range(50):
+            cache_mgr._parse_enrollment(f"0901CS23{serial:04d}")
+        info = cache_module._parse_enrollment_prefix.cache_info()
+        assert info.misses == 1 and info.hits == 49
+
+    def test_parsed_info_is_not_shared(self, cache_mgr):
+        first = cache_mgr._parse_enrollment("0901CS231001")
+        first["semester"] = 3
+        assert "semester" not in cache_mgr._parse_enrollment("0901CS231002")
+
+    def test_infer_batch_info_for_room(self, cache_mgr):
+        batches = {
+            "CSE": [{"roll_number": "0901CS231001"}, {"roll_number": "0901IT231002"}, {"roll_number": "0901CS231003"}],
+            "ECE": [{"roll_number": "BTEC241001", "semester": 2}],
+            "Empty": [],
+        }
+        info = cache_mgr.infer_batch_info(batches)
+        assert info["CSE"]["branch"] == "CS"
+        assert info["ECE"] == {"degree": "B.Tech", "branch": "EC", "joining_year": "2024", "semester": 2}
+        assert info["Empty"]["branch"] == "N/A"
+
+
+# ============================================================================
+# MAJOR EXAM PLAN CACHE
+# ============================================================================
+
+@pytest.fixture()
+def major_cache(tmp_path):
+    return MajorExamCacheManager(cache_dir=str(tmp_path))
+
+
+def make_major_plan(total=10, status="pending"):
+    return {"metadata": {"total_students": total, "allocated_count": 0, "room_count": 1, "status": status},
+            "students": [{"roll": f"R{i}"} for i in range(total)]}
+
+
+class TestMajorExamCache:
+
+    def test_listing_reads_manifest_only(self, major_cache, monkeypatch):
+        for i in range(3):
+            assert major_cache.store_plan("u1", f"PLAN-major-{i}", make_major_plan(total=10 + i))
+
+        def fail_load(*args, **kwargs):
+            raise AssertionError("plan body was opened")
+
+        monkeypatch.setattr("algo.core.cache.major_exam_cache.json.load", fail_load)
+        plans = major_cache.get_all_user_plans("u1", limit=2)
+        assert [p["plan_id"] for p in plans] == ["PLAN-major-2", "PLAN-major-1"]
+        assert plans[0]["total_students"] == 12
+
+    def test_update_preserves_created_at_without_rereading(self, major_cache, monkeypatch):
+        major_cache.store_plan("u1", "PLAN-major-A", make_major_plan())
+        created_at = major_cache.retrieve_plan("u1", "PLAN-major-A")["created_at"]
+
+        monkeypatch.setattr("algo.core.cache.major_exam_cache.json.load",
+                            lambda *a, **k: pytest.fail("previous version was re-parsed"))
+        assert major_cache.store_plan("u1", "PLAN-major-A", make_major_plan(status="allocated"))
+        plan = major_cache.retrieve_plan("u1", "PLAN-major-A")
+        assert plan["created_at"] == created_at
+        assert plan["metadata"]["status"] == "allocated"
+
+    def test_plan_written_with_fsync_before_rename(self, major_cache, monkeypatch):
+        events = []
+        real_fsync, real_replace = os.fsync, os.replace
+        monkeypatch.setattr("algo.core.cache.major_exam_cache.os.fsync",
+                            lambda fd: (events.append("fsync"), real_fsync(fd))[1])
+        monkeypatch.setattr("algo.core.cache.major_exam_cache.os.replace",
+                            lambda src, dst: (events.append("replace"), real_replace(src, dst))[1])
+        assert major_cache.store_plan("u1", "PLAN-major-A", make_major_plan())
+        assert events and events[0] == "fsync"
+        assert events.count("fsync") >= events.count("replace")
+
+    def test_retrieve_returns_private_copies(self, major_cache):
+        major_cache.store_plan("u1", "PLAN-major-A", make_major_plan())
+        first = major_cache.retrieve_plan("u1", "PLAN-major-A")
+        first["students"].clear()
+        assert len(major_cache.retrieve_plan("u1", "PLAN-major-A")["students"]) == 10
+
+    def test_delete_and_external_files_keep_manifest_in_sync(self, major_cache):
+        major_cache.store_plan("u1", "PLAN-major-A", make_major_plan())
+        major_cache.store_plan("u1", "PLAN-major-B", make_major_plan())
+        assert major_cache.delete_plan("u1", "PLAN-major-A")
+        assert major_cache.retrieve_plan("u1", "PLAN-major-A") is None
+
+        # A plan file written by another process / older version is picked up once
+        user_dir = major_cache._get_user_dir("u1")
+        with open(user_dir / "PLAN-major-C.json", "w") as f:
+            json.dump({"plan_id": "PLAN-major-C", "created_at": "2025-01-01T00:00:00Z", **make_major_plan(total=3)}, f)
+
+        plans = {p["plan_id"]: p for p in major_cache.get_all_user_plans("u1", limit=10)}
+        assert set(plans) == {"PLAN-major-B", "PLAN-major-C"}
+        assert plans["PLAN-major-C"]["total_students"] == 3
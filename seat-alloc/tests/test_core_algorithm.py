@@ -12,6 +12,7 @@ Tests the SeatingAlgorithm class in isolation (no Flask, no DB):
 - Constraint validation
 - Edge cases (1×1, single batch, all seats broken)
 """
+import json
 import pytest
 from algo.core.models.allocation import Seat, PaperSet
 from algo.core.algorithm.seating import SeatingAlgorithm
@@ -471,6 +472,249 @@ class TestJsonOutput:
         summary = output.get("summary", {})
         assert isinstance(summary, dict) and len(summary) > 0
 
+    def test_iter_web_json_matches_to_web_format(self):
+        """Streamed JSON should decode to the same document as to_web_format."""
+        algo = SeatingAlgorithm(rows=4, cols=5, num_batches=2, broken_seats=[(1, 1)])
+        algo.generate_seating()
+        expected = json.loads(json.dumps(algo.to_web_format()))
+        streamed = json.loads("".join(algo.iter_web_json()))
+        assert streamed == expected
+
+    def test_iter_web_json_extra_fields(self):
+        """Extra top-level fields should be merged into the streamed document."""
+        algo = SeatingAlgorithm(rows=2, cols=2, num_batches=2)
+        algo.generate_seating()
+        streamed = json.loads("".join(algo.iter_web_json({"plan_id": "PLAN-X"})))
+        assert streamed["plan_id"] == "PLAN-X"
+        assert len(streamed["seating"]) == 2
+
+    def test_seat_is_slotted(self):
+        """Seat should not carry a per-instance __dict__."""
+        seat = Seat(row=0, col=0)
+        assert not hasattr(seat, "__dict__")
+
+
+# ============================================================================
+# OPTIMISATION MODE
+# ============================================================================
+
+class TestOptimizeMode:
+    """Verify the min-violation local search mode (optimize=True)."""
+
+    @staticmethod
+    def _skewed_algo(**kwargs):
+        rolls = {
+            1: [f"BTCS24O{1000 + i}" for i in range(20)],
+            2: [f"BTCD24O{2000 + i}" for i in range(10)],
+        }
+        return SeatingAlgorithm(
+            rows=6, cols=6, num_batches=2, block_width=3,
+            batch_roll_numbers=rolls,
+            batch_student_counts={1: 20, 2: 10},
+            **kwargs,
+        )
+
+    def _seated(self, plan):
+        return [s.roll_number for row in plan for s in row if s.roll_number and not s.is_broken]
+
+    def test_default_mode_leaves_overflow_unseated(self):
+        """Column fill caps batch 1 at its 3 columns (18 seats)."""
+        algo = self._skewed_algo()
+        plan = algo.generate_seating()
+        assert len(self._seated(plan)) == 28
+        assert algo.optimization_stats is None
+
+    def test_optimize_seats_overflow_without_violations(self):
+        """Optimised plan should seat everyone with no critical errors."""
+        algo = self._skewed_algo(optimize=True, optimize_time_budget=2.0)
+        plan = algo.generate_seating()
+        seated = self._seated(plan)
+        assert len(seated) == 30
+        assert len(set(seated)) == 30
+        ok, errors = algo.validate_constraints()
+        assert ok, errors
+        assert algo.optimization_stats["final_cost"] == 0
+
+    def test_optimize_respects_broken_seats(self):
+        broken = [(0, 0), (2, 3), (5, 5)]
+        algo = self._skewed_algo(optimize=True, broken_seats=broken)
+        plan = algo.generate_seating()
+        for r, c in broken:
+            assert plan[r][c].is_broken
+            assert plan[r][c].roll_number is None
+
+    def test_optimize_stats_in_web_format(self):
+        algo = self._skewed_algo(optimize=True, optimize_max_iterations=100)
+        algo.generate_seating()
+        web = algo.to_web_format()
+        assert "optimization" in web
+        assert web["optimization"]["iterations"] <= 100
+
+    def test_incremental_cost_matches_full_recount(self):
+        """The O(1) deltas must agree with a full rescoring of the grid."""
+        from algo.core.algorithm.optimizer import SeatSwapOptimizer, PAPER_A
+        opt = SeatSwapOptimizer(rows=4, cols=4, col_to_block={0: 0, 1: 0, 2: 1, 3: 1}, broken_seats=[(1, 1)])
+        for c in range(4):
+            for r in range(3):
+                if (r, c) != (1, 1):
+                    opt.place(r, c, c % 2, PAPER_A, {"roll": f"{r}{c}"})
+        stats = opt.optimize(time_budget=0.2)
+        assert stats["final_cost"] == opt.total_cost()
+        assert stats["final_cost"] <= stats["initial_cost"]
+
+
+# ============================================================================
+# REPRODUCIBILITY & PLAN CACHE
+# ============================================================================
+
+class TestReproducibility:
+    """Verify seeded randomisation, input fingerprints and the memoised plan cache."""
+
+    @staticmethod
+    def _rolls(algo):
+        return [[s.roll_number for s in row] for row in algo.seating_plan]
+
+    def test_seeded_randomize_is_reproducible(self):
+        SeatingAlgorithm.clear_plan_cache()
+        a = SeatingAlgorithm(rows=8, cols=4, num_batches=2, randomize_column=True, seed=7)
+        b = SeatingAlgorithm(rows=8, cols=4, num_batches=2, randomize_column=True, seed=7)
+        a.generate_seating()
+        SeatingAlgorithm.clear_plan_cache()
+        b.generate_seating()
+        assert self._rolls(a) == self._rolls(b)
+
+    def test_different_seeds_differ(self):
+        a = SeatingAlgorithm(rows=8, cols=4, num_batches=2, randomize_column=True, seed=1)
+        b = SeatingAlgorithm(rows=8, cols=4, num_batches=2, randomize_column=True, seed=2)
+        a.generate_seating()
+        b.generate_seating()
+        assert self._rolls(a) != self._rolls(b)
+
+    def test_fingerprint_tracks_inputs(self):
+        base = SeatingAlgorithm(rows=4, cols=4, num_batches=2, broken_seats=[(1, 1), (0, 0)])
+        same = SeatingAlgorithm(rows=4, cols=4, num_batches=2, broken_seats=[(0, 0), (1, 1)])
+        other = SeatingAlgorithm(rows=4, cols=4, num_batches=2, broken_seats=[(0, 0)])
+        assert base.input_fingerprint() == same.input_fingerprint()
+        assert base.input_fingerprint() != other.input_fingerprint()
+
+    def test_unseeded_randomize_not_reproducible(self):
+        algo = SeatingAlgorithm(rows=4, cols=4, num_batches=2, randomize_column=True)
+        assert not algo.is_reproducible
+        assert SeatingAlgorithm(rows=4, cols=4, num_batches=2).is_reproducible
+
+    @staticmethod
+    def _crowded(**kwargs):
+        rolls = {1: [f"A{i:03d}" for i in range(300)], 2: [f"B{i:03d}" for i in range(80)]}
+        return SeatingAlgorithm(rows=20, cols=20, num_batches=2, optimize=True,
+                                batch_roll_numbers=rolls, batch_student_counts={1: 300, 2: 80}, **kwargs)
+
+    def test_seeded_optimize_ignores_the_clock(self):
+        """A seeded search is bounded by iterations, so a tiny time budget cannot change the plan."""
+        SeatingAlgorithm.clear_plan_cache()
+        a = self._crowded(seed=5, optimize_time_budget=0.01, optimize_max_iterations=20000)
+        a.generate_seating()
+        SeatingAlgorithm.clear_plan_cache()
+        b = self._crowded(seed=5, optimize_time_budget=2.0, optimize_max_iterations=20000)
+        b.generate_seating()
+        assert a.is_reproducible
+        assert a.input_fingerprint() == b.input_fingerprint()
+        assert a.optimization_stats["iterations"] == b.optimization_stats["iterations"]
+        assert a.optimization_stats["final_cost"] == b.optimization_stats["final_cost"]
+        assert self._rolls(a) == self._rolls(b)
+
+    def test_unseeded_optimize_not_memoised(self):
+        SeatingAlgorithm.clear_plan_cache()
+        algo = self._crowded(optimize_time_budget=0.01)
+        assert not algo.is_reproducible
+        algo.generate_seating()
+        assert not SeatingAlgorithm._plan_cache
+
+    def test_cache_hit_skips_generation(self, monkeypatch):
+        SeatingAlgorithm.clear_plan_cache()
+        first = SeatingAlgorithm(rows=5, cols=6, num_batches=2, randomize_column=True, seed=3)
+        first.generate_seating()
+
+        second = SeatingAlgorithm(rows=5, cols=6, num_batches=2, randomize_column=True, seed=3)
+        monkeypatch.setattr(second, "_generate_seating", lambda: pytest.fail("cache miss"))
+        plan = second.generate_seating()
+
+        assert self._rolls(second) == self._rolls(first)
+        # Callers get their own Seat objects, never the cached ones
+        assert plan[0][0] is not first.seating_plan[0][0]
+
+
+# ============================================================================
+# INCREMENTAL REPAIR
+# ============================================================================
+
+class TestIncrementalRepair:
+    """Verify repair_seating only moves students affected by a broken-seat delta."""
+
+    @staticmethod
+    def _algo():
+        rolls = {
+            1: [f"BTCS24O{1000 + i}" for i in range(10)],
+            2: [f"BTCD24O{2000 + i}" for i in range(10)],
+        }
+        algo = SeatingAlgorithm(
+            rows=6, cols=4, num_batches=2, block_width=2,
+            batch_roll_numbers=rolls, batch_student_counts={1: 10, 2: 10},
+        )
+        algo.generate_seating()
+        return algo
+
+    @staticmethod
+    def _positions(algo):
+        return {
+            s.roll_number: (s.row, s.col)
+            for row in algo.seating_plan for s in row if s.roll_number
+        }
+
+    def test_only_displaced_student_moves(self):
+        algo = self._algo()
+        before = self._positions(algo)
+        victim = algo.seating_plan[0][0].roll_number
+
+        report = algo.repair_seating(broken_seats=[(0, 0)])
+        after = self._positions(algo)
+
+        assert algo.seating_plan[0][0].is_broken
+        assert report["moved"] == 1
+        assert report["unplaced"] == []
+        moved = [roll for roll in before if before[roll] != after.get(roll)]
+        assert moved == [victim]
+
+    def test_moved_student_satisfies_constraints(self):
+        algo = self._algo()
+        report = algo.repair_seating(broken_seats=[(2, 1)])
+        move = next(ch for ch in report["changes"] if ch["action"] == "moved")
+        assert move["violations"] == 0
+        ok, errors = algo.validate_constraints()
+        assert ok, errors
+
+    def test_freed_seat_becomes_available(self):
+        algo = SeatingAlgorithm(rows=3, cols=4, num_batches=2, broken_seats=[(1, 1)])
+        algo.generate_seating()
+        report = algo.repair_seating(freed_seats=[(1, 1)])
+        assert not algo.seating_plan[1][1].is_broken
+        assert (1, 1) not in algo.broken_seats
+        assert report["changes"] == [{"action": "freed", "row": 1, "col": 1, "position": "B2"}]
+
+    def test_repair_from_web_matrix(self):
+        """A cached raw_matrix can be loaded and repaired in place."""
+        source = self._algo()
+        matrix = source.to_web_format()["seating"]
+        victim = matrix[1][2]["roll_number"]
+
+        algo = SeatingAlgorithm(rows=6, cols=4, num_batches=1, block_width=2)
+        algo.load_web_plan(matrix)
+        report = algo.repair_seating(broken_seats=[(1, 2)])
+
+        move = next(ch for ch in report["changes"] if ch["action"] == "moved")
+        assert move["roll_number"] == victim
+        assert move["from"] == "C2"
+        assert algo.web_seat(move["row"], move["col"])["roll_number"] == victim
+
 
 # ============================================================================
 # ROLL FORMATTING
@@ -520,3 +764,40 @@ class TestRollFormatting:
             if seat1.roll_number:
                 assert seat1.roll_number.startswith("BTCD"), \
                     f"Batch 2 roll should start with BTCD: {seat1.roll_number}"
+
+
+    def test_global_serial_mode(self):
+        """Global serial mode should number students continuously across batches."""
+        algo = SeatingAlgorithm(
+            rows=2, cols=2, num_batches=2,
+            batch_by_column=True,
+            roll_template="{prefix}{year}O{serial}",
+            batch_prefixes={1: "BTCS", 2: "BTCD"},
+            year=24,
+            start_serial=1001,
+            serial_mode="global",
+        )
+        plan = algo.generate_seating()
+        rolls = [plan[r][c].roll_number for c in range(2) for r in range(2)]
+        assert rolls == ["BTCS24O1001", "BTCS24O1002", "BTCD24O1003", "BTCD24O1004"]
+
+    def test_invalid_template_reported_once(self):
+        """A template with unknown fields is reported at construction, not per seat."""
+        algo = SeatingAlgorithm(
+            rows=4, cols=2, num_batches=2,
+            roll_template="{branch}-{serial}",
+            batch_prefixes={1: "BTCS", 2: "BTCS"},
+            year=24,
+        )
+        template_errors = [e for e in algo.init_errors if "Invalid roll template" in e]
+        assert len(template_errors) == 1
+
+        plan = algo.generate_seating()
+        assert plan[0][0].roll_number == "{branch}-1001"
+        assert [e for e in algo.init_errors if "Invalid roll template" in e] == template_errors
+
+    def test_compiled_template_render_range(self):
+        from algo.core.algorithm.seating import CompiledRollTemplate
+        fmt = CompiledRollTemplate("{prefix}{year}O{serial}", prefix="BTCS", year=24, serial_width=5)
+        assert fmt.error is None
+        assert fmt.render_range(998, 3) == ["BTCS24O00998", "BTCS24O00999", "BTCS24O01000"]
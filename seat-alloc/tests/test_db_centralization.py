@@ -9,8 +9,11 @@ was implemented correctly:
 - Foreign key integrity is maintained
 - All expected tables exist with correct schemas
 - Migration-added columns are present
+- Pooled connections (PRAGMA tuning, reuse, reset on return)
+- Read-only connections and the single-writer queue (group commit)
 """
 import sqlite3
+import threading
 import pytest
 from pathlib import Path
 from conftest import _auth_header, _signup_user, create_classroom, start_session, create_session_direct
@@ -47,6 +50,15 @@ class TestUnifiedSchema:
         missing = expected_tables - tables
         assert not missing, f"Missing tables: {missing}"
 
+    def test_old_sqlite_rejected_at_startup(self, tmp_db, monkeypatch):
+        """INSERT ... RETURNING needs SQLite 3.35+; startup must say so instead of failing mid-request."""
+        from algo.database import schema
+        monkeypatch.setattr(schema.sqlite3, "sqlite_version_info", (3, 31, 1))
+        monkeypatch.setattr(schema.sqlite3, "sqlite_version", "3.31.1")
+        with pytest.raises(RuntimeError, match=r"3\.35\.0 or newer.*3\.31\.1"):
+            schema.ensure_demo_db()
+        assert not tmp_db.exists()
+
     def test_users_table_has_auth_columns(self, app_ctx, tmp_db):
         """Users table must have all consolidated auth columns."""
         conn = sqlite3.connect(str(tmp_db))
@@ -318,3 +330,176 @@ class TestMigrationColumns:
         columns = {row[1] for row in cur.fetchall()}
         conn.close()
         assert "block_structure" in columns
+
+
+# ============================================================================
+# CONNECTION POOL
+# ============================================================================
+
+class TestConnectionPool:
+    """Every module shares pooled, PRAGMA-tuned connections."""
+
+    @pytest.fixture()
+    def pool(self):
+        from algo.database.pool import ConnectionPool
+        pool = ConnectionPool(max_idle=2)
+        yield pool
+        pool.close_all()
+
+    def test_pragmas_applied_once_per_connection(self, pool, tmp_db):
+        conn = pool.connect(tmp_db)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2   # MEMORY
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 20000
+        assert isinstance(conn.execute("SELECT 1 AS one").fetchone(), sqlite3.Row)
+        conn.close()
+
+        pool.connect(tmp_db).close()
+        assert pool.opened == 1
+
+    def test_closed_handle_is_unusable_and_state_is_reset(self, pool, tmp_db):
+        conn = pool.connect(tmp_db)
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.row_factory = None
+        conn.execute("INSERT INTO t VALUES (1)")  # never committed
+        conn.close()
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+        reused = pool.connect(tmp_db)
+        assert reused.execute("SELECT COUNT(*) AS n FROM t").fetchone()["n"] == 0
+        reused.close()
+
+    def test_nested_checkouts_and_idle_limit(self, pool, tmp_db):
+        conns = [pool.connect(tmp_db) for _ in range(3)]
+        assert pool.opened == 3
+        for conn in conns:
+            conn.close()
+        assert pool.idle_count() == 2
+
+    def test_connections_move_between_threads(self, pool, tmp_db):
+        pool.connect(tmp_db).close()
+        results = []
+
+        def worker():
+            conn = pool.connect(tmp_db)
+            results.append(conn.execute("SELECT 1").fetchone()[0])
+            conn.close()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        assert results == [1]
+        assert pool.opened == 1
+
+    def test_app_modules_use_the_pool(self, app_ctx, tmp_db):
+        from algo.database.db import get_db_connection
+        from algo.database.pool import PooledConnection
+        from algo.services.auth_service import _get_conn
+        from algo.pdf_gen.template_manager import TemplateManager
+
+        for conn in (get_db_connection(), _get_conn(),
+                     TemplateManager(db_path=str(tmp_db)).get_db_connection()):
+            assert isinstance(conn, PooledConnection)
+            conn.close()
+
+    def test_readonly_connections_cannot_write(self, pool, tmp_db):
+        conn = pool.connect(tmp_db)
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.close()
+
+        reader = pool.connect(tmp_db, readonly=True)
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            reader.execute("INSERT INTO t VALUES (1)")
+        writer = pool.connect(tmp_db)
+        writer.execute("INSERT INTO t VALUES (1)")
+        writer.commit()
+        writer.close()
+        assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+        reader.close()
+        assert pool.opened == 2
+
+
+# ============================================================================
+# SINGLE-WRITER QUEUE
+# ============================================================================
+
+class TestWriteQueue:
+    """Writes funnel through one thread that group-commits queued jobs."""
+
+    @pytest.fixture()
+    def queue_db(self, tmp_db):
+        conn = sqlite3.connect(str(tmp_db))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE t (x INTEGER UNIQUE)")
+        conn.commit()
+        conn.close()
+        return tmp_db
+
+    def _rows(self, db_path):
+        conn = sqlite3.connect(str(db_path))
+        rows = [r[0] for r in conn.execute("SELECT x FROM t ORDER BY x")]
+        conn.close()
+        return rows
+
+    def test_queued_jobs_share_one_commit(self, queue_db):
+        from algo.database.writer import WriteQueue
+        writer = WriteQueue(queue_db)
+        gate = threading.Event()
+
+        futures = [writer.submit(lambda conn: gate.wait())]
+        futures += [writer.submit(lambda conn, x: conn.execute("INSERT INTO t VALUES (?)", (x,)).lastrowid, x)
+                    for x in range(10)]
+        gate.set()
+        assert [f.result(timeout=10) for f in futures[1:]] == list(range(1, 11))
+        writer.close()
+        assert self._rows(queue_db) == list(range(10))
+        assert writer.commits <= 2 and writer.jobs_run == 11
+
+    def test_failed_job_rolls_back_alone(self, queue_db):
+        from algo.database.writer import WriteQueue
+        writer = WriteQueue(queue_db)
+
+        def insert_twice(conn, x):
+            conn.execute("INSERT INTO t VALUES (?)", (x,))
+            conn.execute("INSERT INTO t VALUES (?)", (x,))
+
+        ok = writer.submit(lambda conn: conn.execute("INSERT INTO t VALUES (1)"))
+        bad = writer.submit(insert_twice, 2)
+        writer.run(lambda conn: conn.execute("INSERT INTO t VALUES (3)"))
+        ok.result(timeout=10)
+        with pytest.raises(sqlite3.IntegrityError):
+            bad.result(timeout=10)
+        writer.close()
+        assert self._rows(queue_db) == [1, 3]
+
+    def test_run_write_inline_when_queue_disabled(self, queue_db, monkeypatch):
+        from algo.config.settings import Config
+        from algo.database.writer import run_write
+        monkeypatch.setattr(Config, "DB_WRITE_QUEUE", False)
+
+        assert run_write(lambda conn: conn.execute("INSERT INTO t VALUES (7)").rowcount) == 1
+        with pytest.raises(sqlite3.IntegrityError):
+            run_write(lambda conn: conn.execute("INSERT INTO t VALUES (7)"))
+        assert self._rows(queue_db) == [7]
+
+    def test_session_writes_go_through_the_queue(self, app, client, user_a, tmp_db, monkeypatch):
+        from algo.config.settings import Config
+        from algo.database.writer import close_writers, get_writer
+        monkeypatch.setattr(Config, "DB_WRITE_QUEUE", True)
+        session_id = create_session_direct(app, user_a["user"]["id"], "Queue-Test")["session_id"]
+        headers = _auth_header(user_a["token"])
+        writer = get_writer(tmp_db)
+
+        resp = client.post("/api/reset-allocation", headers=headers, json={"session_id": session_id})
+        assert resp.status_code == 200
+        resp = client.post(f"/api/sessions/{session_id}/finalize", headers=headers)
+        assert resp.status_code == 200
+        assert writer.jobs_run == 2
+        # A completed session cannot be finalized again
+        resp = client.post(f"/api/sessions/{session_id}/finalize", headers=headers)
+        assert resp.status_code == 400
+        close_writers()
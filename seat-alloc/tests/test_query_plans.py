@@ -0,0 +1,193 @@
+"""
+Test Suite 8: Query Plans for Hot Queries
+==========================================
+Drives the session/student/dashboard/admin paths through the real query
+code with SQL tracing on every pooled connection, then runs
+EXPLAIN QUERY PLAN on each captured SELECT that touches the
+students -> uploads -> allocation_sessions chain (and allocations).
+
+A plan step that SCANs one of those tables (even via a covering index)
+reads every semester's rows and fails the test; every access must be a
+SEARCH on an index or the primary key.
+"""
+import re
+import sqlite3
+import pytest
+from conftest import _auth_header, create_classroom, create_session_direct, upload_students
+
+
+HOT_TABLES = ("students", "uploads", "allocation_sessions", "allocations")
+
+# "SCAN <table|alias>" with or without "USING [COVERING] INDEX ..."
+_SCAN_RE = re.compile(r"^SCAN (\w+)")
+_TABLE_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+
+
+# ============================================================================
+# HARNESS
+# ============================================================================
+
+@pytest.fixture()
+def traced_sql(app, monkeypatch):
+    """Every SQL statement executed on pooled and writer-queue connections opened from now on."""
+    from algo.database.pool import get_pool
+    from algo.database.writer import WriteQueue, close_writers
+
+    pool = get_pool()
+    pool.close_all()
+    close_writers()
+    statements = []
+    original_open = pool._open
+    original_writer_open = WriteQueue._open
+
+    def _open(*args):
+        conn = original_open(*args)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    def _writer_open(self):
+        conn = original_writer_open(self)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(pool, "_open", _open)
+    monkeypatch.setattr(WriteQueue, "_open", _writer_open)
+    yield statements
+    close_writers()
+    pool.close_all()
+
+
+def _hot_aliases(sql):
+    """Names (tables and their aliases) under which hot tables appear in sql."""
+    names = set()
+    for table, alias in _TABLE_RE.findall(sql):
+        if table.lower() in HOT_TABLES:
+            names.add(table.lower())
+            if alias and alias.upper() not in ("WHERE", "ON", "JOIN", "LEFT", "INNER", "GROUP", "ORDER", "LIMIT"):
+                names.add(alias.lower())
+    return names
+
+
+def full_scans(db_path, statements):
+    """{sql: [plan steps]} for captured SELECTs whose plan scans a hot table."""
+    conn = sqlite3.connect(str(db_path))
+    offenders = {}
+    try:
+        for sql in dict.fromkeys(statements):
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            hot = _hot_aliases(sql)
+            if not hot:
+                continue
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            scans = [step for step in plan
+                     if (m := _SCAN_RE.match(step)) and m.group(1).lower() in hot]
+            if scans:
+                offenders[" ".join(sql.split())] = plan
+    finally:
+        conn.close()
+    return offenders
+
+
+@pytest.fixture()
+def populated_session(app, client, user_a):
+    """A session with an uploaded batch, a classroom and one allocated room."""
+    token = user_a["token"]
+    classroom, _ = create_classroom(client, token, "R101", rows=2, cols=3)
+    session = create_session_direct(app, user_a["user"]["id"])
+    rolls = [f"0901CS23{i:04d}" for i in range(6)]
+    upload_students(client, token, session["session_id"], session["plan_id"],
+                    [(roll, f"Student {i}") for i, roll in enumerate(rolls)])
+    return {"session": session, "classroom": classroom, "rolls": rolls, "token": token}
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+class TestHotQueryPlans:
+
+    def test_harness_detects_full_scans(self, app_ctx, tmp_db):
+        offenders = full_scans(tmp_db, [
+            "SELECT * FROM students WHERE name = 'x'",
+            "SELECT COUNT(*) FROM uploads WHERE session_id = 1",
+        ])
+        assert list(offenders) == ["SELECT * FROM students WHERE name = 'x'"]
+
+    def test_session_and_student_queries(self, app, client, populated_session, traced_sql, tmp_db):
+        token = populated_session["token"]
+        session_id = populated_session["session"]["session_id"]
+        classroom_id = populated_session["classroom"].get("id") or populated_session["classroom"].get("classroom", {}).get("id")
+        seating = [[{"roll_number": roll, "batch_label": "CSE"} for roll in populated_session["rolls"][r:r + 3]]
+                   for r in (0, 3)]
+
+        for method, path, body in [
+            ("get", f"/api/sessions/{session_id}", None),
+            ("get", "/api/sessions/active", None),
+            ("get", "/api/sessions/list", None),
+            ("get", f"/api/sessions/{session_id}/uploads", None),
+            ("get", f"/api/sessions/{session_id}/pending", None),
+            ("get", f"/api/sessions/{session_id}/stats", None),
+            ("post", f"/api/sessions/{session_id}/allocate-room",
+             {"classroom_id": classroom_id, "seating_data": {"seating": seating}}),
+            ("get", f"/api/sessions/{session_id}/pending", None),
+        ]:
+            resp = getattr(client, method)(path, json=body, headers=_auth_header(token))
+            assert resp.status_code < 500, (path, resp.get_json())
+
+        from algo.database.queries.student_queries import StudentQueries
+        from algo.database.queries.allocation_queries import AllocationQueries
+        with app.app_context():
+            StudentQueries.get_students_by_session(session_id)
+            StudentQueries.get_batch_counts(session_id)
+            StudentQueries.get_pending_students(session_id)
+            AllocationQueries.get_allocations_by_session(session_id)
+            AllocationQueries.get_allocated_rooms(session_id)
+
+        assert any("FROM students" in sql for sql in traced_sql)
+        assert full_scans(tmp_db, traced_sql) == {}
+
+    def test_dashboard_and_admin_isolation_queries(self, client, populated_session, traced_sql, tmp_db):
+        token = populated_session["token"]
+        paths = ["/api/dashboard/stats", "/api/dashboard/activity"] + [
+            f"/api/database/table/{table}" for table in HOT_TABLES
+        ]
+        for path in paths:
+            resp = client.get(path, headers=_auth_header(token))
+            assert resp.status_code == 200, path
+
+        assert any("JOIN allocation_sessions" in sql for sql in traced_sql)
+        assert full_scans(tmp_db, traced_sql) == {}
+
+    def test_indexes_exist(self, app_ctx, tmp_db):
+        conn = sqlite3.connect(str(tmp_db))
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+        assert {"idx_uploads_session", "idx_students_upload_batch",
+                "idx_sessions_user_status", "idx_feedback_user"} <= names
+
+    def test_room_persistence_is_driven_by_staged_seats(self, app, populated_session, traced_sql, tmp_db):
+        """Saving a room probes students per staged seat instead of loading the session."""
+        session_id = populated_session["session"]["session_id"]
+        classroom_id = populated_session["classroom"].get("id") or populated_session["classroom"].get("classroom", {}).get("id")
+        seating = [[{"roll_number": roll} for roll in populated_session["rolls"][:3]]]
+
+        from algo.services.allocation_service import AllocationService
+        with app.app_context():
+            result = AllocationService.save_room_allocation(session_id, classroom_id, {"seating": seating}, ["CSE"])
+        assert result["allocated_count"] == 3
+
+        # (the trace repeats a statement for each trigger program it fires)
+        inserts = [sql for sql in dict.fromkeys(traced_sql)
+                   if sql.lstrip().startswith("INSERT INTO allocations") and "room_seat_stage" in sql]
+        assert len(inserts) == 1
+        # No session-wide student load (get_students_by_session) on this path
+        assert not any("SELECT s.*" in sql for sql in traced_sql)
+
+        conn = sqlite3.connect(str(tmp_db))
+        conn.execute("CREATE TEMP TABLE room_seat_stage (ord INTEGER PRIMARY KEY, enrollment TEXT NOT NULL UNIQUE, "
+                     "seat_position TEXT, paper_set TEXT, batch_name TEXT)")
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {inserts[0]}")]
+        conn.close()
+        assert plan[0] == "SCAN r", plan
+        assert all(not step.startswith("SCAN") for step in plan[1:]), plan
@@ -21,7 +21,7 @@ import pytest
 from unittest.mock import patch, MagicMock
 from conftest import (
     _auth_header, _signup_user,
-    create_classroom, start_session,
+    create_classroom, start_session, create_session_direct,
 )
 
 
@@ -304,6 +304,59 @@ class TestSessionService:
         assert isinstance(sessions, list)
         assert len(sessions) >= 2
 
+    def test_counters_follow_writes(self, app, user_a):
+        """Triggers keep total_students/allocated_count in step with every write path."""
+        from algo.database.db import get_db
+        from algo.database.queries.session_queries import SessionQueries
+        from algo.services.session_service import SessionService
+        sid = create_session_direct(app, user_a["user"]["id"])["session_id"]
+        other = create_session_direct(app, user_a["user"]["id"], name="Other")["session_id"]
+
+        with app.app_context():
+            db = get_db()
+            db.execute("INSERT INTO classrooms (name, rows, cols) VALUES ('R1', 2, 2)")
+            for upload_id in (1, 2):
+                db.execute("INSERT INTO uploads (id, session_id, batch_id, batch_name) VALUES (?, ?, ?, 'CSE')",
+                           (upload_id, sid, f"b{upload_id}"))
+                db.executemany(
+                    "INSERT INTO students (upload_id, batch_id, batch_name, enrollment) VALUES (?, ?, 'CSE', ?)",
+                    [(upload_id, f"b{upload_id}", f"E{upload_id}{n}") for n in range(3)])
+            db.execute("""INSERT INTO allocations (session_id, classroom_id, student_id, enrollment)
+                          SELECT ?, 1, id, enrollment FROM students WHERE upload_id = 1""", (sid,))
+            db.commit()
+            assert SessionQueries.get_session_counters(sid) == (6, 3)
+
+            db.execute("DELETE FROM allocations WHERE session_id = ? AND enrollment = 'E10'", (sid,))
+            db.execute("UPDATE uploads SET session_id = ? WHERE id = 2", (other,))
+            db.commit()
+            assert SessionQueries.get_session_counters(sid) == (3, 2)
+            assert SessionQueries.get_session_counters(other) == (3, 0)
+
+            db.execute("DELETE FROM uploads WHERE id = 2")
+            db.commit()
+            assert SessionQueries.get_session_counters(other) == (0, 0)
+            assert SessionService.update_stats(sid)["pending_count"] == 1
+
+    def test_rebuild_counters_repairs_drift(self, app, user_a):
+        """rebuild_session_counters reports and fixes hand-edited counters."""
+        from algo.database.db import get_db
+        from algo.database.queries.session_queries import SessionQueries
+        from algo.services.session_service import SessionService
+        sid = create_session_direct(app, user_a["user"]["id"])["session_id"]
+
+        with app.app_context():
+            db = get_db()
+            db.execute("INSERT INTO uploads (id, session_id, batch_id, batch_name) VALUES (1, ?, 'b1', 'CSE')", (sid,))
+            db.execute("INSERT INTO students (upload_id, batch_id, batch_name, enrollment) VALUES (1, 'b1', 'CSE', 'E1')")
+            db.execute("UPDATE allocation_sessions SET total_students = 40, allocated_count = 7 WHERE session_id = ?", (sid,))
+            db.commit()
+
+            assert SessionQueries.rebuild_session_counters(dry_run=True) == [(sid, (40, 1), (7, 0))]
+            assert SessionQueries.get_session_counters(sid) == (40, 7)
+            result = SessionService.update_stats(sid, rebuild=True)
+            assert (result["total_students"], result["allocated_count"]) == (1, 0)
+            assert SessionQueries.rebuild_session_counters() == []
+
     def test_session_timeout_constants(self):
         """SessionService should have timeout constants."""
         from algo.services.session_service import SessionService
@@ -341,6 +394,121 @@ class TestAllocationQueries:
             assert hasattr(AllocationQueries, method), \
                 f"AllocationQueries missing: {method}"
 
+    def test_allocate_room_seats_set_based(self, app, user_a):
+        """Staged seats resolve to student ids in SQL; skips unknown/allocated/out-of-batch rows."""
+        from algo.database.db import get_db
+        from algo.database.queries.allocation_queries import AllocationQueries
+        from algo.database.queries.session_queries import SessionQueries
+        sid = create_session_direct(app, user_a["user"]["id"])["session_id"]
+
+        with app.app_context():
+            db = get_db()
+            db.execute("INSERT INTO classrooms (id, name, rows, cols) VALUES (1, 'R1', 2, 3)")
+            for upload_id, batch in ((1, "CSE"), (2, "ECE")):
+                db.execute("INSERT INTO uploads (id, session_id, batch_id, batch_name) VALUES (?, ?, ?, ?)",
+                           (upload_id, sid, f"b{upload_id}", batch))
+                db.executemany("INSERT INTO students (upload_id, batch_id, batch_name, enrollment) VALUES (?, ?, ?, ?)",
+                               [(upload_id, f"b{upload_id}", batch, f"{batch}{n}") for n in range(3)])
+            db.commit()
+
+            seats = [("CSE0", "1-1", "A", None), ("ECE0", "1-2", "B", None), ("CSE0", "1-3", "A", None),
+                     ("GHOST", "2-1", "A", None), ("CSE1", "2-2", None, "Custom")]
+            inserted = AllocationQueries.allocate_room_seats(sid, 1, seats)
+            assert len(inserted) == 3
+            rows = db.execute("SELECT id, student_id, enrollment, seat_position, batch_name, paper_set "
+                              "FROM allocations ORDER BY id").fetchall()
+            assert [tuple(r) for r in rows] == inserted
+            assert [r[2:] for r in inserted] == [("CSE0", "1-1", "CSE", "A"), ("ECE0", "1-2", "ECE", "B"),
+                                                 ("CSE1", "2-2", "Custom", "A")]
+            assert SessionQueries.get_session_counters(sid) == (6, 3)
+
+            # Already-allocated students are skipped; batch filter applies in SQL
+            seats = [("CSE0", "1-1", "A", None), ("CSE2", "1-2", "A", None), ("ECE1", "1-3", "A", None)]
+            assert len(AllocationQueries.allocate_room_seats(sid, 1, seats, batch_names=["ECE"])) == 1
+            assert db.execute("SELECT COUNT(*) FROM temp.room_seat_stage").fetchone()[0] == 0
+            assert SessionQueries.get_session_counters(sid) == (6, 4)
+
+    def test_undo_redo_journal_keeps_db_and_cache_consistent(self, app, user_a, tmp_path, monkeypatch):
+        """Undo/redo replay exactly the step's allocation ids and room snapshots."""
+        import algo.core.cache.cache_manager as cache_module
+        from algo.core.cache.cache_manager import CacheManager
+        from algo.database.db import get_db
+        from algo.database.queries.session_queries import SessionQueries
+        from algo.services.allocation_service import AllocationService
+        monkeypatch.setattr(cache_module, "CACHE_DIR", str(tmp_path))
+        cache_module._SNAPSHOT_CACHE.clear()
+        session = create_session_direct(app, user_a["user"]["id"])
+        sid, plan_id = session["session_id"], session["plan_id"]
+
+        def seating(rolls):
+            return {"seating": [[{"roll_number": roll, "position": f"A{i + 1}", "batch_label": "CSE",
+                                  "paper_set": "A"} for i, roll in enumerate(rolls)]]}
+
+        def allocate(room, rolls):
+            data = seating(rolls)
+            CacheManager().save_or_update(plan_id, {"rows": 1, "cols": len(rolls)}, data, room)
+            return AllocationService.save_room_allocation(sid, 1 if room == "R1" else 2, data)
+
+        def state():
+            rows = get_db().execute("SELECT id, classroom_id FROM allocations ORDER BY id").fetchall()
+            rooms = (CacheManager().load_snapshot(plan_id) or {}).get("rooms", {})
+            return [tuple(r) for r in rows], {k: v["student_count"] for k, v in rooms.items()}
+
+        # The room export and the journalled step commit under the plan's cache lock
+        import algo.services.allocation_service as service_module
+        real_run_write = service_module.run_write
+        lock_held = []
+        monkeypatch.setattr(service_module, "run_write", lambda fn, *a, **k: (
+            lock_held.append(cache_module._plan_lock(plan_id)._depth > 0), real_run_write(fn, *a, **k))[1])
+
+        with app.app_context():
+            db = get_db()
+            db.executemany("INSERT INTO classrooms (id, name, rows, cols) VALUES (?, ?, 1, 4)", [(1, "R1"), (2, "R2")])
+            db.execute("INSERT INTO uploads (id, session_id, batch_id, batch_name) VALUES (1, ?, 'b1', 'CSE')", (sid,))
+            db.executemany("INSERT INTO students (upload_id, batch_id, batch_name, enrollment) VALUES (1, 'b1', 'CSE', ?)",
+                           [(f"CSE{n}",) for n in range(6)])
+            db.commit()
+
+            assert allocate("R1", ["CSE0", "CSE1"])["allocated_count"] == 2
+            after_r1 = state()
+            assert allocate("R1", ["CSE0", "CSE2", "CSE3"])["allocated_count"] == 2
+            after_r1_again = state()
+            assert allocate("R2", ["CSE4"])["allocated_count"] == 1
+            after_r2 = state()
+            assert SessionQueries.get_session_counters(sid) == (6, 5)
+            assert lock_held == [True, True, True]
+
+            assert AllocationService.undo_last_allocation(sid)["students_restored"] == 1
+            assert state() == after_r1_again
+            assert AllocationService.undo_last_allocation(sid)["students_restored"] == 2
+            assert state() == after_r1
+            assert SessionQueries.get_session_counters(sid) == (6, 2)
+
+            assert AllocationService.redo_allocation(sid)["students_allocated"] == 2
+            assert state() == after_r1_again
+            assert AllocationService.redo_allocation(sid)["students_allocated"] == 1
+            assert state() == after_r2
+            assert AllocationService.redo_allocation(sid)["success"] is False
+
+            # A redo whose students were allocated elsewhere fails without touching DB or cache
+            AllocationService.undo_last_allocation(sid)
+            before_redo = state()
+            student_id = db.execute("SELECT id FROM students WHERE enrollment = 'CSE4'").fetchone()[0]
+            db.execute("INSERT INTO allocations (session_id, classroom_id, student_id, enrollment) "
+                       "VALUES (?, 1, ?, 'CSE4')", (sid, student_id))
+            db.commit()
+            conflicted = state()
+            assert AllocationService.redo_allocation(sid)["success"] is False
+            assert state() == conflicted and conflicted[1] == before_redo[1]
+            db.execute("DELETE FROM allocations WHERE enrollment = 'CSE4'")
+            db.commit()
+
+            # A new step after an undo ends the redo branch
+            allocate("R2", ["CSE5"])
+            assert AllocationService.redo_allocation(sid)["success"] is False
+            assert SessionQueries.get_session_counters(sid) == (6, 5)
+        cache_module._SNAPSHOT_CACHE.clear()
+
 
 # ============================================================================
 # STUDENT QUERIES
@@ -369,6 +537,64 @@ class TestStudentQueries:
         assert isinstance(result, list)
         assert len(result) == 0
 
+    def test_get_pending_students_anti_join(self, app, user_a):
+        """Pending list excludes allocated students and filters batches in SQL."""
+        from algo.database.db import get_db
+        from algo.database.queries.student_queries import StudentQueries
+        session = create_session_direct(app, user_a["user"]["id"])
+        sid = session["session_id"]
+
+        with app.app_context():
+            db = get_db()
+            db.execute("INSERT INTO classrooms (name, rows, cols) VALUES ('R1', 2, 2)")
+            for upload_id, batch in ((1, "ECE"), (2, "CSE")):
+                db.execute("INSERT INTO uploads (id, session_id, batch_id, batch_name, semester) VALUES (?, ?, ?, ?, 'III')",
+                           (upload_id, sid, f"b{upload_id}", batch))
+                db.executemany(
+                    "INSERT INTO students (upload_id, batch_id, batch_name, enrollment, name) VALUES (?, ?, ?, ?, ?)",
+                    [(upload_id, f"b{upload_id}", batch, f"{batch}{n}", f"{batch} {n}") for n in (3, 1, 2)])
+            allocated = db.execute("SELECT id FROM students WHERE enrollment = 'CSE1'").fetchone()[0]
+            db.execute("INSERT INTO allocations (session_id, classroom_id, student_id, enrollment) VALUES (?, 1, ?, 'CSE1')",
+                       (sid, allocated))
+            db.commit()
+
+            pending = StudentQueries.get_pending_students(sid)
+            assert [p["enrollment"] for p in pending] == ["CSE2", "CSE3", "ECE1", "ECE2", "ECE3"]
+            assert pending[0]["semester"] == "III"
+            assert [p["enrollment"] for p in StudentQueries.get_pending_students(sid, ["CSE"])] == ["CSE2", "CSE3"]
+            assert StudentQueries.get_pending_students(sid, []) == []
+            assert StudentQueries.count_pending_students(sid) == 5
+
+    def test_bulk_insert_counts_duplicates(self, app, user_a):
+        """Chunked bulk insert reports inserted vs skipped rows and joins the caller's transaction."""
+        from algo.database.db import get_db
+        from algo.database.queries.session_queries import SessionQueries
+        from algo.database.queries.student_queries import StudentQueries
+        sid = create_session_direct(app, user_a["user"]["id"])["session_id"]
+
+        with app.app_context():
+            db = get_db()
+            db.execute("INSERT INTO uploads (id, session_id, batch_id, batch_name) VALUES (1, ?, 'b1', 'CSE')", (sid,))
+            rows = [(1, "b1", "CSE", f"E{n}", "", "#fff", "") for n in (1, 2, 3, 2, 4, 1, 5)]
+            assert StudentQueries.bulk_insert_students(iter(rows), conn=db, chunk_size=3) == (5, 2)
+            assert db.in_transaction
+            db.rollback()
+            assert db.execute("SELECT COUNT(*) FROM students").fetchone()[0] == 0
+            assert SessionQueries.get_session_counters(sid) == (0, 0)
+
+    def test_commit_upload_bulk_path(self, client, app, user_a):
+        """commit-upload ingests a 5,000-row batch in one transaction and reports duplicates."""
+        from conftest import upload_students
+        session = create_session_direct(app, user_a["user"]["id"])
+        rows = [(f"0901CS{n:06d}", f"Student {n}") for n in range(5000)] + [("0901CS000007", "Again")]
+        body, status, _ = upload_students(client, user_a["token"], session["session_id"], session["plan_id"], rows)
+        assert status == 200, body
+        assert (body["inserted"], body["duplicates"]) == (5000, 1)
+
+        from algo.database.queries.session_queries import SessionQueries
+        with app.app_context():
+            assert SessionQueries.get_session_counters(session["session_id"]) == (5000, 0)
+
 
 # ============================================================================
 # CONFIG VALIDATION